@@ -0,0 +1,70 @@
+"""
+Micro-benchmark of `UrlNodeQuerySet.best_match_for_path` for a path below
+the deepest page of a 10-level tree of published pages, in public and draft
+request contexts.
+
+Run from the repository root with, for example:
+
+    DJANGO_SETTINGS_MODULE=test_settings python benchmarks/best_match_for_path.py
+"""
+import os
+import sys
+import timeit
+from importlib import import_module
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'test_settings')
+
+import django
+from django.conf import settings
+
+# Use the settings module, with a throwaway secret key if it has none, as is
+# the case for `test_settings`
+settings_module = import_module(os.environ['DJANGO_SETTINGS_MODULE'])
+benchmark_settings = dict(
+    (name, getattr(settings_module, name))
+    for name in dir(settings_module) if name.isupper())
+if not benchmark_settings.get('SECRET_KEY'):
+    benchmark_settings['SECRET_KEY'] = 'benchmark-secret-key'
+settings.configure(**benchmark_settings)
+django.setup()
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from fluent_pages.models.db import UrlNode
+
+from fluentcms_publishing.middleware import override_draft_request_context
+from fluentcms_publishing.pagetypes.fluentpage.models import FluentPage
+
+
+def main(depth=10, number=200):
+    connection.creation.create_test_db(verbosity=0)
+    author = get_user_model().objects.create(username='author')
+    parent = None
+    for level in range(depth):
+        parent = FluentPage.objects.create(
+            author=author,
+            title='Level %d' % level,
+            slug='level-%d' % level,
+            parent=parent,
+        )
+        parent.publish()
+    path = parent.get_absolute_url() + 'some/app/path/'
+    language_code = parent.get_current_language()
+
+    def best_match():
+        UrlNode.objects.best_match_for_path(path, language_code)
+
+    for name, is_draft in (('public', False), ('draft', True)):
+        with override_draft_request_context(is_draft):
+            with CaptureQueriesContext(connection) as ctx:
+                best_match()
+            best = min(timeit.repeat(best_match, number=number, repeat=5))
+        print('%-10s %3d queries %10.2f us' % (
+            name, len(ctx.captured_queries), best / number * 1e6))
+
+
+if __name__ == '__main__':
+    main()
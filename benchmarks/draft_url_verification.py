@@ -0,0 +1,68 @@
+"""
+Micro-benchmark of the per-request cost of draft URL verification by
+`PublishingMiddleware`, for a public request with a valid draft mode HMAC.
+
+Run from the repository root with, for example:
+
+    DJANGO_SETTINGS_MODULE=test_settings python benchmarks/draft_url_verification.py
+"""
+import os
+import sys
+import timeit
+from importlib import import_module
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'test_settings')
+
+import django
+from django.conf import settings
+
+# Use the settings module, with a throwaway secret key if it has none, as is
+# the case for `test_settings`
+settings_module = import_module(os.environ['DJANGO_SETTINGS_MODULE'])
+benchmark_settings = dict(
+    (name, getattr(settings_module, name))
+    for name in dir(settings_module) if name.isupper())
+if not benchmark_settings.get('SECRET_KEY'):
+    benchmark_settings['SECRET_KEY'] = 'benchmark-secret-key'
+settings.configure(**benchmark_settings)
+django.setup()
+
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from fluentcms_publishing.middleware import PublishingMiddleware
+from fluentcms_publishing.utils import get_draft_url, verify_draft_url
+
+
+def main(number=20000):
+    connection.creation.create_test_db(verbosity=0)
+    factory = RequestFactory()
+    middleware = PublishingMiddleware()
+    response = HttpResponse()
+    draft_url = get_draft_url('/some/page/?q=search')
+
+    def request_cycle():
+        request = factory.get(draft_url)
+        request.user = AnonymousUser()
+        middleware.process_request(request)
+        middleware.process_response(request, response)
+
+    def make_request():
+        request = factory.get(draft_url)
+        request.user = AnonymousUser()
+
+    for name, fn in (
+            ('verify_draft_url', lambda: verify_draft_url(draft_url)),
+            ('request (excluding RequestFactory)', request_cycle),
+    ):
+        best = min(timeit.repeat(fn, number=number, repeat=5))
+        if fn is request_cycle:
+            best -= min(timeit.repeat(make_request, number=number, repeat=5))
+        print('%-40s %.2f us' % (name, best / number * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,6 @@
 import json
 import six
+from collections import OrderedDict
 
 import django
 from django import forms
@@ -11,8 +12,9 @@ from django.conf.urls import url
 from django.core.exceptions import PermissionDenied
 from django.core.urlresolvers import reverse, NoReverseMatch
 from django.db import transaction
-from django.db.models import F
+from django.db.models import F, Q
 from django.http import Http404, HttpResponseRedirect, HttpResponse
+from django.shortcuts import get_object_or_404
 from django.utils.encoding import force_text
 from django.utils.html import escape
 from django.utils.translation import ugettext_lazy as _
@@ -24,23 +26,44 @@ from fluent_pages.adminui.urlnodeparentadmin import UrlNodeParentAdmin
 from fluent_contents.admin import PlaceholderEditorAdmin
 from fluent_contents.models import PlaceholderData
 
-from .models import PublishingModel
-from .utils import is_automatic_publishing_enabled
+from .managers import HAS_BEEN_PUBLISHED_Q, _publishable_submodels_q
+from .models import PublishingModel, bulk_publish, bulk_unpublish
+from .utils import (
+    is_automatic_publishing_enabled, is_publishing_job_queue_enabled)
 from . import signals as publishing_signals
 
 
 def make_published(modeladmin, request, queryset):
-    for row in queryset.all():
-        row.publish()
+    if is_publishing_job_queue_enabled():
+        enqueue_publishing_jobs(request, queryset.all(), 'publish')
+        return
+    bulk_publish(queryset.all())
 make_published.short_description = _('Publish')
 
 
 def make_unpublished(modeladmin, request, queryset):
-    for row in queryset.all():
-        row.unpublish()
+    if is_publishing_job_queue_enabled():
+        enqueue_publishing_jobs(request, queryset.all(), 'unpublish')
+        return
+    bulk_unpublish(queryset.all())
 make_unpublished.short_description = _('Unpublish')
 
 
+def enqueue_publishing_jobs(request, objs, action):
+    """
+    Queue the publishing action for each of the given objects for the
+    ``publishing_worker`` management command, for bulk admin actions.
+    """
+    from .jobs.models import PublishingJob
+    count = 0
+    for obj in objs:
+        PublishingJob.objects.enqueue(obj, action)
+        count += 1
+    messages.info(
+        request,
+        _('%(count)d publishing jobs have been queued.') % {'count': count})
+
+
 def http_json_response(data):
     return HttpResponse(json.dumps(data), content_type='application/json')
 
@@ -68,23 +91,21 @@ class PublishingPublishedFilter(SimpleListFilter):
             return queryset.filter(
                 publishing_linked__isnull=not show_published)
 
-        # ...if admin is not for a `PublishingModel` subclass we must iterate
-        # over child model instances to keep compatibility with Fluent page
+        # ...if admin is not for a `PublishingModel` subclass we must check
+        # the publishable child models to keep compatibility with Fluent page
         # admin and models not derived from `PublishingModel`.
-        pks_to_exclude = []
-        for item in queryset.get_real_instances():
-            if show_published:
-                if item.status == UrlNode.PUBLISHED:
-                    continue  # Published according to Fluent Pages' UrlNode
-                elif getattr(item, 'has_been_published', False):
-                    continue  # Published according to ICEKit Publishing
-            else:
-                if item.status == UrlNode.DRAFT \
-                        and not getattr(item, 'has_been_published', False):
-                    # Unpublished according to both Fluent and ICEKit
-                    continue
-            pks_to_exclude.append(item.pk)
-        return queryset.exclude(pk__in=pks_to_exclude)
+        if show_published:
+            # Published according to Fluent Pages' UrlNode or ICEKit Publishing
+            return queryset.filter(
+                Q(status=UrlNode.PUBLISHED)
+                | _publishable_submodels_q(
+                    queryset.model, HAS_BEEN_PUBLISHED_Q))
+        else:
+            # Unpublished according to both Fluent and ICEKit
+            return queryset.filter(
+                Q(status=UrlNode.DRAFT)
+                & ~_publishable_submodels_q(
+                    queryset.model, HAS_BEEN_PUBLISHED_Q))
 
 
 class PublishingStatusFilter(SimpleListFilter):
@@ -144,35 +165,34 @@ class PublishingStatusFilter(SimpleListFilter):
                 return queryset.filter(
                     publishing_modified_at__lte=F(
                         'publishing_linked__publishing_modified_at'))
-        # ...if admin is not for a `PublishingModel` subclass we must iterate
-        # over child model instances to keep compatibility with Fluent page
+        # ...if admin is not for a `PublishingModel` subclass we must check
+        # the publishable child models to keep compatibility with Fluent page
         # admin and models not derived from `PublishingModel`.
-        pks_to_exclude = []
-        for item in queryset.get_real_instances():
-            if value == 'unpublished':
-                if item.status == UrlNode.DRAFT \
-                        and not getattr(item, 'has_been_published', False):
-                    # Unpublished according to both Fluent and ICEKit
-                    continue
-            elif value == 'published':
-                if item.status == UrlNode.PUBLISHED:
-                    continue  # Published according to Fluent Pages' UrlNode
-                elif getattr(item, 'has_been_published', False):
-                    continue  # Published according to ICEKit Publishing
-            elif value == 'out_of_date':
-                if (getattr(item, 'publishing_linked', None)
-                    and item.publishing_modified_at
-                    > item.publishing_linked.publishing_modified_at
-                ):
-                    continue  # Published and outdated according to ICEKit
-            elif value == 'up_to_date':
-                if (getattr(item, 'publishing_linked', None)
-                    and item.publishing_modified_at
-                    <= item.publishing_linked.publishing_modified_at
-                ):
-                    continue  # Published and up-to-date according to ICEKit
-            pks_to_exclude.append(item.pk)
-        return queryset.exclude(pk__in=pks_to_exclude)
+        if value == 'unpublished':
+            # Unpublished according to both Fluent and ICEKit
+            return queryset.filter(
+                Q(status=UrlNode.DRAFT)
+                & ~_publishable_submodels_q(
+                    queryset.model, HAS_BEEN_PUBLISHED_Q))
+        elif value == 'published':
+            # Published according to Fluent Pages' UrlNode or ICEKit Publishing
+            return queryset.filter(
+                Q(status=UrlNode.PUBLISHED)
+                | _publishable_submodels_q(
+                    queryset.model, HAS_BEEN_PUBLISHED_Q))
+        elif value == 'out_of_date':
+            # Published and outdated according to ICEKit
+            return queryset.filter(_publishable_submodels_q(
+                queryset.model,
+                publishing_modified_at__gt=F(
+                    'publishing_linked__publishing_modified_at')))
+        elif value == 'up_to_date':
+            # Published and up-to-date according to ICEKit
+            return queryset.filter(_publishable_submodels_q(
+                queryset.model,
+                publishing_modified_at__lte=F(
+                    'publishing_linked__publishing_modified_at')))
+        return queryset
 
 
 class PublishingAdminForm(forms.ModelForm):
@@ -243,6 +263,36 @@ class PublishingAdminForm(forms.ModelForm):
         return data
 
 
+# Stand-in object PK used to reverse admin URLs once for many objects
+_URL_PK_PLACEHOLDER = '9876543210'
+
+_publishing_changelist_classes = {}
+
+
+def _get_publishing_changelist_class(changelist_class):
+    """
+    Return a subclass of the given admin changelist class which converts the
+    items of each page with the admin's
+    ``get_publishing_changelist_results``.
+    """
+    try:
+        return _publishing_changelist_classes[changelist_class]
+    except KeyError:
+        pass
+
+    class PublishingChangeList(changelist_class):
+
+        def get_results(self, request):
+            super(PublishingChangeList, self).get_results(request)
+            # Editable changelists need the queryset for their formset
+            if not self.list_editable:
+                self.result_list = self.model_admin \
+                    .get_publishing_changelist_results(self.result_list)
+
+    _publishing_changelist_classes[changelist_class] = PublishingChangeList
+    return PublishingChangeList
+
+
 class _PublishingHelpersMixin(object):
     """
     Publishing implementation used for the admin of both normal publishable
@@ -250,10 +300,13 @@ class _PublishingHelpersMixin(object):
     cope with models that may or may not implement our publishing features.
     """
     actions = ['publish', 'unpublish']
+    publishing_column_template = \
+        'admin/publishing/_change_list_publishing_column.html'
 
     def __init__(self, *args, **kwargs):
         super(_PublishingHelpersMixin, self).__init__(*args, **kwargs)
         self.request = None
+        self._publishing_column_template = None
 
     def get_actions(self, request):
         actions = super(_PublishingHelpersMixin, self).get_actions(request)
@@ -349,12 +402,132 @@ class _PublishingHelpersMixin(object):
             return True
         return False
 
+    def get_changelist(self, request, **kwargs):
+        """
+        Use a changelist that converts the items of each page to real
+        instances with their publishing status, see
+        ``get_publishing_changelist_results``.
+        """
+        changelist_class = super(_PublishingHelpersMixin, self) \
+            .get_changelist(request, **kwargs)
+        return _get_publishing_changelist_class(changelist_class)
+
+    def get_publishing_changelist_results(self, results):
+        """
+        Return the given page of changelist items as real instances of
+        polymorphic models, annotated by
+        ``PublishingQuerySet.with_publishing_status`` where possible, with one
+        query per real model instead of queries per item.
+
+        Values the admin's ``get_queryset`` added to the given items, such as
+        annotations, extra selects and related objects loaded with
+        ``select_related`` or ``prefetch_related``, are kept on the real
+        instances.
+        """
+        results = list(results)
+        pks_by_model = OrderedDict()
+        for obj in results:
+            if hasattr(obj, 'get_real_instance_class'):
+                real_model = obj.get_real_instance_class()
+                if real_model is not None and real_model is not type(obj):
+                    pks_by_model.setdefault(real_model, []).append(obj.pk)
+        real_instances = {}
+        for real_model, pks in pks_by_model.items():
+            qs = real_model._default_manager.filter(pk__in=pks)
+            if hasattr(qs, 'non_polymorphic'):
+                qs = qs.non_polymorphic()
+            if hasattr(qs, 'with_publishing_status'):
+                qs = qs.with_publishing_status()
+            for real_obj in qs:
+                real_instances[real_obj.pk] = real_obj
+        converted_results = []
+        for obj in results:
+            real_obj = real_instances.get(obj.pk)
+            if real_obj is None:
+                converted_results.append(obj)
+                continue
+            # Copy the values added by the changelist queryset, which are
+            # the instance attributes a plain real instance does not have
+            for name, value in obj.__dict__.items():
+                if name not in real_obj.__dict__:
+                    real_obj.__dict__[name] = value
+            converted_results.append(real_obj)
+        return converted_results
+
+    def _get_request_cache(self, request):
+        """
+        Return a dict to cache values for the duration of a request, which
+        are shared between the rows of a changelist.
+        """
+        try:
+            return request._publishing_admin_cache
+        except AttributeError:
+            request._publishing_admin_cache = {}
+            return request._publishing_admin_cache
+
+    def get_publishing_column_permissions(self, request, obj):
+        """
+        Return the publish and preview permissions shown in the publishing
+        column for the given object, as a ``(publish, preview)`` tuple.
+
+        The default permission checks only depend on the model and on whether
+        the object has been published, so the results are cached per request
+        unless the permission methods are customised.
+        """
+        is_cacheable = all(
+            six.get_unbound_function(getattr(type(self), name)) is
+            six.get_unbound_function(getattr(_PublishingHelpersMixin, name))
+            for name in ('has_publish_permission', 'has_preview_permission'))
+        if not is_cacheable:
+            return (self.has_publish_permission(request, obj),
+                    self.has_preview_permission(request, obj))
+        key = ('permissions', self.model, type(obj),
+               getattr(obj, 'has_been_published', False))
+        cache = self._get_request_cache(request)
+        if key not in cache:
+            has_publish_permission = self.has_publish_permission(request, obj)
+            cache[key] = (
+                has_publish_permission,
+                has_publish_permission or
+                self.has_preview_permission(request, obj),
+            )
+        return cache[key]
+
+    def _reverse_publishing_url(self, request, url_name, obj):
+        """
+        Reverse the given admin URL for an object, by reversing the URL once
+        per request and substituting the object's PK into it.
+        """
+        cache = self._get_request_cache(request)
+        key = ('url', url_name)
+        if key not in cache:
+            try:
+                cache[key] = reverse(url_name, args=(_URL_PK_PLACEHOLDER, ))
+            except NoReverseMatch:
+                cache[key] = None
+        url = cache[key]
+        if url is None:
+            raise NoReverseMatch("Reverse for '%s' not found" % url_name)
+        before, _sep, after = url.rpartition(_URL_PK_PLACEHOLDER)
+        return before + quote(force_text(obj.pk)) + after
+
+    def get_publishing_column_template(self):
+        """
+        Return the compiled template for the publishing column, which is
+        loaded once per admin.
+        """
+        if self._publishing_column_template is None:
+            self._publishing_column_template = loader.get_template(
+                self.publishing_column_template)
+        return self._publishing_column_template
+
     def publishing_column(self, obj):
         """
         Render publishing-related status icons and view links for display in
         the admin.
         """
-        # TODO Hack to convert polymorphic objects to real instances
+        # Convert polymorphic objects to real instances, if not already done
+        # by `get_publishing_changelist_results`
         if hasattr(obj, 'get_real_instance'):
             obj = obj.get_real_instance()
 
@@ -363,22 +536,21 @@ class _PublishingHelpersMixin(object):
         except (NoReverseMatch, AttributeError):
             object_url = ''
 
-        template_name = 'admin/publishing/_change_list_publishing_column.html'
-        t = loader.get_template(template_name)
+        has_publish_permission, has_preview_permission = \
+            self.get_publishing_column_permissions(self.request, obj)
+        t = self.get_publishing_column_template()
         c = Context({
             'object': obj,
             'object_url': object_url,
-            'has_publish_permission':
-                self.has_publish_permission(self.request, obj),
-            'has_preview_permission':
-                self.has_preview_permission(self.request, obj),
+            'has_publish_permission': has_publish_permission,
+            'has_preview_permission': has_preview_permission,
         })
         try:
             if isinstance(obj, PublishingModel):
-                c['publish_url'] = reverse(
-                    self.publish_reverse(type(obj)), args=(obj.pk, ))
-                c['unpublish_url'] = reverse(
-                    self.unpublish_reverse(type(obj)), args=(obj.pk, ))
+                c['publish_url'] = self._reverse_publishing_url(
+                    self.request, self.publish_reverse(type(obj)), obj)
+                c['unpublish_url'] = self._reverse_publishing_url(
+                    self.request, self.unpublish_reverse(type(obj)), obj)
         except NoReverseMatch:
             pass
         if django.VERSION >= (1, 10):
@@ -395,9 +567,11 @@ class _PublishingHelpersMixin(object):
             qs = self.model.objects.get_real_instances(qs)
         except AttributeError:
             pass
-        for q in qs:
-            if self.has_publish_permission(request, q):
-                q.publish()
+        drafts = [q for q in qs if self.has_publish_permission(request, q)]
+        if is_publishing_job_queue_enabled():
+            enqueue_publishing_jobs(request, drafts, 'publish')
+            return
+        bulk_publish(drafts)
 
     def unpublish(self, request, qs):
         """ Unpublish bulk action """
@@ -406,8 +580,10 @@ class _PublishingHelpersMixin(object):
             qs = self.model.objects.get_real_instances(qs)
         except AttributeError:
             pass
-        for q in qs:
-            q.unpublish()
+        if is_publishing_job_queue_enabled():
+            enqueue_publishing_jobs(request, qs, 'unpublish')
+            return
+        bulk_unpublish(qs)
 
 
 class PublishingAdmin(_PublishingHelpersMixin, ModelAdmin):
@@ -495,6 +671,10 @@ class PublishingAdmin(_PublishingHelpersMixin, ModelAdmin):
         # Use all draft object versions in the admin.
         qs = self.publishing_admin_filter_for_drafts(qs)
 
+        # Compute publishing status flags like `is_dirty` in the same query.
+        if hasattr(qs, 'with_publishing_status'):
+            qs = qs.with_publishing_status()
+
         # If ordering has been specified in the admin definition order by it.
         ordering = getattr(self, 'ordering', None) or ()
         if ordering:
@@ -514,6 +694,7 @@ class PublishingAdmin(_PublishingHelpersMixin, ModelAdmin):
         publish_name = '%spublish' % (self.get_url_name_prefix(), )
         unpublish_name = '%sunpublish' % (self.get_url_name_prefix(), )
         revert_name = '%srevert' % (self.get_url_name_prefix(), )
+        job_name = '%spublishing_job' % (self.get_url_name_prefix(), )
 
         publish_urls = [
             url(r'^(?P<object_id>\d+)/publish/$',
@@ -522,6 +703,8 @@ class PublishingAdmin(_PublishingHelpersMixin, ModelAdmin):
                 self.unpublish_view, name=unpublish_name),
             url(r'^(?P<object_id>\d+)/revert/$',
                 self.revert_view, name=revert_name),
+            url(r'^publishing-jobs/(?P<job_id>\d+)/$',
+                self.publishing_job_view, name=job_name),
         ]
 
         return publish_urls + urls
@@ -570,6 +753,9 @@ class PublishingAdmin(_PublishingHelpersMixin, ModelAdmin):
         if not self.has_publish_permission(request, obj):
             raise PermissionDenied
 
+        if is_publishing_job_queue_enabled():
+            return self.enqueue_publishing_job(request, obj, 'unpublish')
+
         obj.unpublish()
 
         if not request.is_ajax():
@@ -584,6 +770,9 @@ class PublishingAdmin(_PublishingHelpersMixin, ModelAdmin):
         if not self.has_publish_permission(request, obj):
             raise PermissionDenied
 
+        if is_publishing_job_queue_enabled():
+            return self.enqueue_publishing_job(request, obj, 'publish')
+
         obj.publish()
 
         if not request.is_ajax():
@@ -592,6 +781,47 @@ class PublishingAdmin(_PublishingHelpersMixin, ModelAdmin):
 
         return http_json_response({'success': True})
 
+    def enqueue_publishing_job(self, request, obj, action):
+        """
+        Queue the publishing action for the ``publishing_worker`` management
+        command and respond immediately, with the job's ID and status URL
+        for AJAX requests.
+        """
+        from .jobs.models import PublishingJob
+        job = PublishingJob.objects.enqueue(obj, action)
+
+        if not request.is_ajax():
+            messages.info(
+                request, _('%s has been queued.') % job.get_action_display())
+            return HttpResponseRedirect(reverse(self.changelist_reverse))
+
+        return http_json_response({
+            'success': True,
+            'job_id': job.pk,
+            'status_url': reverse(
+                '%s:%spublishing_job' % (
+                    self.admin_site.name, self.get_url_name_prefix()),
+                args=(job.pk, )),
+        })
+
+    def publishing_job_view(self, request, job_id):
+        """
+        Return the status of a queued publishing job as JSON.
+        """
+        from .jobs.models import PublishingJob
+        if not self.has_change_permission(request):
+            raise PermissionDenied
+
+        job = get_object_or_404(PublishingJob, pk=job_id)
+
+        # Only report on jobs for the objects managed by this admin, and not
+        # on jobs for models that no longer exist
+        model = job.content_type.model_class()
+        if model is None or not issubclass(model, self.model):
+            raise Http404
+
+        return http_json_response(job.get_status_data())
+
     def save_related(self, request, form, *args, **kwargs):
         """
         Send the signal `publishing_post_save_related` when a draft copy is
@@ -619,9 +849,10 @@ class PublishingAdmin(_PublishingHelpersMixin, ModelAdmin):
         """
         obj = context.get('original', None)
         if obj:
+            is_dirty = obj.is_dirty
             context['object'] = obj
             context['has_been_published'] = obj.has_been_published
-            context['is_dirty'] = obj.is_dirty
+            context['is_dirty'] = is_dirty
             context['has_preview_permission'] = \
                 self.has_preview_permission(request, obj)
 
@@ -639,7 +870,7 @@ class PublishingAdmin(_PublishingHelpersMixin, ModelAdmin):
                 # changes which are to be published show the publish button
                 # with relevant URL.
                 publish_btn = None
-                if obj.is_dirty:
+                if is_dirty:
                     publish_btn = reverse(
                         self.publish_reverse(type(obj)), args=(obj.pk, ))
 
@@ -655,7 +886,7 @@ class PublishingAdmin(_PublishingHelpersMixin, ModelAdmin):
                 # changes and a published version show a revert button to
                 # change back to the published information.
                 revert_btn = None
-                if obj.is_dirty and obj.publishing_linked:
+                if is_dirty and obj.publishing_linked:
                     revert_btn = reverse(
                         self.revert_reverse(type(obj)), args=(obj.pk, ))
 
@@ -3,6 +3,8 @@ import warnings
 import django
 from django.apps import AppConfig, apps
 from django.core.exceptions import MultipleObjectsReturned
+from django.db.models import Q
+from django.utils import timezone
 from django.utils.datastructures import OrderedSet
 from django.utils.translation import get_language
 
@@ -57,7 +59,6 @@ class AppConfig(AppConfig):
             return
         AppConfig.has_run_ready = True
 
-        from fluent_pages import appsettings
         from fluent_pages.models import UrlNode
         from fluent_pages.models.managers import UrlNodeQuerySet
         from fluent_pages.templatetags.fluent_pages_tags import register
@@ -75,7 +76,7 @@ class AppConfig(AppConfig):
             UrlNodeQuerySetWithPublishingFeatures, 
             _queryset_iterator,
         )
-        from .models import PublishingModel
+        from .models import PublishingModel, make_slugs_unique
 
         if 'render_menu' in register.tags:
             del register.tags['render_menu']
@@ -115,19 +116,45 @@ class AppConfig(AppConfig):
 
             Raises UrlNode.DoesNotExist when the item is not found.
             """
+            from fluentcms_publishing.middleware import is_draft_request_context
+            from fluentcms_publishing.utils import (
+                get_routing_index_entry, set_routing_index_entry)
+
             if language_code is None:
                 language_code = self._language or get_language()
 
+            qs = self._single_site()
+            site_id = getattr(qs._parent_site, 'pk', qs._parent_site)
+            is_draft = is_draft_request_context()
+
             # Don't normalize slashes, expect the URLs to be sane.
-            qs = self._single_site().filter(
+            qs = qs.filter(
                 translations___cached_url=path,
                 translations__language_code=language_code,
             )
 
+            # Fetch the node in the routing index for the path by PK, if it
+            # still matches the path and publishing status...
+            if site_id is not None:
+                pk = get_routing_index_entry(
+                    site_id, language_code, path, is_draft)
+                if pk is not None:
+                    matches = _filter_candidates_by_published_status(
+                        qs.filter(pk=pk))
+                    if matches:
+                        return _get_first_routable(
+                            matches, self.model, path, language_code)
+
+            # ...otherwise check all the candidates, and add the result to
+            # the routing index.
             matches = _filter_candidates_by_published_status(qs)
-            return _get_first_routable(
+            obj = _get_first_routable(
                 matches, self.model, path, language_code,
                 enforce_single_result=True)
+            if site_id is not None:
+                set_routing_index_entry(
+                    site_id, language_code, path, is_draft, obj.pk)
+            return obj
 
         # Monkey-patch `UrlNodeQuerySet.best_match_for_path` to add filtering
         # by publishing status.
@@ -145,11 +172,34 @@ class AppConfig(AppConfig):
                 .extra(select={'_url_length': 'LENGTH(_cached_url)'}) \
                 .order_by('-level', '-_url_length')  # / and /news/ is both level 0
 
-            matches = _filter_candidates_by_published_status(qs)
+            # Fetch only the best match
+            matches = list(_filter_queryset_by_published_status(qs)[:1])
             return _get_first_routable(
                 matches, self.model, path, language_code,
                 enforce_single_result=False)
 
+        def _filter_queryset_by_published_status(qs):
+            """
+            Filter a queryset of candidates in the database, with the same
+            outcome as `_filter_candidates_by_published_status`.
+            """
+            from fluentcms_publishing.managers import _publishable_submodels_q
+            from fluentcms_publishing.middleware import is_draft_request_context
+
+            if is_draft_request_context():
+                # Exclude published copies. Keeping a published copy would
+                # only add its draft copy with an identical URL, but such a
+                # draft copy is already a candidate for the same path.
+                return qs.exclude(_publishable_submodels_q(
+                    qs.model, publishing_is_draft=False))
+            # Exclude draft copies, and published copies that are not within
+            # any publication date restrictions.
+            now = timezone.now()
+            unpublished_q = Q(publishing_is_draft=True) \
+                | Q(publication_date__gt=now) \
+                | Q(publication_end_date__lte=now)
+            return qs.exclude(_publishable_submodels_q(qs.model, unpublished_q))
+
         def _filter_candidates_by_published_status(candidates):
             from fluentcms_publishing.middleware import is_draft_request_context
 
@@ -172,6 +222,7 @@ class AppConfig(AppConfig):
                                 candidate.get_absolute_url():
                             objs.add(draft_copy)
             else:
+                now = timezone.now()
                 for candidate in candidates:
                     # Keep candidates that are published, or that are not
                     # publishable (i.e. they don't have the `is_published`
@@ -179,11 +230,10 @@ class AppConfig(AppConfig):
                     if getattr(candidate, 'is_published', True):
                         # Skip candidates that are not within any publication
                         # date restrictions
-                        if (hasattr(candidate, 'is_within_publication_dates')
-                            and not candidate.is_within_publication_dates()
-                        ):
-                            pass
-                        else:
+                        if not hasattr(
+                                candidate, 'is_within_publication_dates'):
+                            objs.add(candidate)
+                        elif candidate.is_within_publication_dates(now):
                             objs.add(candidate)
             # Convert `OrderedSet` to a list which supports `len`, see
             # https://code.djangoproject.com/ticket/25093
@@ -327,7 +377,7 @@ class AppConfig(AppConfig):
                 @monkey_patch_override_method(model)
                 def _make_slug_unique(self, translation):
                     """
-                    Custom make slug unique checked.
+                    Custom make slug unique checked, see `make_slugs_unique`.
                     :param self: The object to which the slug is or will be
                     associated.
                     :param translation: The particular translation of the slug.
@@ -344,32 +394,7 @@ class AppConfig(AppConfig):
                         except type(self).publishing_draft.RelatedObjectDoesNotExist:
                             return
 
-                    original_slug = translation.slug
-                    count = 1
-                    while True:
-                        exclude_kwargs = {
-                            'pk__in': [],
-                        }
-                        if self:
-                            exclude_kwargs['pk__in'].append(self.pk)
-
-                        if self.publishing_linked_id:
-                            exclude_kwargs['pk__in'].append(self.publishing_linked_id)
-
-                        url_nodes = UrlNode.objects.filter(
-                            parent=self.parent_id,
-                            translations__slug=translation.slug,
-                            translations__language_code=translation.language_code
-                        ).exclude(**exclude_kwargs).non_polymorphic()
-
-                        if appsettings.FLUENT_PAGES_FILTER_SITE_ID:
-                            url_nodes = url_nodes.parent_site(self.parent_site_id)
-
-                        if not url_nodes.exists():
-                            break
-
-                        count += 1
-                        translation.slug = '%s-%d' % (original_slug, count)
+                    make_slugs_unique([(self, translation)])
 
             if issubclass(model, MPTTModel):
 
@@ -411,12 +436,23 @@ class AppConfig(AppConfig):
                     Replace `mptt.models.MPTTModel.get_descendants` with a version that
                     returns only draft or published copy descendants, as appopriate.
                     """
-                    qs = self._original_get_descendants(include_self=include_self)
-                    if not ignore_publish_status:
-                        return type(self).objects.filter(
-                            pk__in=qs.values_list('pk', flat=True),
-                            publishing_is_draft=self.publishing_is_draft)
-                    return qs
+                    if ignore_publish_status:
+                        return self._original_get_descendants(
+                            include_self=include_self)
+                    # Filter on the nested set fields directly, which draft and
+                    # published copies share, in one flat query.
+                    opts = self._mptt_meta
+                    left = getattr(self, opts.left_attr)
+                    right = getattr(self, opts.right_attr)
+                    if not include_self:
+                        left += 1
+                        right -= 1
+                    return type(self).objects.filter(**{
+                        opts.tree_id_attr: getattr(self, opts.tree_id_attr),
+                        '%s__gte' % opts.left_attr: left,
+                        '%s__lte' % opts.left_attr: right,
+                        'publishing_is_draft': self.publishing_is_draft,
+                    }).order_by(opts.tree_id_attr, opts.left_attr)
 
                 @monkey_patch_override_method(model)
                 def get_ancestors(self, ascending=False, include_self=False,
@@ -425,10 +461,36 @@ class AppConfig(AppConfig):
                     Replace `mptt.models.MPTTModel.get_ancestors` with a version that
                     returns only draft or published copy ancestors, as appopriate.
                     """
-                    qs = self._original_get_ancestors(
-                        ascending=ascending, include_self=include_self)
-                    if not ignore_publish_status:
-                        return type(self).objects.filter(
-                            pk__in=qs.values_list('pk', flat=True),
-                            publishing_is_draft=self.publishing_is_draft)
-                    return qs
+                    if ignore_publish_status:
+                        return self._original_get_ancestors(
+                            ascending=ascending, include_self=include_self)
+                    # Filter on the nested set fields directly, which draft and
+                    # published copies share, in one flat query.
+                    opts = self._mptt_meta
+                    left = getattr(self, opts.left_attr)
+                    right = getattr(self, opts.right_attr)
+                    if not include_self:
+                        left -= 1
+                        right += 1
+                    return type(self).objects.filter(**{
+                        opts.tree_id_attr: getattr(self, opts.tree_id_attr),
+                        '%s__lte' % opts.left_attr: left,
+                        '%s__gte' % opts.right_attr: right,
+                        'publishing_is_draft': self.publishing_is_draft,
+                    }).order_by(
+                        ('-%s' if ascending else '%s') % opts.left_attr)
+
+                def get_cached_ancestors(self):
+                    """
+                    Return the list of draft or published copy ancestors of
+                    this item, as appropriate, from root to parent. The list
+                    is cached on the item, and shared with Fluent's
+                    `breadcrumb`, so it is fetched at most once per request
+                    for the current page.
+                    """
+                    if not getattr(self, '_cached_ancestors', None):
+                        self._cached_ancestors = list(self.get_ancestors())
+                    return self._cached_ancestors
+
+                if not hasattr(model, 'get_cached_ancestors'):
+                    model.get_cached_ancestors = get_cached_ancestors
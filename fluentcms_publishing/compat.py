@@ -1,7 +1,14 @@
 # -*- coding: utf-8 -*-
 
+import threading
+
 import django
 
+try:
+    from contextvars import ContextVar
+except ImportError:
+    ContextVar = None
+
 
 def get_m2m_with_model(model):
     if django.VERSION < (1, 8):
@@ -27,3 +34,51 @@ def get_all_related_objects(opts, local_only=False, include_hidden=False, includ
             local_only=local_only, include_hidden=include_hidden, include_proxy_eq=include_proxy_eq)
     else:
         return [r for r in opts.related_objects if not r.field.many_to_many]
+
+
+if ContextVar is None:
+    class ContextVar(object):
+        """
+        Minimal stand-in for `contextvars.ContextVar` on Python versions
+        without it, storing values in thread-local (or greenlet-local, when
+        monkey-patched by gevent) storage.
+        """
+        _MISSING = object()
+
+        class Token(object):
+            def __init__(self, var, old_value):
+                self.var = var
+                self.old_value = old_value
+
+        def __init__(self, name, default=_MISSING):
+            self.name = name
+            self._default = default
+            self._local = threading.local()
+
+        def get(self, *args):
+            try:
+                return self._local.value
+            except AttributeError:
+                pass
+            if args:
+                return args[0]
+            if self._default is not self._MISSING:
+                return self._default
+            raise LookupError(self)
+
+        def set(self, value):
+            token = self.Token(
+                self, getattr(self._local, 'value', self._MISSING))
+            self._local.value = value
+            return token
+
+        def reset(self, token):
+            if token.var is not self:
+                raise ValueError('Token was created by a different ContextVar')
+            if token.old_value is self._MISSING:
+                try:
+                    del self._local.value
+                except AttributeError:
+                    pass
+            else:
+                self._local.value = token.old_value
@@ -0,0 +1 @@
+default_app_config = '%s.apps.AppConfig' % __name__
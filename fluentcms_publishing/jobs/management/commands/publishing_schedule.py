@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from ....utils import get_publishable_models
+from ...models import _has_publication_dates, schedule_publication_transitions
+
+
+class Command(BaseCommand):
+    help = ('Schedule publication date transitions for all published items, '
+            'such as after enabling the publishing scheduler.')
+
+    def handle(self, *args, **options):
+        seen = set()
+        for model in get_publishable_models():
+            if model._meta.proxy or not _has_publication_dates(model):
+                continue
+            drafts = model._default_manager \
+                .filter(publishing_is_draft=True,
+                        publishing_linked__isnull=False) \
+                .select_related('publishing_linked')
+            for draft in drafts:
+                # Skip items already seen via a parent model
+                key = (draft._meta.concrete_model, draft.pk)
+                if key in seen:
+                    continue
+                seen.add(key)
+                schedule_publication_transitions(draft)
+        if options['verbosity'] > 0:
+            self.stdout.write(
+                'Scheduled publication dates for %d items' % len(seen))
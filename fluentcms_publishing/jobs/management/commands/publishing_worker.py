@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ...models import PublishingJob
+
+
+class Command(BaseCommand):
+    help = 'Run queued publishing jobs outside of admin requests.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            default=False,
+            help='Run the pending jobs then exit, instead of waiting for '
+                 'new jobs.',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1.0,
+            help='Seconds to wait between checks for new jobs.',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            job = PublishingJob.objects.claim()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['interval'])
+                continue
+            job.run()
+            if options['verbosity'] > 0:
+                self.stdout.write(
+                    '%s job %s: %s' % (
+                        job.get_action_display(), job.pk, job.status))
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fluentcms_publishing_jobs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='publishingjob',
+            name='run_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterIndexTogether(
+            name='publishingjob',
+            index_together=set([('status', 'run_at')]),
+        ),
+    ]
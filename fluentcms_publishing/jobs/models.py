@@ -0,0 +1,270 @@
+import traceback
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.contenttypes.fields import GenericForeignKey
+from django.contrib.contenttypes.models import ContentType
+from django.db import connections, models, transaction
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.encoding import python_2_unicode_compatible
+from django.utils.translation import ugettext_lazy as _
+
+from .. import signals as publishing_signals
+from ..utils import is_publishing_scheduler_enabled
+
+
+class PublishingJobQuerySet(models.QuerySet):
+
+    def pending(self):
+        return self.filter(status=PublishingJob.PENDING)
+
+    def due(self, timestamp=None):
+        """
+        Return pending jobs that are due to run at the given timestamp, or
+        ``now()`` by default.
+        """
+        if timestamp is None:
+            timestamp = timezone.now()
+        return self.pending().filter(run_at__lte=timestamp)
+
+    def stale(self, timestamp=None):
+        """
+        Return jobs that have been running for longer than
+        ``FLUENTCMS_PUBLISHING_JOB_TIMEOUT`` seconds at the given timestamp,
+        or ``now()`` by default, such as jobs left running by a worker that
+        crashed.
+        """
+        if timestamp is None:
+            timestamp = timezone.now()
+        timeout = getattr(settings, 'FLUENTCMS_PUBLISHING_JOB_TIMEOUT', 3600)
+        return self.filter(
+            status=PublishingJob.RUNNING,
+            started_at__lt=timestamp - timedelta(seconds=timeout))
+
+    def requeue_stale(self):
+        """
+        Mark stale jobs as pending again so they are run by another worker,
+        and return how many were re-queued. This is safe because a job's
+        action is run in a transaction, so it has no effect unless the job
+        finished.
+        """
+        return self.stale().update(
+            status=PublishingJob.PENDING,
+            started_at=None,
+            error='Re-queued after running for too long',
+        )
+
+    def for_object(self, obj):
+        return self.filter(
+            content_type=ContentType.objects.get_for_model(obj),
+            object_id=obj.pk)
+
+    def enqueue(self, obj, action, run_at=None):
+        """
+        Queue a job to run the given publishing action, either 'publish' or
+        'unpublish', on the given draft object as soon as possible or at the
+        given ``run_at`` time. An existing pending job for the same object and
+        action that is due at the same time is returned instead of queuing
+        another.
+        """
+        if action not in dict(PublishingJob.ACTION_CHOICES):
+            raise ValueError("Unknown publishing action %r" % action)
+        jobs = self.for_object(obj).filter(action=action)
+        if run_at is None:
+            run_at = timezone.now()
+            job = jobs.due(run_at).first()
+        else:
+            job = jobs.pending().filter(run_at=run_at).first()
+        if job is None:
+            job = self.create(
+                content_type=ContentType.objects.get_for_model(obj),
+                object_id=obj.pk,
+                action=action,
+                run_at=run_at,
+            )
+        return job
+
+    def claim(self):
+        """
+        Claim the earliest due job by marking it as running, and return it.
+        Return None if there are no due jobs.
+
+        Stale jobs are re-queued first, see ``requeue_stale``.
+        """
+        connection = connections[self.db]
+        self.requeue_stale()
+        while True:
+            with transaction.atomic(using=self.db):
+                candidates = self.due().order_by('run_at', 'pk')
+                # Lock the candidate row, and skip rows already locked by
+                # other workers, where the database supports it.
+                if connection.features.has_select_for_update_skip_locked:
+                    candidates = candidates.select_for_update(
+                        skip_locked=True)
+                job = candidates.first()
+                if job is None:
+                    return None
+                # Claim the job with a conditional update, which also guards
+                # against other workers on databases without row locks, such
+                # as SQLite which locks the whole database for writes instead.
+                started_at = timezone.now()
+                claimed = self.pending().filter(pk=job.pk).update(
+                    status=PublishingJob.RUNNING, started_at=started_at)
+            if claimed:
+                job.status = PublishingJob.RUNNING
+                job.started_at = started_at
+                return job
+
+
+@python_2_unicode_compatible
+class PublishingJob(models.Model):
+    """
+    A publishing action queued to be run outside of the admin HTTP request
+    by the ``publishing_worker`` management command.
+    """
+    PUBLISH = 'publish'
+    UNPUBLISH = 'unpublish'
+    ACTION_CHOICES = (
+        (PUBLISH, _('Publish')),
+        (UNPUBLISH, _('Unpublish')),
+    )
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, _('Pending')),
+        (RUNNING, _('Running')),
+        (DONE, _('Done')),
+        (FAILED, _('Failed')),
+    )
+
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    content_object = GenericForeignKey('content_type', 'object_id')
+    action = models.CharField(max_length=20, choices=ACTION_CHOICES)
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=PENDING,
+        db_index=True,
+    )
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+    # The time from which the job is due to run, which is in the future for
+    # scheduled publication date transitions.
+    run_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, editable=False)
+    finished_at = models.DateTimeField(null=True, editable=False)
+
+    objects = PublishingJobQuerySet.as_manager()
+
+    class Meta:
+        ordering = ('pk',)
+        index_together = (
+            ('status', 'run_at'),
+        )
+        verbose_name = _('publishing job')
+        verbose_name_plural = _('publishing jobs')
+
+    def __str__(self):
+        return '%s %s #%s (%s)' % (
+            self.get_action_display(), self.content_type, self.object_id,
+            self.get_status_display())
+
+    def run(self):
+        """
+        Run the publishing action of a claimed job and record its outcome.
+        """
+        try:
+            with transaction.atomic():
+                model = self.content_type.model_class()
+                obj = model._default_manager.select_for_update() \
+                    .get(pk=self.object_id)
+                getattr(obj, self.action)()
+        except Exception:
+            self.status = self.FAILED
+            self.error = traceback.format_exc()
+        else:
+            self.status = self.DONE
+        self.finished_at = timezone.now()
+        self.save(update_fields=['status', 'error', 'finished_at'])
+
+    def get_status_data(self):
+        """
+        Return the job's status as a dict suitable for JSON serialisation.
+        """
+        def isoformat(value):
+            return value.isoformat() if value else None
+        return {
+            'id': self.pk,
+            'action': self.action,
+            'status': self.status,
+            'error': self.error,
+            'created_at': isoformat(self.created_at),
+            'run_at': isoformat(self.run_at),
+            'started_at': isoformat(self.started_at),
+            'finished_at': isoformat(self.finished_at),
+        }
+
+
+def schedule_publication_transitions(draft):
+    """
+    Schedule a job to apply the publication end date of the published copy
+    of the given draft, by unpublishing it when the date is reached.
+
+    A published copy past its publication end date is unpublished
+    immediately, so public queries need not filter by end dates. A published
+    copy before its publication date is kept as approved, and hidden from the
+    public by its publication date until then, so later unpublished changes
+    to the draft are never published by the scheduler.
+    """
+    published = draft.publishing_linked
+    if published is None:
+        return
+    cancel_scheduled_publication_transitions(draft)
+    end_date = published.publication_end_date
+    if end_date and end_date <= timezone.now():
+        draft.unpublish()
+    elif end_date:
+        PublishingJob.objects.enqueue(
+            draft, PublishingJob.UNPUBLISH, run_at=end_date)
+
+
+def cancel_scheduled_publication_transitions(draft):
+    """
+    Delete any jobs scheduled to run in the future for the given draft.
+    """
+    PublishingJob.objects.pending().for_object(draft) \
+        .filter(run_at__gt=timezone.now()) \
+        .delete()
+
+
+def _has_publication_dates(instance):
+    return hasattr(instance, 'publication_date') \
+        and hasattr(instance, 'publication_end_date')
+
+
+@receiver(publishing_signals.publishing_post_publish)
+@receiver(publishing_signals.publishing_post_publish_batch)
+def schedule_publication_transitions_on_publish(
+        sender, instance=None, instances=None, **kwargs):
+    if not is_publishing_scheduler_enabled():
+        return
+    for draft in instances or [instance]:
+        if _has_publication_dates(draft):
+            schedule_publication_transitions(draft)
+
+
+@receiver(publishing_signals.publishing_post_unpublish)
+@receiver(publishing_signals.publishing_post_unpublish_batch)
+def cancel_scheduled_publication_transitions_on_unpublish(
+        sender, instance=None, instances=None, **kwargs):
+    if not is_publishing_scheduler_enabled():
+        return
+    for draft in instances or [instance]:
+        if _has_publication_dates(draft):
+            cancel_scheduled_publication_transitions(draft)
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from ...utils import rotate_draft_secret_key
+
+
+class Command(BaseCommand):
+    help = ('Replace the secret key used to sign draft URLs, which '
+            'invalidates all existing draft URLs.')
+
+    def handle(self, *args, **options):
+        rotate_draft_secret_key()
+        if options['verbosity'] > 0:
+            self.stdout.write('Draft secret key has been rotated')
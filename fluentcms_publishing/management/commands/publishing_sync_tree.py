@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from ...models import sync_mptt_tree_fields_from_drafts_to_published
+
+
+def _format_value(value):
+    # Report related items by PK, which needs no translations or queries
+    return getattr(value, 'pk', value)
+
+
+class Command(BaseCommand):
+    help = ('Sync the tree structure of all published copies with their '
+            'drafts, such as after failed publishes or raw imports.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            default=False,
+            help='Report the changes that would be made, without making '
+                 'them.',
+        )
+
+    def handle(self, *args, **options):
+        count = 0
+        with transaction.atomic():
+            for item, field, old_value, new_value in \
+                    sync_mptt_tree_fields_from_drafts_to_published(
+                        dry_run=options['dry_run']):
+                count += 1
+                if options['verbosity'] > 0:
+                    self.stdout.write('%s #%s %s: %s -> %s' % (
+                        type(item).__name__, item.pk, field,
+                        _format_value(old_value), _format_value(new_value)))
+        if options['verbosity'] > 0:
+            self.stdout.write('%s %d changes' % (
+                'Found' if options['dry_run'] else 'Made', count))
@@ -1,7 +1,11 @@
+import copy
+
 import django
+import six
 from django.db import models
+from django.db.models import BooleanField, Case, F, Q, Subquery, When
+from django.db.models.functions import Coalesce
 from django.db.models.query import QuerySet
-from django.db.models.query_utils import Q
 from django.utils.timezone import now
 try:
     from django.db.models.query import BaseIterable, ModelIterable
@@ -115,79 +119,157 @@ def _exchange_for_published(qs):
     in the DB because FK/M2M relationships assigned in the site admin are
     *always* to draft objects. Instead we exchange draft items for
     published copies.
+
+    The exchange is expressed as subqueries against the original queryset
+    over ``publishing_linked`` so nothing is executed until the resulting
+    queryset is evaluated, and operations like ``count()``, ``exists()`` and
+    slicing are performed by the DB instead of in Python.
+
+    The ordering, ``select_related()``, ``prefetch_related()``, deferred
+    fields and ``annotate()`` calls of the original queryset are applied to
+    the published copies too. Annotations are computed afresh for the
+    published copies.
     """
-    # TODO: Can this be lazily executed when a queryset is evaluated?
-    # Currently any `published()` queryset will obtain its list available
-    # published PKs when this function is called, which might not be
-    # immediately before the queryset is evaluated. It might be possible
-    # to pass a subquery instead of collecting PKs into a list to pass?
-    published_version_pks = []
-    draft_version_pks = []
-    is_exchange_required = False
-    # Use direct DB query if possible (be sure to prioritise the ordering of
-    # the draft items over the published items by checking the draft items
-    # first, since the draft item ordering may be explicitly set via admin)...
+    # A sliced queryset cannot be filtered further, so wrap it in a subquery
+    # of its PKs which can be.
+    source_qs = qs
+    if not source_qs.query.can_filter():
+        source_qs = qs.model.objects.filter(pk__in=qs.values('pk'))
+
+    # Use direct DB query if possible...
     from .models import PublishingModel
     if issubclass(qs.model, PublishingModel):
-        for pk, publishing_is_draft, publishing_linked_id in qs.values_list(
-                'pk', 'publishing_is_draft', 'publishing_linked_id'):
-            # If item is draft and if it has a linked published copy, exchange
-            # the draft to get the published copy instead...
-            if publishing_is_draft:
-                draft_version_pks.append(pk)
-                if publishing_linked_id:
-                    published_version_pks.append(publishing_linked_id)
-                    is_exchange_required = True
-            # ...otherwise if item is already the published copy, use it.
-            elif not publishing_is_draft:
-                published_version_pks.append(pk)
-    # ...otherwise we are forced to retrieve the real instances to check fields
-    # and we may be dealing with a UrlNode model without our own publishing
-    # fields so be defensive in our field lookups.
-    else:
-        for item in qs:
-            # If item is draft and if it has a linked published copy, exchange
-            # the draft to get the published copy instead...
-            if getattr(item, 'publishing_is_draft', None):
-                draft_version_pks.append(item.pk)
-                if getattr(item, 'publishing_linked_id', None):
-                    published_version_pks.append(item.publishing_linked_id)
-                    is_exchange_required = True
-            # ...otherwise if item is already the published copy, use it.
-            elif getattr(item, 'is_published', None):
-                published_version_pks.append(item.pk)
-    # Only perform exchange query and re-ordering if necessary
-    if not is_exchange_required:
-        # If no exchange is required, we must make sure any draft items we
-        # found are excluded from the queryset since we won't be filtering by
-        # published-item PKs
-        return qs.exclude(pk__in=draft_version_pks)
+        # Keep items that are already the published copy, plus the published
+        # copies linked from draft items.
+        published_filter = \
+            Q(pk__in=Subquery(
+                source_qs.filter(publishing_is_draft=False).values('pk'))) \
+            | Q(pk__in=Subquery(
+                source_qs.filter(publishing_is_draft=True,
+                                 publishing_linked__isnull=False)
+                .values('publishing_linked')))
+    # ...otherwise we may be dealing with a UrlNode model without our own
+    # publishing fields, in which case these fields live on the tables of the
+    # publishable page types so we look up drafts and their published copies
+    # per publishable model.
     else:
-        # TODO: Salvage more attributes from the original queryset, such as
-        # `annotate()`, `distinct()`, `select_related()`, `values()`, etc.
-        qs = qs.model.objects.filter(pk__in=published_version_pks)
-        # Restore ordering from original queryset.
-        qs = _order_by_pks(qs, published_version_pks)
-        return qs
+        published_filter = \
+            Q(status=UrlNode.PUBLISHED) \
+            & Q(pk__in=Subquery(source_qs.values('pk')))
+        for model in _get_publishable_submodels(qs.model):
+            model_drafts_qs = model._base_manager \
+                .filter(publishing_is_draft=True)
+            # Drafts are never returned, whatever their Fluent status...
+            published_filter &= \
+                ~Q(pk__in=Subquery(model_drafts_qs.values('pk')))
+            # ...instead we get their published copies.
+            published_filter |= Q(pk__in=Subquery(
+                model_drafts_qs
+                .filter(pk__in=Subquery(source_qs.values('pk')),
+                        publishing_linked__isnull=False)
+                .values('publishing_linked')))
+
+    # TODO: Salvage more attributes from the original queryset, such as
+    # `distinct()`, `extra()`, `values()`, etc.
+    exchanged_qs = qs.model.objects.filter(published_filter)
+    # Load items like the original queryset, whose options refer to fields by
+    # name so apply as well to the published copies...
+    exchanged_qs.query.select_related = \
+        copy.deepcopy(qs.query.select_related)
+    exchanged_qs.query.deferred_loading = (
+        copy.copy(qs.query.deferred_loading[0]),
+        qs.query.deferred_loading[1])
+    exchanged_qs = exchanged_qs.prefetch_related(
+        *qs._prefetch_related_lookups)
+    # ...and repeat its annotations, since the resolved annotations of the
+    # original queryset refer to its own joins.
+    for args, kwargs in getattr(qs, '_publishing_annotate_calls', ()):
+        exchanged_qs = exchanged_qs.annotate(*args, **kwargs)
+    # Restore ordering from original queryset.
+    return _order_by_draft_ordering(exchanged_qs, qs)
+
+
+def _get_publishable_submodels(model):
+    """
+    Return the concrete publishable models that are, or inherit from, the given
+    model.
+    """
+    from .utils import get_publishable_models
+    return [
+        m for m in get_publishable_models()
+        if issubclass(m, model) and not m._meta.proxy
+    ]
+
+
+# Items that are published, or are drafts with a published copy, as for
+# `PublishingModel.has_been_published`
+HAS_BEEN_PUBLISHED_Q = \
+    Q(publishing_is_draft=False) | Q(publishing_linked__isnull=False)
 
 
-def _order_by_pks(qs, pks):
+def _publishable_submodels_q(model, *args, **kwargs):
     """
-    Adjust the given queryset to order items according to the explicit ordering
-    of PKs provided.
+    Return a filter for items of the given model, such as ``UrlNode``, that
+    are instances of publishable child models matching the given filter
+    arguments, with a subquery per publishable child model.
+    """
+    q = Q(pk__in=[])
+    for submodel in _get_publishable_submodels(model):
+        q |= Q(pk__in=Subquery(
+            submodel._base_manager.filter(*args, **kwargs).values('pk')))
+    return q
+
 
-    This is a PostgreSQL-specific DB hack, based on:
-    blog.mathieu-leplatre.info/django-create-a-queryset-from-a-list-preserving-order.html
+def _order_by_draft_ordering(qs, source_qs):
+    """
+    Adjust the given queryset of published copies to order items according
+    to the ordering of the source queryset, prioritising the ordering of the
+    draft items over the published items since the draft item ordering may be
+    explicitly set via admin.
+
+    Published copies share the field values of their drafts, except for those
+    like the PK that are unique to each copy, so each ordering column is read
+    from the draft copy via a join on ``publishing_linked`` and only falls back
+    to the published copy's own column if there is no draft.
     """
-    pk_colname = '%s.%s' % (
-        qs.model._meta.db_table, qs.model._meta.pk.column)
-    clauses = ' '.join(
-        ['WHEN %s=%s THEN %s' % (pk_colname, pk, i)
-            for i, pk in enumerate(pks)]
-    )
-    ordering = 'CASE %s END' % clauses
-    return qs.extra(
-        select={'pk_ordering': ordering}, order_by=('pk_ordering',))
+    if source_qs.query.order_by:
+        ordering = source_qs.query.order_by
+    elif source_qs.query.default_ordering:
+        ordering = qs.model._meta.ordering
+    else:
+        ordering = ()
+
+    from .models import PublishingModel
+    is_publishable = issubclass(qs.model, PublishingModel)
+    draft_ordering = []
+    for field_name in ordering:
+        # Keep ordering expressions and random ordering as-is, order by
+        # annotations of the items themselves, and skip ordering by
+        # annotations we do not carry over from the source.
+        if not isinstance(field_name, six.string_types) or field_name == '?':
+            draft_ordering.append(field_name)
+            continue
+        descending = field_name.startswith('-')
+        field_name = field_name.lstrip('-')
+        if field_name in qs.query.annotations:
+            draft_ordering.append(
+                '-' + field_name if descending else field_name)
+            continue
+        if field_name in source_qs.query.annotations:
+            continue
+        # UrlNode models without our publishing fields have no link to the
+        # draft copy, so can only be ordered by their own columns.
+        if not is_publishable:
+            draft_ordering.append(
+                '-' + field_name if descending else field_name)
+            continue
+        expression = Coalesce(
+            F('publishing_draft__%s' % field_name), F(field_name))
+        draft_ordering.append(
+            expression.desc() if descending else expression.asc())
+    if draft_ordering:
+        qs = qs.order_by(*draft_ordering)
+    return qs
 
 
 def _queryset_visible(qs):
@@ -266,6 +348,20 @@ class PublishingQuerySet(QuerySet):
         super(PublishingQuerySet, self).__init__(*args, **kwargs)
         if django.VERSION > (1, 8):
             self._iterable_class = PublishingIterable
+        # The arguments of `annotate` calls, to repeat them when exchanging
+        # items for their published copies
+        self._publishing_annotate_calls = ()
+
+    def _clone(self, *args, **kwargs):
+        c = super(PublishingQuerySet, self)._clone(*args, **kwargs)
+        c._publishing_annotate_calls = self._publishing_annotate_calls
+        return c
+
+    def annotate(self, *args, **kwargs):
+        c = super(PublishingQuerySet, self).annotate(*args, **kwargs)
+        c._publishing_annotate_calls = \
+            self._publishing_annotate_calls + ((args, kwargs), )
+        return c
 
     def visible(self):
         return _queryset_visible(self)
@@ -334,6 +430,71 @@ class PublishingQuerySet(QuerySet):
     def exchange_for_published(self):
         return _exchange_for_published(self)
 
+    def with_publishing_status(self):
+        """
+        Annotate items with publishing status flags computed in SQL, which are
+        used by the corresponding ``PublishingModel`` properties instead of
+        loading related objects:
+
+        - ``publishing_status_is_published``: the item is published, or is a
+          draft with a published copy (see ``has_been_published``)
+        - ``publishing_status_is_out_of_date``: the item is a draft with a
+          published copy that is older than the draft
+        - ``publishing_status_is_dirty``: the item is a draft that is
+          unpublished or out-of-date (see ``is_dirty``)
+        """
+        # NOTE: Fluent content items have no modification times of their own,
+        # edits to them are saved with their parent item, which updates its
+        # `publishing_modified_at` time.
+        out_of_date_q = Q(
+            publishing_modified_at__gt=F(
+                'publishing_linked__publishing_modified_at'),
+            publishing_is_draft=True,
+            publishing_linked__isnull=False,
+        )
+        return self.annotate(
+            publishing_status_is_published=Case(
+                When(publishing_is_draft=False, then=True),
+                When(publishing_linked__isnull=False, then=True),
+                default=False,
+                output_field=BooleanField(),
+            ),
+            publishing_status_is_out_of_date=Case(
+                When(out_of_date_q, then=True),
+                default=False,
+                output_field=BooleanField(),
+            ),
+            publishing_status_is_dirty=Case(
+                When(publishing_is_draft=False, then=False),
+                When(publishing_linked__isnull=True, then=True),
+                When(out_of_date_q, then=True),
+                default=False,
+                output_field=BooleanField(),
+            ),
+        )
+
+    def publish(self, batch_signals=False):
+        """
+        Publish all the draft items in the queryset together, using bulk
+        operations where possible. See ``models.bulk_publish``.
+
+        Returns a list of the published copies.
+        """
+        from .models import bulk_publish
+        return bulk_publish(self.draft(), batch_signals=batch_signals)
+    publish.alters_data = True
+    publish.queryset_only = True
+
+    def unpublish(self, batch_signals=False):
+        """
+        Unpublish all the published draft items in the queryset together,
+        using bulk operations where possible. See ``models.bulk_unpublish``.
+        """
+        from .models import bulk_unpublish
+        bulk_unpublish(self.draft(), batch_signals=batch_signals)
+    unpublish.alters_data = True
+    unpublish.queryset_only = True
+
     def iterator(self):
         return _queryset_iterator(self)
 
@@ -378,6 +539,8 @@ class PublishingUrlNodeQuerySet(PublishingQuerySet, UrlNodeQuerySet):
 
         # Exclude by publication date on the published version of items, *not*
         # the draft vesion, or we could get the wrong result.
+        # NOTE: End dates are checked even when the publishing scheduler
+        # unpublishes items past them, in case its jobs run late.
         # Exclude fields of published copy of draft items, not draft itself...
         queryset = queryset.exclude(
             Q(publishing_is_draft=True) & Q(
@@ -1,11 +1,22 @@
+import hashlib
 import inspect
 from contextlib import contextmanager
-from threading import current_thread
 
+from django.conf import settings
+from django.core.cache import cache
 from django.core.urlresolvers import Resolver404, resolve
 from django.http import HttpResponseRedirect
+from django.utils import translation
+from django.utils.cache import cc_delim_re, has_vary_header
+from django.utils.encoding import escape_uri_path, force_bytes
+from django.utils.functional import cached_property
+from django.utils.module_loading import import_string
 
-from .utils import get_draft_url, verify_draft_url
+from .compat import ContextVar
+from .utils import (
+    get_draft_url, get_published_page_cache_timeout,
+    get_published_page_cache_version, get_published_page_version,
+    set_published_page_version, verify_draft_hmac)
 
 
 class PublishingMiddleware(object):
@@ -13,47 +24,111 @@ class PublishingMiddleware(object):
     Publishing middleware to set status flags and apply features:
         - permit members of the "Content Reviewers" group to view drafts
         - track whether this middleware has been activated for the current
-          thread, so we can tell when it is safe to trust the status it reports
+          request context, so we can tell when it is safe to trust the status
+          it reports
         - store the current user for use within the publishing manager where
           we do not have access to the ``request`` object.
         - set draft status flag if request context permits viewing drafts.
     """
-    _draft_request_context = {}
-    _middleware_active_status = {}
-    _current_user = {}
+    # Request state is kept in context variables, which are isolated per
+    # thread, greenlet and async task.
+    _draft_request_context = ContextVar(
+        'fluentcms_publishing_draft_request_context', default=False)
+    _middleware_active_status = ContextVar(
+        'fluentcms_publishing_middleware_active_status', default=False)
+    _current_user = ContextVar(
+        'fluentcms_publishing_current_user', default=None)
     _draft_only_views = [
     ]
 
+    # Cache of `(draft_only_views, view_callables, view_names)` precompiled
+    # from `_draft_only_views`
+    _draft_only_views_cache = None
+
     @staticmethod
-    def is_admin_request(request):
+    def get_request_classification(request):
+        """
+        Return the lazily computed `PublishingRequestClassification` of the
+        request, which is stored on the request.
+        """
         try:
-            return resolve(request.path).app_name == 'admin'
-        except Resolver404:
-            return False
+            return request._publishing_classification
+        except AttributeError:
+            pass
+        classification = PublishingRequestClassification(request)
+        request._publishing_classification = classification
+        return classification
+
+    @staticmethod
+    def is_admin_request(request):
+        return PublishingMiddleware.get_request_classification(request) \
+            .is_admin_request
 
     @staticmethod
     def is_draft_only_view(request):
-        resolved = resolve(request.path)
-        if inspect.isfunction(resolved.func):
-            view_name = resolved.func.__name__
+        return PublishingMiddleware.get_request_classification(request) \
+            .is_draft_only_view
+
+    @staticmethod
+    def is_draft_only_view_func(func):
+        """
+        Is the given view callable listed in `_draft_only_views`?
+        """
+        draft_only_views = tuple(PublishingMiddleware._draft_only_views)
+        cache = PublishingMiddleware._draft_only_views_cache
+        if cache is None or cache[0] != draft_only_views:
+            view_callables = set()
+            for name in draft_only_views:
+                try:
+                    view_callables.add(import_string(name))
+                except ImportError:
+                    pass
+            cache = (
+                draft_only_views, view_callables, frozenset(draft_only_views))
+            PublishingMiddleware._draft_only_views_cache = cache
+        draft_only_views, view_callables, view_names = cache
+        if not draft_only_views:
+            return False
+        # Match view functions, class-based views, and view class instances
+        for view in (func, getattr(func, 'view_class', None), type(func)):
+            try:
+                if view in view_callables:
+                    return True
+            except TypeError:  # Unhashable
+                pass
+        # Fall back to matching by the view's dotted path name
+        if inspect.isfunction(func):
+            view_name = func.__name__
         else:  # Possible class view
-            view_name = type(resolved.func).__name__
-        name = '%s.%s' % (resolved.func.__module__, view_name)
-        return name in PublishingMiddleware._draft_only_views
+            view_name = type(func).__name__
+        return '%s.%s' % (func.__module__, view_name) in view_names
 
     @staticmethod
     def is_content_reviewer_user(request):
-        return request.user.is_authenticated() \
-            and request.user.groups.filter(name='Content Reviewers').exists()
+        return PublishingMiddleware.get_request_classification(request) \
+            .is_content_reviewer_user
 
     @staticmethod
     def is_staff_user(request):
-        return request.user.is_authenticated() and request.user.is_staff
+        return PublishingMiddleware.get_request_classification(request) \
+            .is_staff_user
 
     @staticmethod
     def is_draft_request(request):
         """ Is this request explicly flagged as for draft content? """
-        return 'edit' in request.GET
+        return PublishingMiddleware.get_request_classification(request) \
+            .is_draft_request
+
+    @staticmethod
+    def is_verified_draft_request(request):
+        """
+        Does this request have a valid draft mode HMAC in its querystring?
+
+        The result is stored on the request, so each request is verified at
+        most once.
+        """
+        return PublishingMiddleware.get_request_classification(request) \
+            .is_verified_draft_request
 
     @staticmethod
     def is_draft(request):
@@ -87,7 +162,7 @@ class PublishingMiddleware(object):
             if PublishingMiddleware.is_staff_user(request):
                 return True
             # Request contains a valid draft mode HMAC in the querystring.
-            if verify_draft_url(request.get_full_path()):
+            if PublishingMiddleware.is_verified_draft_request(request):
                 return True
         # Not draft mode.
         return False
@@ -97,67 +172,59 @@ class PublishingMiddleware(object):
         # Redirect non-admin, GET method, draft mode requests, from staff users
         # (not content reviewers), that don't have a valid draft mode HMAC in
         # the querystring, to make URL sharing easy.
-        if all([
-            not PublishingMiddleware.is_admin_request(request),
-            request.method == 'GET',
-            is_draft,
-            PublishingMiddleware.is_staff_user(request),
-            not PublishingMiddleware.is_content_reviewer_user(request),
-            not verify_draft_url(request.get_full_path()),
-        ]):
+        if (request.method == 'GET'
+                and is_draft
+                and PublishingMiddleware.is_staff_user(request)
+                and not PublishingMiddleware.is_admin_request(request)
+                and not PublishingMiddleware.is_content_reviewer_user(request)
+                and not PublishingMiddleware.is_verified_draft_request(
+                    request)):
             return HttpResponseRedirect(get_draft_url(request.get_full_path()))
-        # Set middleware active status.
-        PublishingMiddleware \
-            ._middleware_active_status[current_thread()] = True
-        # Set current user
-        PublishingMiddleware._current_user[current_thread()] = \
-            request.user
-        # Set draft status
-        PublishingMiddleware._draft_request_context[current_thread()] = \
-            is_draft
+        # Set middleware active status, current user and draft status,
+        # keeping tokens to restore the previous state on response.
+        request._publishing_context_tokens = [
+            PublishingMiddleware._middleware_active_status.set(True),
+            PublishingMiddleware._current_user.set(request.user),
+            PublishingMiddleware._draft_request_context.set(is_draft),
+        ]
         # Add draft status to request, for use in templates.
         request.IS_DRAFT = is_draft
 
     @staticmethod
     def process_response(request, response):
-        try:
-            del PublishingMiddleware._middleware_active_status[
-                current_thread()]
-        except KeyError:
-            pass
-        try:
-            del PublishingMiddleware._current_user[current_thread()]
-        except KeyError:
-            pass
-        try:
-            del PublishingMiddleware._draft_request_context[current_thread()]
-        except KeyError:
-            pass
+        # Restore the state from before the request where possible, and clear
+        # it otherwise, such as when the response is processed in a different
+        # context than the request was or for a request not processed here.
+        tokens = getattr(request, '_publishing_context_tokens', [])
+        request._publishing_context_tokens = []
+        restored_vars = set()
+        for token in reversed(tokens):
+            try:
+                token.var.reset(token)
+            except (RuntimeError, ValueError):
+                continue
+            restored_vars.add(token.var)
+        for var, default in (
+                (PublishingMiddleware._middleware_active_status, False),
+                (PublishingMiddleware._current_user, None),
+                (PublishingMiddleware._draft_request_context, False),
+        ):
+            if var not in restored_vars:
+                var.set(default)
         return PublishingMiddleware.redirect_staff_to_draft_view_on_404(
             request, response)
 
     @staticmethod
     def is_publishing_middleware_active():
-        try:
-            return PublishingMiddleware._middleware_active_status[
-                current_thread()]
-        except KeyError:
-            return False
+        return PublishingMiddleware._middleware_active_status.get()
 
     @staticmethod
     def get_current_user():
-        try:
-            return PublishingMiddleware._current_user[current_thread()]
-        except KeyError:
-            return None
+        return PublishingMiddleware._current_user.get()
 
     @staticmethod
     def is_draft_request_context():
-        try:
-            return PublishingMiddleware._draft_request_context[
-                current_thread()]
-        except KeyError:
-            return False
+        return PublishingMiddleware._draft_request_context.get()
 
     @staticmethod
     def redirect_staff_to_draft_view_on_404(request, response):
@@ -179,12 +246,202 @@ class PublishingMiddleware(object):
         return response
 
 
+class PublishingRequestClassification(object):
+    """
+    The publishing-related classification of a request, with each aspect
+    computed lazily at most once per request. In particular, the request path
+    is resolved at most once, and requests from anonymous users never need
+    database queries.
+    """
+    def __init__(self, request):
+        self.request = request
+
+    @cached_property
+    def resolver_match(self):
+        try:
+            return resolve(self.request.path)
+        except Resolver404:
+            return None
+
+    @cached_property
+    def is_admin_request(self):
+        return self.resolver_match is not None \
+            and self.resolver_match.app_name == 'admin'
+
+    @cached_property
+    def is_draft_only_view(self):
+        return self.resolver_match is not None \
+            and PublishingMiddleware.is_draft_only_view_func(
+                self.resolver_match.func)
+
+    @cached_property
+    def is_staff_user(self):
+        user = self.request.user
+        return user.is_authenticated() and user.is_staff
+
+    @cached_property
+    def is_content_reviewer_user(self):
+        """
+        Is the user in the "Content Reviewers" group? This is checked at most
+        once per request, and never across requests, so removing a user from
+        the group takes effect on their next request.
+        """
+        user = self.request.user
+        return user.is_authenticated() \
+            and user.groups.filter(name='Content Reviewers').exists()
+
+    @cached_property
+    def is_draft_request(self):
+        return 'edit' in self.request.GET
+
+    @cached_property
+    def is_verified_draft_request(self):
+        # Verify the path as it appears in `request.get_full_path()`, which is
+        # the URL that draft mode HMACs are generated for, without reparsing
+        # the already-parsed querystring.
+        return verify_draft_hmac(
+            escape_uri_path(self.request.path), self.request.GET.get('edit'))
+
+
+class PublishedPageCacheMiddleware(object):
+    """
+    Opt-in cache of complete responses for published Fluent pages.
+
+    Add it after ``PublishingMiddleware`` and any ``LocaleMiddleware``.
+    Responses are cached for anonymous users only, and are never served or
+    stored in a draft request context. Cache keys include the URL, language,
+    site, the values of request headers named by the response's ``Vary``
+    header, the page's publishing modification time, and a version stamp
+    that is changed whenever content shared between pages, like menus, is
+    published or unpublished. Entries expire after
+    ``FLUENTCMS_PUBLISHING_PAGE_CACHE_TIMEOUT`` seconds.
+
+    As for Django's cache middleware, the page and ``Vary`` headers for a URL
+    are learned from its first cached response, and stored under a key
+    without them.
+    """
+    KEY_PREFIX = 'fluentcms_publishing.published_page'
+
+    @staticmethod
+    def is_cacheable_request(request):
+        user = getattr(request, 'user', None)
+        return request.method in ('GET', 'HEAD') \
+            and is_publishing_middleware_active() \
+            and not is_draft_request_context() \
+            and user is not None \
+            and not user.is_authenticated()
+
+    @staticmethod
+    def is_cacheable_response(request, response):
+        page = getattr(request, '_current_fluent_page', None)
+        return page is not None \
+            and getattr(page, 'publishing_is_draft', True) is False \
+            and response.status_code == 200 \
+            and not response.streaming \
+            and not response.cookies \
+            and 'private' not in response.get('Cache-Control', '') \
+            and not has_vary_header(response, '*') \
+            and not is_draft_request_context()
+
+    @classmethod
+    def get_cache_key(cls, request):
+        """
+        Return the key of the page and ``Vary`` headers learned for the
+        request's URL.
+        """
+        return cls._get_cache_key([
+            get_published_page_cache_version(),
+            request.get_host(),
+            str(settings.SITE_ID),
+            translation.get_language() or '',
+            request.get_full_path(),
+        ])
+
+    @classmethod
+    def get_response_cache_key(cls, request, cache_key, draft_pk,
+                               page_version, headers):
+        """
+        Return the key of the response cached for the request, given its
+        ``get_cache_key`` key, and the draft PK, version stamp and ``Vary``
+        headers of the page learned for it.
+        """
+        parts = [cache_key, str(draft_pk), page_version]
+        for header in headers:
+            parts.extend([header, request.META.get(header, '')])
+        return cls._get_cache_key(parts)
+
+    @classmethod
+    def _get_cache_key(cls, parts):
+        key = '\n'.join(parts)
+        return '%s.%s' % (
+            cls.KEY_PREFIX, hashlib.md5(force_bytes(key)).hexdigest())
+
+    @staticmethod
+    def get_vary_headers(response):
+        """
+        Return the names of the request headers the response varies on, as
+        ``request.META`` keys.
+        """
+        if not response.has_header('Vary'):
+            return []
+        return sorted(set(
+            'HTTP_' + header.upper().replace('-', '_')
+            for header in cc_delim_re.split(response['Vary'])
+            if header))
+
+    def process_request(self, request):
+        if not self.is_cacheable_request(request):
+            return None
+        request._published_page_cache_key = self.get_cache_key(request)
+        learned = cache.get(request._published_page_cache_key)
+        if learned is None:
+            return None
+        draft_pk, headers = learned
+        page_version = get_published_page_version(draft_pk)
+        if page_version is None:
+            return None
+        response = cache.get(self.get_response_cache_key(
+            request, request._published_page_cache_key, draft_pk,
+            page_version, headers))
+        if response is not None:
+            request._published_page_cache_hit = True
+        return response
+
+    def process_response(self, request, response):
+        cache_key = getattr(request, '_published_page_cache_key', None)
+        if (cache_key is not None
+                and not getattr(request, '_published_page_cache_hit', False)
+                and self.is_cacheable_response(request, response)):
+            page = request._current_fluent_page
+            # Identify the page by its draft, which keeps its PK when the
+            # page is republished
+            draft_pk = type(page)._base_manager \
+                .filter(publishing_linked=page) \
+                .values_list('pk', flat=True) \
+                .first()
+            if draft_pk is None:
+                return response
+            page_version = set_published_page_version(
+                draft_pk, page, replace=False)
+            # Don't cache responses rendered from a stale copy of the page
+            if page_version != page.publishing_modified_at.isoformat():
+                return response
+            headers = self.get_vary_headers(response)
+            timeout = get_published_page_cache_timeout()
+            cache.set(cache_key, (draft_pk, headers), timeout)
+            cache.set(
+                self.get_response_cache_key(
+                    request, cache_key, draft_pk, page_version, headers),
+                response, timeout)
+        return response
+
+
 def is_publishing_middleware_active():
     return PublishingMiddleware.is_publishing_middleware_active()
 
 
 def set_publishing_middleware_active(status):
-    PublishingMiddleware._middleware_active_status[current_thread()] = status
+    PublishingMiddleware._middleware_active_status.set(status)
 
 
 def is_draft_request_context():
@@ -192,7 +449,7 @@ def is_draft_request_context():
 
 
 def set_draft_request_context(status):
-    PublishingMiddleware._draft_request_context[current_thread()] = status
+    PublishingMiddleware._draft_request_context.set(status)
 
 
 def get_current_user():
@@ -200,28 +457,27 @@ def get_current_user():
 
 
 def set_current_user(user):
-    PublishingMiddleware._current_user[current_thread()] = user
+    PublishingMiddleware._current_user.set(user)
 
 
 @contextmanager
+def _override_context_var(var, value):
+    token = var.set(value)
+    try:
+        yield
+    finally:
+        var.reset(token)
+
+
 def override_draft_request_context(status):
-    original = is_draft_request_context()
-    set_draft_request_context(status)
-    yield
-    set_draft_request_context(original)
+    return _override_context_var(
+        PublishingMiddleware._draft_request_context, status)
 
 
-@contextmanager
 def override_publishing_middleware_active(status):
-    original = is_publishing_middleware_active()
-    set_publishing_middleware_active(status)
-    yield
-    set_publishing_middleware_active(original)
+    return _override_context_var(
+        PublishingMiddleware._middleware_active_status, status)
 
 
-@contextmanager
 def override_current_user(user):
-    original = get_current_user()
-    set_current_user(user)
-    yield
-    set_current_user(original)
+    return _override_context_var(PublishingMiddleware._current_user, user)
@@ -1,22 +1,35 @@
+from collections import OrderedDict
 from copy import deepcopy
 
 import django
+import six
 from django.contrib.auth.models import Permission
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ObjectDoesNotExist
-from django.db import models
+from django.db import connections, models, router, transaction
+from django.db.models.deletion import Collector
+from django.db.models import (
+    Case, F, Max, OuterRef, Q, Subquery, Value, When)
 from django.dispatch import receiver
 from django.utils import timezone
 
-from fluent_contents.models import Placeholder
-from fluent_pages.models import UrlNode
+from fluent_contents.models import ContentItem, Placeholder
+from parler import appsettings as parler_appsettings
+from parler.cache import (
+    _cache_translation, _delete_cached_translation, cache as parler_cache,
+    get_translation_cache_key)
+from fluent_pages.models import UrlNode, UrlNode_Translation
 from fluent_pages.integration.fluent_contents import FluentContentsPage
 from fluent_contents.models import ContentItemRelation, PlaceholderRelation
 
 from .managers import PublishingManager, PublishingUrlNodeManager
 from .middleware import is_draft_request_context
-from .utils import PublishingException, assert_draft, is_automatic_publishing_enabled
+from .utils import (
+    NotDraftException, PublishingException, assert_draft,
+    is_automatic_publishing_enabled, is_incremental_publishing_enabled,
+    purge_published_page_cache, set_published_page_version,
+    update_routing_index)
 from .compat import get_m2m_with_model, get_all_related_many_to_many_objects
 from . import signals as publishing_signals
 
@@ -72,6 +85,11 @@ class PublishingModel(models.Model):
 
     @property
     def is_dirty(self):
+        # Use status computed by `PublishingQuerySet.with_publishing_status`
+        annotated_is_dirty = getattr(self, 'publishing_status_is_dirty', None)
+        if annotated_is_dirty is not None:
+            return bool(annotated_is_dirty)
+
         if not self.is_draft:
             return False
 
@@ -136,6 +154,12 @@ class PublishingModel(models.Model):
         the specific object is a published copy, and will return False for
         a draft object that has an associated published copy.
         """
+        # Use status computed by `PublishingQuerySet.with_publishing_status`
+        annotated_is_published = getattr(
+            self, 'publishing_status_is_published', None)
+        if annotated_is_published is not None:
+            return bool(annotated_is_published)
+
         if self.is_published:
             return True
         elif self.is_draft:
@@ -252,57 +276,19 @@ class PublishingModel(models.Model):
         :return: The published object.
         """
         if self.is_draft:
-            # If the object has previously been linked then patch the
-            # placeholder data and remove the previously linked object.
-            # Otherwise set the published date.
-            if self.publishing_linked:
-                self.patch_placeholders(self.publishing_linked)
-                # Unlink draft and published copies then delete published.
-                # NOTE: This indirect dance is necessary to avoid
-                # triggering unwanted MPTT tree structure updates via
-                # `save`.
-                type(self.publishing_linked).objects \
-                    .filter(pk=self.publishing_linked.pk) \
-                    .delete()  # Instead of self.publishing_linked.delete()
-            else:
-                self.publishing_published_at = timezone.now()
-
-            # Create a new object copying all fields.
-            publish_obj = deepcopy(self)
-
-            # If any fields are defined not to copy set them to None.
-            for fld in self.publishing_publish_empty_fields + (
-                'urlnode_ptr_id', 'publishing_linked_id'
-            ):
-                setattr(publish_obj, fld, None)
-
-            # Set the state of publication to published on the object.
-            publish_obj.publishing_is_draft = False
-
-            # Update Fluent's publishing status field mechanism to correspond
-            # to our own notion of publication, to help use work together more
-            # easily with Fluent Pages.
-            if isinstance(self, UrlNode):
-                self.status = UrlNode.DRAFT
-                publish_obj.status = UrlNode.PUBLISHED
-
-            # Set the date the object should be published at.
-            publish_obj.publishing_published_at = self.publishing_published_at
-
-            # Perform per-model preparation before saving published copy
-            publish_obj.publishing_prepare_published_copy(self)
-
-            # Save the new published object as a separate instance to self.
-            publish_obj.save()
-            # Sanity-check that we successfully saved the published copy
-            if not publish_obj.pk:  # pragma: no cover
-                raise PublishingException("Failed to save published copy")
-
-            # As it is a new object we need to clone each of the
-            # translatable fields, placeholders and required relations.
-            self.clone_parler_translations(publish_obj)
-            self.clone_fluent_placeholders_and_content_items(publish_obj)
-            self.clone_fluent_contentitems_m2m_relationships(publish_obj)
+            # Note whether content other published items may show changes,
+            # for `purge_published_page_cache_post_publish`
+            self._publishing_has_shared_changes = \
+                self.publishing_has_shared_changes()
+
+            # If incremental publishing is enabled, update the previously
+            # linked object in place where possible.
+            publish_obj = None
+            if self.publishing_linked \
+                    and is_incremental_publishing_enabled(type(self)):
+                publish_obj = self.publishing_update_published_copy()
+            if publish_obj is None:
+                publish_obj = self.publishing_create_published_copy()
 
             # Extra relationship-cloning smarts
             publish_obj.publishing_clone_relations(self)
@@ -327,6 +313,116 @@ class PublishingModel(models.Model):
                 sender=type(self), instance=self)
             return publish_obj
 
+    def publishing_create_published_copy(self):
+        """
+        Replace any previously linked published copy with a new copy of this
+        draft, including translations, placeholders and content items, and
+        return it.
+        """
+        # If the object has previously been linked then patch the
+        # placeholder data and remove the previously linked object.
+        # Otherwise set the published date.
+        if self.publishing_linked:
+            self.patch_placeholders(self.publishing_linked)
+            # Unlink draft and published copies then delete published.
+            # NOTE: This indirect dance is necessary to avoid
+            # triggering unwanted MPTT tree structure updates via
+            # `save`.
+            type(self.publishing_linked).objects \
+                .filter(pk=self.publishing_linked.pk) \
+                .delete()  # Instead of self.publishing_linked.delete()
+        else:
+            self.publishing_published_at = timezone.now()
+
+        publish_obj = self._build_published_copy()
+
+        # Save the new published object as a separate instance to self.
+        publish_obj.save()
+        # Sanity-check that we successfully saved the published copy
+        if not publish_obj.pk:  # pragma: no cover
+            raise PublishingException("Failed to save published copy")
+
+        # As it is a new object we need to clone each of the
+        # translatable fields, placeholders and required relations.
+        self.clone_parler_translations(publish_obj)
+        self.clone_fluent_placeholders_and_content_items(publish_obj)
+        self.clone_fluent_contentitems_m2m_relationships(publish_obj)
+        return publish_obj
+
+    def publishing_update_published_copy(self):
+        """
+        Update the previously linked published copy in place to match this
+        draft, and return it. Only the fields, translations, placeholders and
+        content items that differ from the draft are written, so the
+        published copy and unchanged content keep their PKs.
+
+        Return None without making changes if the published copy cannot be
+        updated in place, in which case it should be replaced instead.
+        """
+        published = self.publishing_linked
+        if type(published) is not type(self):
+            return None
+        published.refresh_from_db()
+        if self.has_placeholder_relationships():
+            src_placeholders = list(Placeholder.objects.parent(self))
+            dst_placeholders = list(Placeholder.objects.parent(published))
+            if not _are_placeholders_updatable(
+                    src_placeholders, dst_placeholders):
+                return None
+
+        # Prepare a copy of the draft as for a new published copy, and write
+        # the field values that differ from the existing published copy.
+        publish_obj = self._build_published_copy()
+        changes = _get_changed_field_values(
+            publish_obj, published, ignore_fields=[
+                f.attname for f in self._meta.concrete_fields
+                if f.primary_key])
+        # Mark the published copy as updated, as `save` would
+        changes['publishing_modified_at'] = timezone.now()
+        type(published)._base_manager.filter(pk=published.pk) \
+            .update(**changes)
+        for attname, value in changes.items():
+            setattr(published, attname, value)
+        discard_publishing_status(published)
+
+        _update_parler_translations(self, published)
+        if self.has_placeholder_relationships():
+            _update_fluent_placeholders_and_content_items(
+                published, src_placeholders, dst_placeholders)
+        self.clone_fluent_contentitems_m2m_relationships(
+            published, replace=True)
+        return published
+
+    def _build_published_copy(self):
+        """
+        Return an unsaved published copy of this draft.
+        """
+        # Create a new object copying all fields.
+        publish_obj = deepcopy(self)
+
+        # If any fields are defined not to copy set them to None.
+        for fld in self.publishing_publish_empty_fields + (
+            'urlnode_ptr_id', 'publishing_linked_id'
+        ):
+            setattr(publish_obj, fld, None)
+
+        # Set the state of publication to published on the object.
+        publish_obj.publishing_is_draft = False
+
+        # Update Fluent's publishing status field mechanism to correspond
+        # to our own notion of publication, to help use work together more
+        # easily with Fluent Pages.
+        if isinstance(self, UrlNode):
+            self.status = UrlNode.DRAFT
+            publish_obj.status = UrlNode.PUBLISHED
+
+        # Set the date the object should be published at.
+        publish_obj.publishing_published_at = self.publishing_published_at
+
+        # Perform per-model preparation before saving published copy
+        publish_obj.publishing_prepare_published_copy(self)
+        return publish_obj
+
     @assert_draft
     def unpublish(self):
         """
@@ -428,127 +524,7 @@ class PublishingModel(models.Model):
 
         See unit tests in ``TestPublishingOfM2MRelationships``.
         """
-
-        def clone_through_model_relationship(manager, through_entry, dst_obj, rel_obj):
-            dst_obj_filter = build_filter_for_through_field(
-                manager, manager.source_field_name, dst_obj)
-            rel_obj_filter = build_filter_for_through_field(
-                manager, manager.target_field_name, rel_obj)
-            if manager.through.objects \
-                    .filter(**dst_obj_filter) \
-                    .filter(**rel_obj_filter) \
-                    .exists():
-                return
-            through_entry.pk = None
-            setattr(through_entry, manager.source_field_name, dst_obj)
-            setattr(through_entry, manager.target_field_name, rel_obj)
-            through_entry.save()
-
-        def delete_through_model_relationship(manager, src_obj, dst_obj):
-            src_obj_filter = build_filter_for_through_field(
-                manager, manager.source_field_name, src_obj)
-            dst_obj_filter = build_filter_for_through_field(
-                manager, manager.target_field_name, dst_obj)
-            manager.through.objects \
-                .filter(**src_obj_filter) \
-                .filter(**dst_obj_filter) \
-                .delete()
-
-        def build_filter_for_through_field(manager, field_name, obj):
-            # If the field is a `GenericForeignKey` we need to build
-            # a compatible filter dict against the field target's content type
-            # and PK...
-            field = getattr(manager.through, field_name)
-            if isinstance(field, GenericForeignKey):
-                field_filter = {
-                    getattr(field, 'fk_field'): obj.pk,
-                    getattr(field, 'ct_field'):
-                        ContentType.objects.get_for_model(obj)
-                }
-            # ...otherwise standard FK fields can be handled simply
-            else:
-                field_filter = {field_name: obj}
-            return field_filter
-
-        def clone(src_manager):
-            if (not hasattr(src_manager, 'source_field_name') or not hasattr(src_manager, 'target_field_name')):
-                raise PublishingException(
-                    "Publishing requires many-to-many managers to have"
-                    " 'source_field_name' and 'target_field_name' attributes"
-                    " with the source and target field names that relate the"
-                    " through model to the ends of the M2M relationship."
-                    " If a non-standard manager does not provide these"
-                    " attributes you must add them."
-                )
-
-            src_obj_source_field_filter = build_filter_for_through_field(
-                src_manager, src_manager.source_field_name, src_obj)
-            through_qs = src_manager.through.objects \
-                .filter(**src_obj_source_field_filter)
-            published_rel_objs_maybe_obsolete = []
-            current_draft_rel_pks = set()
-            for through_entry in through_qs:
-                rel_obj = getattr(through_entry, src_manager.target_field_name)
-                # If the object referenced by the M2M is publishable we only
-                # clone the relationship if it is to a draft copy, not if it is
-                # to a published copy. If it is not a publishable object at
-                # all then we always clone the relationship (True by default).
-                if getattr(rel_obj, 'publishing_is_draft', True):
-                    clone_through_model_relationship(
-                        src_manager, through_entry, self, rel_obj)
-                    # If the related draft object also has a published copy,
-                    # we need to make sure the published copy also knows about
-                    # this newly-published draft.
-                    try:
-                        # Get published copy for related object, if any
-                        rel_obj_published = rel_obj.publishing_linked
-                    except AttributeError:
-                        pass  # Related item has no published copy
-                    else:
-                        if rel_obj_published:
-                            clone_through_model_relationship(
-                                src_manager, through_entry,
-                                src_obj, rel_obj_published)
-                    # Track IDs of related draft copies, so we can tell later
-                    # whether relationshps with published copies are obsolete
-                    current_draft_rel_pks.add(rel_obj.pk)
-                else:
-                    # Track related published copies, in case they have
-                    # become obsolete
-                    published_rel_objs_maybe_obsolete.append(rel_obj)
-            # If related published copies have no corresponding related
-            # draft after all the previous processing, the relationship is
-            # obsolete and must be removed.
-            for published_rel_obj in published_rel_objs_maybe_obsolete:
-                draft = published_rel_obj.get_draft()
-                if not draft or draft.pk not in current_draft_rel_pks:
-                    delete_through_model_relationship(
-                        src_manager, src_obj, published_rel_obj)
-
-        # Track the relationship through-tables we have processed to avoid
-        # processing the same relationships in both forward and reverse
-        # directions, which could otherwise happen in unusual cases like
-        # for SFMOMA event M2M inter-relationships which are explicitly
-        # defined both ways as a hack to expose form widgets.
-        seen_rel_through_tables = set()
-
-        # Forward.
-        for field in src_obj._meta.many_to_many:
-            src_manager = getattr(src_obj, field.name)
-            clone(src_manager)
-            seen_rel_through_tables.add(field.rel.through)
-
-        # Reverse.
-        for field in get_all_related_many_to_many_objects(src_obj._meta):
-            # Skip reverse relationship we have already seen
-            if field.field.rel.through in seen_rel_through_tables:
-                continue
-            field_accessor_name = field.get_accessor_name()
-            # M2M relationships with `self` don't have accessor names
-            if not field_accessor_name:
-                continue
-            src_manager = getattr(src_obj, field_accessor_name)
-            clone(src_manager)
+        _clone_relations([(src_obj, self)])
 
     def has_placeholder_relationships(self):
         return hasattr(self, 'placeholder_set') \
@@ -575,22 +551,21 @@ class PublishingModel(models.Model):
         :param dst_obj: The object to relate the new translations to.
         :return: None
         """
-        # Find all django-parler translation attributes on model
-        translation_attrs = []
-        if hasattr(self, '_parler_meta'):
-            for parler_meta in self._parler_meta:
-                translation_attrs.append(parler_meta.rel_name)
-        # Clone all django-parler translations via attributes
-        for translation_attr in translation_attrs:
+        # Clone all django-parler translations via attributes, with one
+        # `bulk_create` per translated model
+        for parler_meta in getattr(self, '_parler_meta', None) or []:
+            translation_attr = parler_meta.rel_name
             # Clear any translations already cloned to published object
             # before we get here, which seems to happen via deepcopy()
             # sometimes.
             setattr(dst_obj, translation_attr, [])
             # Clone attribute's translations from source to destination
-            for translation in getattr(self, translation_attr).all():
+            translations = list(getattr(self, translation_attr).all())
+            for translation in translations:
                 translation.pk = None
                 translation.master = dst_obj
-                translation.save()
+            parler_meta.model.objects.bulk_create(translations)
+            _cache_cloned_translations(translations)
 
     def clone_fluent_placeholders_and_content_items(self, dst_obj):
         """
@@ -605,51 +580,41 @@ class PublishingModel(models.Model):
         if not self.has_placeholder_relationships():
             return
 
-        for src_placeholder in Placeholder.objects.parent(self):
-            dst_placeholder = Placeholder.objects.create_for_object(
-                dst_obj,
+        src_placeholders = list(Placeholder.objects.parent(self))
+        Placeholder.objects.bulk_create([
+            Placeholder(
+                parent_type=src_placeholder.parent_type,
+                parent_id=dst_obj.pk,
                 slot=src_placeholder.slot,
                 role=src_placeholder.role,
-                title=src_placeholder.title
+                title=src_placeholder.title,
             )
-
-            src_items = src_placeholder.get_content_items()
-            src_items.copy_to_placeholder(dst_placeholder)
-
-    def clone_fluent_contentitems_m2m_relationships(self, dst_obj):
+            for src_placeholder in src_placeholders
+        ])
+        # Placeholders are unique per parent and slot, use this to find the
+        # PKs of the new placeholders.
+        dst_placeholders = dict(
+            (p.slot, p) for p in Placeholder.objects.parent(dst_obj))
+        placeholder_map = {}
+        for src_placeholder in src_placeholders:
+            dst_placeholder = dst_placeholders[src_placeholder.slot]
+            dst_placeholder.parent = dst_obj
+            placeholder_map[src_placeholder.pk] = dst_placeholder
+        _bulk_copy_content_items(placeholder_map)
+
+    def clone_fluent_contentitems_m2m_relationships(self, dst_obj,
+                                                    replace=False):
         """
         Find all MTM relationships on related ContentItem's and ensure the
         published M2M relationships directed back to the draft (src)
         content items are maintained for the published (dst) page's content
         items.
+
+        If ``replace`` is set the existing M2M relationships of the published
+        content items are also removed if they are not on the draft items.
         """
-        if not hasattr(self, 'contentitem_set'):
-            return
-        # We must explicitly and reliably order both the src and dst content
-        # items here to ensure that we are processing the same logical item for
-        # the draft and published copies. The default `ContentItem` ordering of
-        # ('placeholder', 'sort_order') is not sufficient because it relies on
-        # the placeholder PK remaining static, whereas we clone placeholders to
-        # the published copy and may sometimes clone them with PKs in a
-        # different order.
-        reliable_ordering = [
-            # Group items by owning placeholder using slot name, not PK
-            'placeholder__slot',
-            # Order items correctly within the placeholder grouping
-            'sort_order'
-        ]
-        for src_ci, dst_ci in zip(self.contentitem_set.order_by(*reliable_ordering),
-                                  dst_obj.contentitem_set.order_by(*reliable_ordering)):
-            for field, __ in get_m2m_with_model(src_ci):
-                field_name = field.name
-                src_m2m = getattr(src_ci, field_name)
-                dst_m2m = getattr(dst_ci, field_name)
-
-                # It is safe to just `add` here, rather than match src and
-                # dst listing exactly (i.e. potentially delete or re-order
-                # items) because the destination content items are
-                # re-created on publish thus always have empty M2M rels.
-                dst_m2m.add(*src_m2m.all())
+        _clone_fluent_contentitems_m2m_relationships(
+            [(self, dst_obj)], replace=replace)
 
     def suppressed_message(self):
         """
@@ -666,6 +631,17 @@ class PublishingModel(models.Model):
         """
         return None
 
+    def publishing_has_shared_changes(self):
+        """
+        Return True if publishing this draft may change content shown by
+        other published items, such as menus, in which case all cached
+        published page responses are purged on publish. Otherwise only the
+        item's own cached responses are.
+
+        By default any change may, override this to tell.
+        """
+        return True
+
 
 class PublishableFluentContentsPage(FluentContentsPage, PublishingModel):
     """
@@ -686,6 +662,35 @@ class PublishableFluentContentsPage(FluentContentsPage, PublishingModel):
     def is_published(self):
         return not self.publishing_is_draft
 
+    # Fields of pages shown by other pages, such as in menus
+    publishing_shared_fields = (
+        'parent', 'parent_site', 'publication_date', 'publication_end_date',
+        'in_navigation', 'key', 'lft', 'rght', 'tree_id', 'level',
+    )
+    publishing_shared_translation_fields = (
+        'language_code', 'title', 'slug', 'override_url', '_cached_url',
+    )
+
+    def publishing_has_shared_changes(self):
+        """
+        Return True unless only fields of the page that are not shown by
+        other pages, such as its content, have changed since it was last
+        published.
+        """
+        published = self.publishing_linked
+        if published is None:
+            return True
+        for field_name in self.publishing_shared_fields:
+            attname = self._meta.get_field(field_name).attname
+            if getattr(self, attname) != getattr(published, attname):
+                return True
+
+        def get_translation_values(obj):
+            return set(obj.translations.values_list(
+                *self.publishing_shared_translation_fields))
+        return get_translation_values(self) \
+            != get_translation_values(published)
+
     # borrowed from FluentFieldsMixin. TODO: send upstream
     def placeholders(self):
         # return a dict of placeholders, organised by slot, for access in
@@ -716,6 +721,1215 @@ class PublishableFluentContents(PublishingModel):
                      for p in self.placeholder_set.all().select_related()])
 
 
+PUBLISHING_STATUS_ANNOTATIONS = (
+    'publishing_status_is_published',
+    'publishing_status_is_out_of_date',
+    'publishing_status_is_dirty',
+)
+
+
+def discard_publishing_status(obj):
+    """
+    Remove the publishing status computed for an item by
+    ``PublishingQuerySet.with_publishing_status``, which is stale once the
+    item is changed, so the status properties are computed afresh.
+    """
+    for name in PUBLISHING_STATUS_ANNOTATIONS:
+        obj.__dict__.pop(name, None)
+
+
+def bulk_publish(drafts, batch_signals=False):
+    """
+    Publish many draft objects together, in a fixed number of queries per
+    publishable model and relation type where possible, instead of the
+    queries per object performed by ``PublishingModel.publish``.
+
+    Drafts of models that cannot be safely published with bulk operations,
+    such as models that inherit from several concrete models or have a
+    customised ``publish`` method, are published one by one with ``publish``
+    instead.
+
+    Published copies are created with ``bulk_create`` so the normal
+    ``pre_save`` and ``post_save`` signals are not sent for them. The
+    publishing signals for each draft are sent as usual, unless
+    ``batch_signals`` is set in which case only the
+    ``publishing_post_publish_batch`` signal is sent once per model with all
+    the drafts published for that model.
+
+    :param drafts: An iterable of draft objects, such as a queryset.
+    :param batch_signals: Send one batched signal per model instead of the
+    publishing signals for each draft.
+    :return: A list of the published copies, in the order of the drafts.
+    """
+    drafts_by_model = OrderedDict()
+    for draft in drafts:
+        # Unwrap drafts that were booby-trapped in a public request context
+        if hasattr(draft, 'get_draft_payload'):
+            draft = draft.get_draft_payload()
+        if not draft.is_draft:
+            raise NotDraftException()
+        drafts_by_model.setdefault(type(draft), []).append(draft)
+
+    published_copies = {}
+    with transaction.atomic():
+        for model, model_drafts in drafts_by_model.items():
+            if not _is_bulk_publishable(model):
+                for draft in model_drafts:
+                    published_copies[draft] = draft.publish()
+                continue
+            published_copies.update(
+                _bulk_publish_model(model, model_drafts))
+            if batch_signals:
+                # No `publishing_post_publish` signal is sent for the drafts,
+                # so add the published copies to the routing index here.
+                _update_published_copies_routing_index(model, model_drafts)
+                publishing_signals.publishing_post_publish_batch.send(
+                    sender=model, instances=model_drafts)
+                continue
+            for draft in model_drafts:
+                # The draft is already saved with its new relationship with
+                # the published copy, flag it so it isn't saved again.
+                draft._skip_save_draft_on_publish = True
+                publishing_signals.publishing_publish_pre_save_draft.send(
+                    sender=model, instance=draft)
+                publishing_signals.publishing_publish_save_draft.send(
+                    sender=model, instance=draft)
+                publishing_signals.publishing_post_publish.send(
+                    sender=model, instance=draft)
+    return [published_copies[draft]
+            for model_drafts in drafts_by_model.values()
+            for draft in model_drafts]
+
+
+def _is_bulk_publishable(model):
+    """
+    Return True if the drafts of the given model can be published with
+    ``bulk_publish`` instead of ``PublishingModel.publish``.
+    """
+    return (
+        # Only models stored in a single chain of tables, which
+        # `_bulk_insert_multi_table` can insert
+        all(len(m._meta.parents) <= 1
+            for m in [model] + model._meta.get_parent_list())
+        # Respect model-specific customisations of publishing
+        and not _is_overridden(model, 'publish')
+    )
+
+
+def _bulk_publish_model(model, drafts):
+    """
+    Publish the given drafts, which must all be instances of the given
+    model, with bulk operations. Return a dict mapping drafts to their new
+    published copies.
+    """
+    now = timezone.now()
+    using = router.db_for_write(model)
+
+    # Patch placeholders shared with previously published copies, then
+    # delete these copies all at once.
+    # NOTE: Filter by PKs instead of deleting via relationships, as for
+    # `publish`.
+    previous_published_pks = [
+        d.publishing_linked_id for d in drafts if d.publishing_linked_id]
+    if previous_published_pks:
+        if _is_overridden(model, 'patch_placeholders'):
+            for draft in drafts:
+                if draft.publishing_linked_id:
+                    draft.patch_placeholders(draft.publishing_linked)
+        else:
+            _bulk_patch_placeholders(model, drafts)
+        # Delete their content items first, which `delete` would otherwise
+        # collect with a query per item.
+        _delete_parents_content_items(model, previous_published_pks)
+        _delete_multi_table(model, previous_published_pks)
+
+    # Create new published copies of all the drafts. Each published copy is
+    # temporarily linked back to its draft via `publishing_linked`, to link
+    # the drafts to their copies in one query and so we can find the PKs of
+    # the new copies after a `bulk_create`, which does not set them on all DB
+    # backends.
+    # MPTT tree fields are copied from the drafts as they are, as `publish`
+    # does, so published copies mirror the tree structure of their drafts.
+    publish_objs = []
+    for draft in drafts:
+        discard_publishing_status(draft)
+        if not draft.publishing_linked_id:
+            draft.publishing_published_at = now
+        publish_obj = draft._build_published_copy()
+        publish_obj.publishing_linked = None
+        publish_obj.publishing_linked_id = draft.pk
+        # Set update time as `publishing_set_update_time` would on `save`
+        publish_obj.publishing_modified_at = now
+        publish_objs.append(publish_obj)
+    if model._meta.parents:
+        _bulk_insert_multi_table(model, publish_objs, using)
+    else:
+        model.objects.using(using).bulk_create(publish_objs)
+
+    # Find the new copies by their PKs, or if these are not known by their
+    # temporary links to the drafts, but never by other published copies.
+    # NOTE: Clear default orderings, such as the tree ordering of Fluent
+    # pages which joins their parent table, to use these in subqueries.
+    if all(publish_obj.pk for publish_obj in publish_objs):
+        published_pks = dict(
+            (draft.pk, publish_obj.pk)
+            for draft, publish_obj in zip(drafts, publish_objs))
+        new_published_qs = model.objects.filter(
+            pk__in=list(published_pks.values())).order_by()
+    else:
+        new_published_qs = model.objects.filter(
+            publishing_is_draft=False,
+            publishing_linked__in=[draft.pk for draft in drafts]) \
+            .order_by()
+        published_pks = dict(
+            (draft_pk, pk) for pk, draft_pk in
+            new_published_qs.values_list('pk', 'publishing_linked_id'))
+
+    # Link drafts to their published copies.
+    drafts_qs = model.objects.filter(
+        pk__in=Subquery(new_published_qs.values('publishing_linked'))) \
+        .order_by()
+    drafts_qs.update(publishing_linked=Subquery(
+        model.objects
+        .filter(publishing_is_draft=False, publishing_linked=OuterRef('pk'))
+        .values('pk')[:1]))
+    drafts_qs.filter(publishing_published_at__isnull=True) \
+        .update(publishing_published_at=now)
+    if issubclass(model, UrlNode):
+        # Save the Fluent status set on the drafts, as `publish` would
+        UrlNode._base_manager.using(using) \
+            .filter(pk__in=[draft.pk for draft in drafts]) \
+            .exclude(status=UrlNode.DRAFT) \
+            .update(status=UrlNode.DRAFT)
+
+    published_copies = OrderedDict()
+    for draft, publish_obj in zip(drafts, publish_objs):
+        publish_obj.pk = published_pks[draft.pk]
+        publish_obj._state.adding = False
+        draft.publishing_linked = publish_obj
+        published_copies[draft] = publish_obj
+
+    # Clone translations and placeholders for all drafts at once, then remove
+    # the temporary links from the published copies back to their drafts.
+    _bulk_clone_parler_translations(model, published_pks, drafts_qs)
+    _bulk_clone_fluent_placeholders_and_content_items(
+        model, published_copies, drafts_qs)
+    new_published_qs.update(publishing_linked=None)
+    for publish_obj in publish_objs:
+        publish_obj.publishing_linked_id = None
+
+    # Clone M2M relationships for all drafts at once, unless the model
+    # customises how they are cloned.
+    pairs = list(published_copies.items())
+    if _is_overridden(model, 'clone_fluent_contentitems_m2m_relationships'):
+        for draft, publish_obj in pairs:
+            draft.clone_fluent_contentitems_m2m_relationships(publish_obj)
+    else:
+        _clone_fluent_contentitems_m2m_relationships(pairs)
+    if _is_overridden(model, 'publishing_clone_relations'):
+        for draft, publish_obj in pairs:
+            publish_obj.publishing_clone_relations(draft)
+    else:
+        _clone_relations(pairs)
+    return published_copies
+
+
+def _is_overridden(model, name):
+    """
+    Return True if the given model customises the `PublishingModel` method
+    with the given name.
+    """
+    return six.get_unbound_function(getattr(model, name)) \
+        is not six.get_unbound_function(getattr(PublishingModel, name))
+
+
+def _bulk_patch_placeholders(model, drafts):
+    """
+    Patch the placeholders of the given drafts shared with their previously
+    published copies, as ``PublishingModel.patch_placeholders`` does for one
+    draft, with one query for all the drafts.
+    """
+    drafts = [draft for draft in drafts if draft.publishing_linked_id]
+    if not drafts or not drafts[0].has_placeholder_relationships():
+        return
+    parent_pks = [draft.pk for draft in drafts] \
+        + [draft.publishing_linked_id for draft in drafts]
+    placeholders_by_parent = {}
+    for placeholder in Placeholder.objects.filter(
+            parent_type=ContentType.objects.get_for_model(model),
+            parent_id__in=parent_pks):
+        placeholders_by_parent.setdefault(
+            placeholder.parent_id, []).append(placeholder)
+    for draft in drafts:
+        for src_placeholder, dst_placeholder in zip(
+                placeholders_by_parent.get(draft.pk, []),
+                placeholders_by_parent.get(draft.publishing_linked_id, [])):
+            if src_placeholder.pk == dst_placeholder.pk:
+                src_placeholder.pk = None
+                src_placeholder.save()
+
+
+def _delete_multi_table(model, pks):
+    """
+    Delete the objects of a model with the given PKs, like ``delete`` on a
+    queryset but also collecting the rows of parent models with multi-table
+    inheritance together, which the collector would otherwise look up one
+    object at a time.
+    """
+    using = router.db_for_write(model)
+    collector = Collector(using=using)
+    for m in [model] + model._meta.get_parent_list():
+        # Use plain querysets, since polymorphic managers would return
+        # instances of the child model instead of the parent model.
+        collector.collect(
+            models.QuerySet(m, using=using).filter(pk__in=pks),
+            keep_parents=True)
+    collector.delete()
+
+
+def _bulk_insert_multi_table(model, objs, using):
+    """
+    Insert the given new objects of a model with multi-table inheritance,
+    which ``bulk_create`` does not support, with one ``INSERT`` per table for
+    each batch of objects, and set their PKs.
+
+    On databases that cannot return the PKs of rows inserted together, the
+    root table rows are inserted one at a time to get their PKs, since these
+    cannot be looked up reliably while other rows may be inserted.
+
+    The model must inherit from a single chain of concrete models.
+    """
+    # Concrete models of the inheritance chain, from the root model down
+    chain = [model] + model._meta.get_parent_list()
+    chain.reverse()
+    root = chain[0]
+    connection = connections[using]
+
+    # Insert the root table rows for all the objects at once
+    root_fields = [
+        f for f in root._meta.local_concrete_fields if not f.primary_key]
+    root_objs = [
+        root(**dict((f.attname, getattr(obj, f.attname)) for f in root_fields))
+        for obj in objs
+    ]
+    if getattr(connection.features, 'can_return_ids_from_bulk_insert', False):
+        root._base_manager.using(using).bulk_create(root_objs)
+    else:
+        for root_obj in root_objs:
+            root_obj.pk = root._base_manager._insert(
+                [root_obj], fields=root_fields, return_id=True, using=using)
+    new_pks = [root_obj.pk for root_obj in root_objs]
+
+    # Insert the rows of each child table, linked to the new root rows
+    for obj, root_obj, new_pk in zip(objs, root_objs, new_pks):
+        # Keep values set on insert, such as `auto_now` dates
+        for f in root_fields:
+            setattr(obj, f.attname, getattr(root_obj, f.attname))
+        for m in chain:
+            setattr(obj, m._meta.pk.attname, new_pk)
+            for parent_link in m._meta.parents.values():
+                setattr(obj, parent_link.attname, new_pk)
+        obj._state.adding = False
+        obj._state.db = using
+    for m in chain[1:]:
+        fields = m._meta.local_concrete_fields
+        batch_size = max(connection.ops.bulk_batch_size(fields, objs), 1)
+        for i in range(0, len(objs), batch_size):
+            m._base_manager._insert(
+                objs[i:i + batch_size], fields=fields, using=using)
+
+
+def _clone_relations(pairs):
+    """
+    Clone the forward and reverse M2M relationships of drafts to their
+    published copies, as described for
+    ``PublishingModel.publishing_clone_relations``, with one read and at most
+    one ``INSERT`` and one ``DELETE`` per relationship for all the drafts.
+
+    :param pairs: A list of ``(draft, published copy)`` pairs, all of the
+    same model.
+    """
+    if not pairs:
+        return
+
+    def get_through_field_attnames(manager, field_name):
+        # If the field is a `GenericForeignKey` the related object is
+        # identified by the field target's content type and PK...
+        through_opts = manager.through._meta
+        field = getattr(manager.through, field_name)
+        if isinstance(field, GenericForeignKey):
+            return (
+                through_opts.get_field(field.ct_field).attname,
+                through_opts.get_field(field.fk_field).attname,
+            )
+        # ...otherwise standard FK fields can be handled simply
+        return (through_opts.get_field(field_name).attname,)
+
+    def build_through_field_key(manager, field_name, obj, pk=None):
+        # Return the values that identify the given object, or the item
+        # of the same type with the given PK, in the through-table field
+        if pk is None:
+            pk = obj.pk
+        if len(get_through_field_attnames(manager, field_name)) == 2:
+            return (ContentType.objects.get_for_model(obj).pk, pk)
+        return (pk,)
+
+    def get_through_entry_key(manager, field_name, through_entry):
+        return tuple(
+            getattr(through_entry, attname) for attname
+            in get_through_field_attnames(manager, field_name))
+
+    def build_filter_for_through_field(manager, field_name, objs):
+        attnames = get_through_field_attnames(manager, field_name)
+        field_filter = {'%s__in' % attnames[-1]: [obj.pk for obj in objs]}
+        if len(attnames) == 2:
+            field_filter[attnames[0]] = \
+                ContentType.objects.get_for_model(objs[0]).pk
+        return field_filter
+
+    def copy_through_entry(manager, through_entry, dst_key, rel_key):
+        # Copy all the values of the through entry, such as extra fields
+        # of explicit through models, except for its PK and ends
+        new_entry = manager.through(**dict(
+            (field.attname, getattr(through_entry, field.attname))
+            for field in manager.through._meta.concrete_fields
+            if not field.primary_key))
+        for field_name, key in (
+                (manager.source_field_name, dst_key),
+                (manager.target_field_name, rel_key)):
+            for attname, value in zip(
+                    get_through_field_attnames(manager, field_name), key):
+                setattr(new_entry, attname, value)
+        return new_entry
+
+    def clone(src_manager):
+        if (not hasattr(src_manager, 'source_field_name') or not hasattr(src_manager, 'target_field_name')):
+            raise PublishingException(
+                "Publishing requires many-to-many managers to have"
+                " 'source_field_name' and 'target_field_name' attributes"
+                " with the source and target field names that relate the"
+                " through model to the ends of the M2M relationship."
+                " If a non-standard manager does not provide these"
+                " attributes you must add them."
+            )
+        source_field_name = src_manager.source_field_name
+        target_field_name = src_manager.target_field_name
+
+        # Read the through-table entries for both the drafts and the
+        # published copies, with their related objects, in one go
+        through_qs = src_manager.through.objects.filter(
+            **build_filter_for_through_field(
+                src_manager, source_field_name,
+                [src_obj for src_obj, dst_obj in pairs]
+                + [dst_obj for src_obj, dst_obj in pairs]))
+        if len(get_through_field_attnames(
+                src_manager, target_field_name)) == 2:
+            through_qs = through_qs.prefetch_related(target_field_name)
+        else:
+            through_qs = through_qs.select_related(target_field_name)
+        dst_keys_by_src_key = dict(
+            (build_through_field_key(src_manager, source_field_name, src_obj),
+             build_through_field_key(src_manager, source_field_name, dst_obj))
+            for src_obj, dst_obj in pairs)
+        src_entries = []
+        dst_entries = []
+        existing_keys = set()
+        for through_entry in through_qs:
+            entry_src_key = get_through_entry_key(
+                src_manager, source_field_name, through_entry)
+            existing_keys.add((entry_src_key, get_through_entry_key(
+                src_manager, target_field_name, through_entry)))
+            if entry_src_key in dst_keys_by_src_key:
+                src_entries.append(through_entry)
+            else:
+                dst_entries.append(through_entry)
+
+        new_entries = []
+        current_keys = set()
+
+        def clone_through_model_relationship(through_entry, dst_key,
+                                             rel_key):
+            current_keys.add((dst_key, rel_key))
+            if (dst_key, rel_key) in existing_keys:
+                return
+            existing_keys.add((dst_key, rel_key))
+            new_entries.append(copy_through_entry(
+                src_manager, through_entry, dst_key, rel_key))
+
+        published_entries_maybe_obsolete = []
+        current_published_rel_keys = set()
+        for through_entry in src_entries:
+            src_key = get_through_entry_key(
+                src_manager, source_field_name, through_entry)
+            dst_key = dst_keys_by_src_key[src_key]
+            rel_obj = getattr(through_entry, target_field_name)
+            rel_key = get_through_entry_key(
+                src_manager, target_field_name, through_entry)
+            # If the object referenced by the M2M is publishable we only
+            # clone the relationship if it is to a draft copy, not if it is
+            # to a published copy. If it is not a publishable object at
+            # all then we always clone the relationship (True by default).
+            if getattr(rel_obj, 'publishing_is_draft', True):
+                clone_through_model_relationship(
+                    through_entry, dst_key, rel_key)
+                # If the related draft object also has a published copy,
+                # we need to make sure the published copy also knows about
+                # this newly-published draft.
+                rel_obj_published_pk = getattr(
+                    rel_obj, 'publishing_linked_id', None)
+                if rel_obj_published_pk:
+                    clone_through_model_relationship(
+                        through_entry, src_key, build_through_field_key(
+                            src_manager, target_field_name, rel_obj,
+                            pk=rel_obj_published_pk))
+                    # Track PKs of published copies of related draft
+                    # copies, so we can tell later whether relationships
+                    # with published copies are obsolete
+                    current_published_rel_keys.add(
+                        (src_key, rel_obj_published_pk))
+            else:
+                # Track related published copies, in case they have
+                # become obsolete
+                published_entries_maybe_obsolete.append(
+                    (through_entry, src_key, rel_obj))
+        src_manager.through.objects.bulk_create(new_entries)
+        # If related published copies have no corresponding related
+        # draft after all the previous processing, the relationship is
+        # obsolete and must be removed.
+        obsolete_pks = [
+            through_entry.pk for through_entry, src_key, published_rel_obj
+            in published_entries_maybe_obsolete
+            if (src_key, published_rel_obj.pk)
+            not in current_published_rel_keys
+        ]
+        # Likewise relationships of a published copy that was updated in
+        # place, rather than re-created, are obsolete if they no longer
+        # correspond to a relationship of the draft.
+        obsolete_pks += [
+            through_entry.pk for through_entry in dst_entries
+            if (get_through_entry_key(
+                src_manager, source_field_name, through_entry),
+                get_through_entry_key(
+                    src_manager, target_field_name, through_entry))
+            not in current_keys
+        ]
+        if obsolete_pks:
+            src_manager.through.objects \
+                .filter(pk__in=obsolete_pks) \
+                .delete()
+
+    # Track the relationship through-tables we have processed to avoid
+    # processing the same relationships in both forward and reverse
+    # directions, which could otherwise happen in unusual cases like
+    # for SFMOMA event M2M inter-relationships which are explicitly
+    # defined both ways as a hack to expose form widgets.
+    seen_rel_through_tables = set()
+
+    # Get managers with the relationship details from the first draft,
+    # they are the same for all the drafts.
+    src_obj = pairs[0][0]
+
+    # Forward.
+    for field in src_obj._meta.many_to_many:
+        src_manager = getattr(src_obj, field.name)
+        clone(src_manager)
+        seen_rel_through_tables.add(field.rel.through)
+
+    # Reverse.
+    for field in get_all_related_many_to_many_objects(src_obj._meta):
+        # Skip reverse relationship we have already seen
+        if field.field.rel.through in seen_rel_through_tables:
+            continue
+        field_accessor_name = field.get_accessor_name()
+        # M2M relationships with `self` don't have accessor names
+        if not field_accessor_name:
+            continue
+        src_manager = getattr(src_obj, field_accessor_name)
+        clone(src_manager)
+
+
+def _clone_fluent_contentitems_m2m_relationships(pairs, replace=False):
+    """
+    Clone the M2M relationships of the content items of drafts to the
+    content items of their published copies, as described for
+    ``PublishingModel.clone_fluent_contentitems_m2m_relationships``, with a
+    fixed number of queries for all the drafts.
+
+    :param pairs: A list of ``(draft, published copy)`` pairs, all of the
+    same model.
+    """
+    if not pairs or not hasattr(pairs[0][0], 'contentitem_set'):
+        return
+    parent_type = ContentType.objects.get_for_model(pairs[0][0])
+
+    def get_items_by_parent(parent_pks, *fields):
+        # We must explicitly and reliably order both the src and dst content
+        # items here to ensure that we are processing the same logical item
+        # for the draft and published copies. The default `ContentItem`
+        # ordering of ('placeholder', 'sort_order') is not sufficient because
+        # it relies on the placeholder PK remaining static, whereas we clone
+        # placeholders to the published copy and may sometimes clone them
+        # with PKs in a different order.
+        items = ContentItem.objects.non_polymorphic() \
+            .filter(parent_type=parent_type, parent_id__in=parent_pks) \
+            .order_by(
+                'parent_id',
+                # Group items by owning placeholder using slot name, not PK
+                'placeholder__slot',
+                # Order items correctly within the placeholder grouping
+                'sort_order') \
+            .values_list('parent_id', *fields)
+        items_by_parent = {}
+        for item in items:
+            items_by_parent.setdefault(item[0], []).append(item[1:])
+        return items_by_parent
+
+    src_items_by_parent = get_items_by_parent(
+        [src_obj.pk for src_obj, dst_obj in pairs],
+        'pk', 'polymorphic_ctype_id')
+    dst_items_by_parent = get_items_by_parent(
+        [dst_obj.pk for src_obj, dst_obj in pairs], 'pk')
+    # Map the PKs of source content items to their destination copies,
+    # grouped by the M2M fields of their plugin models
+    dst_pks_by_field = OrderedDict()
+    for src_obj, dst_obj in pairs:
+        for (src_pk, ctype_id), (dst_pk, ) in zip(
+                src_items_by_parent.get(src_obj.pk, []),
+                dst_items_by_parent.get(dst_obj.pk, [])):
+            model = ContentType.objects.get_for_id(ctype_id).model_class()
+            for field, __ in get_m2m_with_model(model):
+                dst_pks_by_field.setdefault(field, {})[src_pk] = dst_pk
+
+    # Unless replacing, it is safe to just add relationships here, rather
+    # than match src and dst listing exactly (i.e. potentially delete or
+    # re-order items) because the destination content items are
+    # re-created on publish thus always have empty M2M rels.
+    for field, dst_pks_by_src_pk in dst_pks_by_field.items():
+        through = field.rel.through
+        source_attname = through._meta.get_field(
+            field.m2m_field_name()).attname
+        through_fields = [
+            f for f in through._meta.concrete_fields if not f.primary_key]
+
+        def get_key(entry):
+            return tuple(getattr(entry, f.attname) for f in through_fields)
+
+        existing_pks_by_key = {}
+        if replace:
+            for dst_entry in through._default_manager.filter(**{
+                    '%s__in' % source_attname:
+                    list(dst_pks_by_src_pk.values())}):
+                existing_pks_by_key[get_key(dst_entry)] = dst_entry.pk
+        through_entries = []
+        for src_entry in through._default_manager.filter(**{
+                '%s__in' % source_attname: list(dst_pks_by_src_pk)}):
+            through_entry = through(**dict(
+                (f.attname, getattr(src_entry, f.attname))
+                for f in through_fields))
+            setattr(through_entry, source_attname,
+                    dst_pks_by_src_pk[getattr(src_entry, source_attname)])
+            if existing_pks_by_key.pop(get_key(through_entry), None):
+                continue
+            through_entries.append(through_entry)
+        if existing_pks_by_key:
+            through._default_manager \
+                .filter(pk__in=list(existing_pks_by_key.values())) \
+                .delete()
+        through._default_manager.bulk_create(through_entries)
+
+
+def _bulk_clone_parler_translations(model, published_pks, drafts_qs):
+    """
+    Clone the django-parler translations of many drafts to their published
+    copies with one ``bulk_create`` per translated model.
+
+    :param published_pks: A dict mapping draft PKs to published copy PKs.
+    :param drafts_qs: A queryset of the drafts.
+    """
+    for parler_meta in getattr(model, '_parler_meta', None) or []:
+        translations = list(parler_meta.model.objects.filter(
+            master__in=Subquery(drafts_qs.values('pk'))))
+        for translation in translations:
+            translation.pk = None
+            translation.master_id = published_pks[translation.master_id]
+        parler_meta.model.objects.bulk_create(translations)
+        _cache_cloned_translations(translations)
+
+
+def _cache_cloned_translations(translations):
+    """
+    Refresh django-parler's cache for translations created with
+    ``bulk_create``, as ``save`` would, with a single cache call.
+
+    Translations are cached if ``bulk_create`` set their PKs, which depends
+    on the database, otherwise any stale cache entries are deleted instead.
+    """
+    if not parler_appsettings.PARLER_ENABLE_CACHING or not translations:
+        return
+    keys = [
+        get_translation_cache_key(
+            type(translation), translation.master_id,
+            translation.language_code)
+        for translation in translations
+    ]
+    if all(translation.pk for translation in translations):
+        values = []
+        for translation in translations:
+            value = {'id': translation.pk}
+            for name in translation.get_translated_fields():
+                value[name] = getattr(translation, name)
+            values.append(value)
+        parler_cache.set_many(dict(zip(keys, values)))
+    else:
+        parler_cache.delete_many(keys)
+
+
+def _bulk_clone_fluent_placeholders_and_content_items(
+        model, published_copies, drafts_qs):
+    """
+    Clone the `Placeholder`s of many drafts to their published copies with
+    one ``bulk_create``, then copy each placeholder's `ContentItem`s.
+
+    :param published_copies: A dict mapping drafts to published copies.
+    :param drafts_qs: A queryset of the drafts.
+    """
+    if not next(iter(published_copies)).has_placeholder_relationships():
+        return
+    published_pks = dict(
+        (draft.pk, publish_obj.pk)
+        for draft, publish_obj in published_copies.items())
+    parent_type = ContentType.objects.get_for_model(model)
+    src_placeholders = list(Placeholder.objects.filter(
+        parent_type=parent_type,
+        parent_id__in=Subquery(drafts_qs.values('pk'))))
+    Placeholder.objects.bulk_create([
+        Placeholder(
+            parent_type=parent_type,
+            parent_id=published_pks[src_placeholder.parent_id],
+            slot=src_placeholder.slot,
+            role=src_placeholder.role,
+            title=src_placeholder.title,
+        )
+        for src_placeholder in src_placeholders
+    ])
+    # Placeholders are unique per parent and slot, use this to find the PKs
+    # of the new placeholders.
+    dst_placeholders = dict(
+        ((p.parent_id, p.slot), p) for p in Placeholder.objects.filter(
+            parent_type=parent_type,
+            parent_id__in=Subquery(
+                drafts_qs.values('publishing_linked'))))
+    publish_objs = dict(
+        (publish_obj.pk, publish_obj)
+        for publish_obj in published_copies.values())
+    placeholder_map = {}
+    for src_placeholder in src_placeholders:
+        dst_placeholder = dst_placeholders[(
+            published_pks[src_placeholder.parent_id], src_placeholder.slot)]
+        dst_placeholder.parent = publish_objs[dst_placeholder.parent_id]
+        placeholder_map[src_placeholder.pk] = dst_placeholder
+    _bulk_copy_content_items(placeholder_map)
+
+
+def _get_changed_field_values(src_obj, dst_obj, ignore_fields=()):
+    """
+    Return a dict of the concrete field values of the source object that
+    differ from those of the destination object, by field attname.
+    """
+    changes = {}
+    for field in src_obj._meta.concrete_fields:
+        if field.attname in ignore_fields:
+            continue
+        value = getattr(src_obj, field.attname)
+        if value != getattr(dst_obj, field.attname):
+            changes[field.attname] = value
+    return changes
+
+
+def _update_parler_translations(draft, published):
+    """
+    Update the django-parler translations of a published copy in place to
+    match those of its draft: changed translations are updated, missing ones
+    created with one ``bulk_create`` per translated model, and obsolete ones
+    deleted.
+    """
+    for parler_meta in getattr(draft, '_parler_meta', None) or []:
+        translation_model = parler_meta.model
+        ignore_fields = [
+            translation_model._meta.pk.attname,
+            translation_model._meta.get_field('master').attname,
+        ]
+        dst_translations = dict(
+            (translation.language_code, translation) for translation
+            in translation_model.objects.filter(master_id=published.pk))
+        changed_translations = []
+        new_translations = []
+        for translation in translation_model.objects.filter(
+                master_id=draft.pk):
+            dst_translation = dst_translations.pop(
+                translation.language_code, None)
+            if dst_translation is None:
+                translation.pk = None
+                translation.master_id = published.pk
+                new_translations.append(translation)
+                continue
+            changes = _get_changed_field_values(
+                translation, dst_translation, ignore_fields)
+            if changes:
+                translation_model.objects.filter(pk=dst_translation.pk) \
+                    .update(**changes)
+                for attname, value in changes.items():
+                    setattr(dst_translation, attname, value)
+                changed_translations.append(dst_translation)
+        translation_model.objects.bulk_create(new_translations)
+        if dst_translations:
+            translation_model.objects.filter(pk__in=[
+                translation.pk for translation in dst_translations.values()
+            ]).delete()
+            for translation in dst_translations.values():
+                _delete_cached_translation(translation)
+        _cache_cloned_translations(changed_translations + new_translations)
+    # Forget translations loaded before the update
+    if hasattr(published, '_translations_cache'):
+        published._translations_cache.clear()
+
+
+def _are_placeholders_updatable(src_placeholders, dst_placeholders):
+    """
+    Return True if the given placeholders of a published copy can be updated
+    in place to match those of its draft, which requires them to be distinct
+    placeholders with unique slots.
+    """
+    for placeholders in (src_placeholders, dst_placeholders):
+        if len(set(p.slot for p in placeholders)) != len(placeholders):
+            return False
+    return not set(p.pk for p in src_placeholders) \
+        & set(p.pk for p in dst_placeholders)
+
+
+def _update_fluent_placeholders_and_content_items(
+        published, src_placeholders, dst_placeholders):
+    """
+    Update the `Placeholder`s of a published copy and their `ContentItem`s in
+    place to match those of its draft, matching placeholders by slot.
+
+    Content items are matched by their order within the placeholder and
+    updated in place while they have the same types as the draft's, and the
+    remaining items are replaced with copies of the draft's.
+    """
+    dst_placeholders_by_slot = dict((p.slot, p) for p in dst_placeholders)
+    placeholder_map = {}
+    src_item_pks = []
+    new_placeholders = []
+    for src_placeholder in src_placeholders:
+        dst_placeholder = dst_placeholders_by_slot.pop(
+            src_placeholder.slot, None)
+        if dst_placeholder is None:
+            new_placeholders.append(src_placeholder)
+            continue
+        dst_placeholder.parent = published
+        changes = _get_changed_field_values(
+            src_placeholder, dst_placeholder,
+            ['id', 'parent_type_id', 'parent_id'])
+        if changes:
+            Placeholder.objects.filter(pk=dst_placeholder.pk) \
+                .update(**changes)
+            for attname, value in changes.items():
+                setattr(dst_placeholder, attname, value)
+        new_item_pks = _update_content_items(src_placeholder, dst_placeholder)
+        if new_item_pks:
+            placeholder_map[src_placeholder.pk] = dst_placeholder
+            src_item_pks.extend(new_item_pks)
+
+    # Delete obsolete placeholders and their content items
+    if dst_placeholders_by_slot:
+        for dst_placeholder in dst_placeholders_by_slot.values():
+            _delete_content_items(dst_placeholder)
+        Placeholder.objects.filter(pk__in=[
+            p.pk for p in dst_placeholders_by_slot.values()]).delete()
+
+    if new_placeholders:
+        Placeholder.objects.bulk_create([
+            Placeholder(
+                parent_type=src_placeholder.parent_type,
+                parent_id=published.pk,
+                slot=src_placeholder.slot,
+                role=src_placeholder.role,
+                title=src_placeholder.title,
+            )
+            for src_placeholder in new_placeholders
+        ])
+        # Placeholders are unique per parent and slot, use this to find the
+        # PKs of the new placeholders.
+        dst_placeholders_by_slot = dict(
+            (p.slot, p) for p in Placeholder.objects.parent(published))
+        for src_placeholder in new_placeholders:
+            dst_placeholder = dst_placeholders_by_slot[src_placeholder.slot]
+            dst_placeholder.parent = published
+            placeholder_map[src_placeholder.pk] = dst_placeholder
+            src_item_pks.extend(
+                ContentItem.objects.non_polymorphic()
+                .filter(placeholder=src_placeholder)
+                .values_list('pk', flat=True))
+    _bulk_copy_content_items(placeholder_map, src_item_pks=src_item_pks)
+
+
+def _update_content_items(src_placeholder, dst_placeholder):
+    """
+    Update the `ContentItem`s of a published placeholder in place to match
+    those of the draft placeholder, pairing items by their order while they
+    have the same types. Unpaired published items are deleted, and the PKs
+    of unpaired draft items are returned for them to be copied.
+    """
+    def get_items(placeholder):
+        return list(
+            ContentItem.objects.non_polymorphic()
+            .filter(placeholder=placeholder)
+            .order_by('sort_order', 'pk')
+            .values_list('pk', 'polymorphic_ctype_id'))
+
+    src_items = get_items(src_placeholder)
+    dst_items = get_items(dst_placeholder)
+    paired = 0
+    for (__, src_ctype_id), (__, dst_ctype_id) in zip(src_items, dst_items):
+        if src_ctype_id != dst_ctype_id:
+            break
+        paired += 1
+    if paired < len(dst_items):
+        _delete_content_items(
+            dst_placeholder, [pk for pk, __ in dst_items[paired:]])
+
+    dst_pks_by_ctype = OrderedDict()
+    for (src_pk, ctype_id), (dst_pk, __) in zip(
+            src_items[:paired], dst_items[:paired]):
+        dst_pks_by_ctype.setdefault(ctype_id, {})[src_pk] = dst_pk
+    for ctype_id, dst_pks_by_src_pk in dst_pks_by_ctype.items():
+        model = ContentType.objects.get_for_id(ctype_id).model_class()
+        qs = model.objects.non_polymorphic()
+        dst_items_by_pk = dict(
+            (item.pk, item) for item
+            in qs.filter(pk__in=list(dst_pks_by_src_pk.values())))
+        ignore_fields = [
+            f.attname for f in model._meta.concrete_fields if f.primary_key
+        ] + ['placeholder_id', 'parent_type_id', 'parent_id']
+        for src_item in qs.filter(pk__in=list(dst_pks_by_src_pk)):
+            dst_item = dst_items_by_pk[dst_pks_by_src_pk[src_item.pk]]
+            changes = _get_changed_field_values(
+                src_item, dst_item, ignore_fields)
+            if not changes:
+                continue
+            model._base_manager.filter(pk=dst_item.pk).update(**changes)
+            for attname, value in changes.items():
+                setattr(dst_item, attname, value)
+            dst_item.placeholder = dst_placeholder
+            dst_item.clear_cache()
+    return [pk for pk, __ in src_items[paired:]]
+
+
+def _delete_content_items(placeholder, pks=None):
+    """
+    Delete the `ContentItem`s of a placeholder, or those with the given PKs,
+    and their cached output.
+    """
+    items = ContentItem.objects.filter(placeholder=placeholder)
+    if pks is not None:
+        items = items.filter(pk__in=pks)
+    for item in items:
+        item.placeholder = placeholder
+        item.clear_cache()
+    items.non_polymorphic().delete()
+
+
+def _delete_parents_content_items(model, parent_pks):
+    """
+    Delete the `ContentItem`s of the objects of a model with the given PKs,
+    and their cached output, with a fixed number of queries per plugin model.
+    """
+    parent_type = ContentType.objects.get_for_model(model)
+    placeholders = dict(
+        (placeholder.pk, placeholder)
+        for placeholder in Placeholder.objects.filter(
+            parent_type=parent_type, parent_id__in=parent_pks))
+    if not placeholders:
+        return
+    items = ContentItem.objects.filter(placeholder__in=list(placeholders))
+    items_by_model = OrderedDict()
+    for item in items:
+        item.placeholder = placeholders[item.placeholder_id]
+        item.clear_cache()
+        items_by_model.setdefault(type(item), []).append(item)
+    # Collect the plugin items with their shared `ContentItem` rows, which
+    # the collector would otherwise look up one by one via the polymorphic
+    # parent accessors.
+    collector = Collector(using=router.db_for_write(ContentItem))
+    for model_items in items_by_model.values():
+        collector.collect(model_items, keep_parents=True)
+    collector.collect(items.non_polymorphic())
+    collector.delete()
+
+
+def _is_bulk_copyable_content_item_model(model):
+    """
+    Return True if items of the given `ContentItem` model can be copied by
+    `_bulk_copy_content_items` instead of ``ContentItem.copy_to_placeholder``.
+    """
+    return (
+        # Only plugin models stored in one table beside `ContentItem`'s
+        list(model._meta.concrete_model._meta.parents) == [ContentItem]
+        # Respect model-specific customisations of copying and saving
+        and all(
+            six.get_unbound_function(getattr(model, name))
+            is six.get_unbound_function(getattr(ContentItem, name))
+            for name in ('copy_to_placeholder', 'move_to_placeholder', 'save'))
+    )
+
+
+def _bulk_copy_content_items(placeholder_map, src_item_pks=None,
+                             chunk_size=500):
+    """
+    Copy the `ContentItem`s of placeholders to other placeholders, as
+    ``ContentItem.copy_to_placeholder`` would, with one ``INSERT`` of the
+    shared `ContentItem` table and one per plugin model for each chunk of
+    items. Items are streamed in chunks of ``chunk_size`` by PK so memory use
+    stays bounded for very large pages.
+
+    Items of plugin models that customise copying or saving, or that have no
+    language code, are copied one by one with ``copy_to_placeholder``.
+
+    :param placeholder_map: A dict mapping source placeholder PKs to the
+    destination placeholders.
+    :param src_item_pks: The PKs of the items to copy, or None to copy all
+    the items of the source placeholders.
+    """
+    if not placeholder_map:
+        return
+    using = router.db_for_write(ContentItem)
+    base_qs = ContentItem.objects.non_polymorphic() \
+        .filter(placeholder__in=list(placeholder_map)).order_by('pk')
+    if src_item_pks is not None:
+        base_qs = base_qs.filter(pk__in=src_item_pks)
+    last_src_pk = 0
+    # The largest PK of items already in the destination placeholders, to
+    # look up the PKs of new items if the database does not return them.
+    last_dst_pk = 0
+    features = connections[using].features
+    if not getattr(features, 'can_return_ids_from_bulk_insert', False):
+        last_dst_pk = ContentItem.objects.non_polymorphic() \
+            .filter(placeholder__in=[
+                p.pk for p in placeholder_map.values()]) \
+            .aggregate(pk=Max('pk'))['pk'] or 0
+    while True:
+        chunk = list(base_qs.filter(pk__gt=last_src_pk)[:chunk_size])
+        if not chunk:
+            break
+        last_src_pk = chunk[-1].pk
+        pks_by_ctype = OrderedDict()
+        for item in chunk:
+            pks_by_ctype.setdefault(item.polymorphic_ctype_id, []) \
+                .append(item.pk)
+
+        # Load the plugin items of each type in the chunk
+        bulk_items = []
+        other_items = []
+        for ctype_id, pks in pks_by_ctype.items():
+            model = ContentType.objects.get_for_id(ctype_id).model_class()
+            is_bulk_copyable = _is_bulk_copyable_content_item_model(model)
+            for item in model.objects.non_polymorphic().filter(pk__in=pks):
+                if is_bulk_copyable and item.language_code:
+                    bulk_items.append(item)
+                else:
+                    other_items.append(item)
+        if bulk_items:
+            last_dst_pk = _bulk_insert_content_items(
+                bulk_items, placeholder_map, last_dst_pk, using)
+        # Copy other items after the bulk insert, which relies on being the
+        # last to have added items to the destination placeholders.
+        for item in other_items:
+            item.copy_to_placeholder(
+                placeholder_map[item.placeholder_id], in_place=True)
+            last_dst_pk = max(last_dst_pk, item.pk)
+
+
+def _bulk_insert_content_items(items, placeholder_map, last_dst_pk, using):
+    """
+    Insert copies of the given plugin items in the destination placeholders
+    of their placeholders, and return the largest new `ContentItem` PK.
+
+    :param last_dst_pk: The largest PK of the items already in the
+    destination placeholders.
+    """
+    base_fields = [
+        f for f in ContentItem._meta.concrete_fields if not f.primary_key]
+
+    # Insert the shared `ContentItem` rows for all types at once
+    new_base_items = []
+    for item in items:
+        new_base_item = ContentItem(**dict(
+            (f.attname, getattr(item, f.attname)) for f in base_fields))
+        dst_placeholder = placeholder_map[item.placeholder_id]
+        new_base_item.placeholder_id = dst_placeholder.pk
+        new_base_item.parent_type_id = dst_placeholder.parent_type_id
+        new_base_item.parent_id = dst_placeholder.parent_id
+        new_base_items.append(new_base_item)
+    ContentItem.objects.non_polymorphic().using(using) \
+        .bulk_create(new_base_items)
+    new_pks = [new_base_item.pk for new_base_item in new_base_items]
+    if not all(new_pks):
+        # The database did not return the new PKs. The destination
+        # placeholders are only populated here, and rows inserted
+        # together get ascending PKs above those of existing rows, so
+        # look up the new PKs in order.
+        new_pks = list(
+            ContentItem.objects.non_polymorphic()
+            .filter(placeholder__in=[
+                p.pk for p in placeholder_map.values()], pk__gt=last_dst_pk)
+            .order_by('pk').values_list('pk', flat=True))
+        if len(new_pks) != len(new_base_items):  # pragma: no cover
+            raise PublishingException(
+                "Failed to copy content items to new placeholders")
+
+    # Insert the plugin rows of each type, linked to the new shared rows
+    items_by_model = OrderedDict()
+    for item, new_base_item, new_pk in zip(items, new_base_items, new_pks):
+        item.pk = item.id = new_pk
+        item.placeholder_id = new_base_item.placeholder_id
+        item.parent_type_id = new_base_item.parent_type_id
+        item.parent_id = new_base_item.parent_id
+        item._state.adding = False
+        items_by_model.setdefault(
+            item._meta.concrete_model, []).append(item)
+    connection = connections[using]
+    for model, model_items in items_by_model.items():
+        fields = model._meta.local_concrete_fields
+        batch_size = max(
+            connection.ops.bulk_batch_size(fields, model_items), 1)
+        for i in range(0, len(model_items), batch_size):
+            model._base_manager._insert(
+                model_items[i:i + batch_size], fields=fields, using=using)
+    return max(new_pks)
+
+
+def bulk_unpublish(drafts, batch_signals=False):
+    """
+    Unpublish many draft objects together, in a fixed number of queries
+    instead of the queries per object performed by
+    ``PublishingModel.unpublish``.
+
+    The published copies of all the drafts are deleted in a single pass of
+    Django's deletion collector, and the drafts are unlinked from their
+    published copies with one ``UPDATE`` per model. Drafts of models with a
+    customised ``unpublish`` method are unpublished one by one instead.
+
+    Drafts are not saved with ``save``. The publishing signals for each draft
+    are sent as usual, unless ``batch_signals`` is set in which case only the
+    ``publishing_post_unpublish_batch`` signal is sent once per model with all
+    the drafts unpublished for that model.
+
+    :param drafts: An iterable of draft objects, such as a queryset.
+    Unpublished drafts and published copies are ignored, as for
+    ``unpublish``.
+    :param batch_signals: Send one batched signal per model instead of the
+    publishing signals for each draft.
+    """
+    drafts_by_model = OrderedDict()
+    for draft in drafts:
+        # Unwrap drafts that were booby-trapped in a public request context
+        if hasattr(draft, 'get_draft_payload'):
+            draft = draft.get_draft_payload()
+        if not draft.is_draft or not draft.publishing_linked_id:
+            continue
+        drafts_by_model.setdefault(type(draft), []).append(draft)
+
+    with transaction.atomic():
+        for model in list(drafts_by_model):
+            if not _is_bulk_unpublishable(model):
+                for draft in drafts_by_model.pop(model):
+                    draft.unpublish()
+        if not drafts_by_model:
+            return
+
+        if batch_signals:
+            # No `publishing_pre_unpublish` signal is sent for the drafts, so
+            # remove the published copies from the routing index here.
+            for model, model_drafts in drafts_by_model.items():
+                _update_published_copies_routing_index(
+                    model, model_drafts, remove=True)
+        else:
+            for model, model_drafts in drafts_by_model.items():
+                for draft in model_drafts:
+                    publishing_signals.publishing_pre_unpublish.send(
+                        sender=model, instance=draft)
+
+        # Unlink drafts from their published copies first, so the collector
+        # has no `publishing_linked` references to clear on deletion.
+        now = timezone.now()
+        published_querysets = []
+        for model, model_drafts in drafts_by_model.items():
+            published_pks = [d.publishing_linked_id for d in model_drafts]
+            model.objects.filter(pk__in=[d.pk for d in model_drafts]).update(
+                publishing_linked=None,
+                publishing_published_at=None,
+                # Set update time as `publishing_set_update_time` would
+                publishing_modified_at=now,
+            )
+            # NOTE: Filter by PKs instead of deleting via relationships, as
+            # for `unpublish`, to avoid unwanted MPTT tree structure updates.
+            published_querysets.append(
+                model.objects.filter(pk__in=published_pks))
+
+        # Delete all published copies in a single collector pass
+        collector = Collector(
+            using=router.db_for_write(published_querysets[0].model))
+        for published_qs in published_querysets:
+            collector.collect(published_qs)
+        collector.delete()
+
+        for model, model_drafts in drafts_by_model.items():
+            for draft in model_drafts:
+                discard_publishing_status(draft)
+                draft.publishing_linked = None
+                draft.publishing_published_at = None
+                draft.publishing_modified_at = now
+            if batch_signals:
+                publishing_signals.publishing_post_unpublish_batch.send(
+                    sender=model, instances=model_drafts)
+                continue
+            for draft in model_drafts:
+                # The draft is already saved without its relationship with the
+                # published copy, flag it so it isn't saved again.
+                draft._skip_save_draft_on_publish = True
+                publishing_signals.publishing_unpublish_save_draft.send(
+                    sender=model, instance=draft)
+                publishing_signals.publishing_post_unpublish.send(
+                    sender=model, instance=draft)
+
+
+def _update_published_copies_routing_index(model, drafts, remove=False):
+    """
+    Add routing index entries for the published copies of the given drafts,
+    or remove them if ``remove`` is set, with one query for the translations
+    of all the copies.
+    """
+    if not hasattr(model, 'translations'):
+        return
+    published_copies = model.objects \
+        .filter(pk__in=[d.publishing_linked_id for d in drafts]) \
+        .prefetch_related('translations')
+    for published in published_copies:
+        update_routing_index(
+            published, published.translations.all(), remove=remove)
+
+
+def _is_bulk_unpublishable(model):
+    """
+    Return True if the drafts of the given model can be unpublished with
+    ``bulk_unpublish`` instead of ``PublishingModel.unpublish``.
+    """
+    # Respect model-specific customisations of unpublishing
+    return six.get_unbound_function(model.unpublish) \
+        is six.get_unbound_function(PublishingModel.unpublish)
+
+
 @receiver(publishing_signals.publishing_publish_save_draft)
 @receiver(publishing_signals.publishing_unpublish_save_draft)
 def save_draft_on_publish_and_unpublish(sender, instance, **kwargs):
@@ -727,6 +1941,10 @@ def save_draft_on_publish_and_unpublish(sender, instance, **kwargs):
     need more control over object saving in downstream projects, such as for
     saving version information with 'reversion'.
     """
+    # Skip drafts already saved by `bulk_publish` or `bulk_unpublish`
+    if getattr(instance, '_skip_save_draft_on_publish', False):
+        instance._skip_save_draft_on_publish = False
+        return
     instance.save()
 
 
@@ -734,6 +1952,7 @@ def save_draft_on_publish_and_unpublish(sender, instance, **kwargs):
 def publishing_set_update_time(sender, instance, **kwargs):
     """ Update the time modified before saving a publishable object. """
     if hasattr(instance, 'publishing_linked'):
+        discard_publishing_status(instance)
         # Hack to avoid updating `publishing_modified_at` field when a draft
         # publishable item is saved as part of a `publish` operation. This
         # ensures that the `publishing_published_at` timestamp is later than
@@ -786,6 +2005,42 @@ def update_fluent_cached_urls_post_publish(sender, instance, **kwargs):
     update_fluent_cached_urls(instance.publishing_linked)
 
 
+@receiver(publishing_signals.publishing_post_publish)
+def purge_published_page_cache_post_publish(sender, instance, **kwargs):
+    """
+    Purge cached published page responses, which may show the item, or only
+    those of the item itself if it has no changes shown by other items
+    """
+    has_shared_changes = getattr(
+        instance, '_publishing_has_shared_changes', True)
+    instance._publishing_has_shared_changes = True
+    if has_shared_changes:
+        purge_published_page_cache()
+    else:
+        set_published_page_version(instance.pk, instance.publishing_linked)
+
+
+@receiver(publishing_signals.publishing_post_publish_batch)
+@receiver(publishing_signals.publishing_post_unpublish)
+@receiver(publishing_signals.publishing_post_unpublish_batch)
+def purge_published_page_cache_post_unpublish(sender, **kwargs):
+    """
+    Purge cached published page responses, which may show the items
+    """
+    purge_published_page_cache()
+
+
+@receiver(publishing_signals.publishing_pre_unpublish)
+def remove_published_copy_from_routing_index_pre_unpublish(
+        sender, instance, **kwargs):
+    """
+    Remove routing index entries for the published copy being unpublished
+    """
+    published = instance.publishing_linked
+    if published is not None and hasattr(published, 'translations'):
+        update_routing_index(published, remove=True)
+
+
 @receiver(models.signals.post_save)
 def sync_mptt_tree_fields_from_draft_to_published_post_save(
         sender, instance, **kwargs):
@@ -814,20 +2069,7 @@ def sync_mptt_tree_fields_from_draft_to_published(
         return {}
     # Identify changed values and prepare dict of changes to apply to DB
     parent_changed = draft_copy.parent != published_copy.parent
-    update_kwargs = {
-        mptt_opts.parent_attr: draft_copy._mpttfield('parent'),
-        mptt_opts.tree_id_attr: draft_copy._mpttfield('tree_id'),
-        mptt_opts.left_attr: draft_copy._mpttfield('left'),
-        mptt_opts.right_attr: draft_copy._mpttfield('right'),
-        mptt_opts.level_attr: draft_copy._mpttfield('level'),
-    }
-    # Strip out DB update entries for unchanged or invalid tree fields
-    update_kwargs = dict(
-        (field, value) for field, value in update_kwargs.items()
-        if getattr(draft_copy, field) != getattr(published_copy, field)
-        # Only parent may be None, never set tree_id/left/right/level to None
-        and not (field != 'parent' and value is None)
-    )
+    update_kwargs = _get_mptt_tree_field_changes(draft_copy, published_copy)
     change_report = []
     for field, new_value in update_kwargs.items():
         old_value = getattr(published_copy, field)
@@ -851,39 +2093,280 @@ def sync_mptt_tree_fields_from_draft_to_published(
     return change_report
 
 
+def _get_mptt_tree_field_changes(draft_copy, published_copy):
+    """
+    Return a dict of the MPTT tree structure field values of a draft copy
+    that differ from those of its published copy.
+    """
+    mptt_opts = draft_copy._mptt_meta
+    update_kwargs = {}
+    for name in ('parent', 'tree_id', 'left', 'right', 'level'):
+        field = getattr(mptt_opts, '%s_attr' % name)
+        # Compare raw column values, so the parent isn't fetched unless it
+        # has changed
+        attname = draft_copy._meta.get_field(field).attname
+        value = getattr(draft_copy, attname)
+        # Strip out DB update entries for unchanged or invalid tree fields
+        if value == getattr(published_copy, attname):
+            continue
+        # Only parent may be None, never set tree_id/left/right/level to None
+        if name != 'parent' and value is None:
+            continue
+        update_kwargs[field] = draft_copy._mpttfield(name)
+    return update_kwargs
+
+
+def sync_mptt_tree_fields_from_drafts_to_published(
+        dry_run=False, batch_size=500):
+    """
+    Sync tree structure changes from all draft publishable MPTT objects to
+    their published copies, like `sync_mptt_tree_fields_from_draft_to_published`
+    but comparing all draft/published pairs of each model in one query and
+    applying changes with one ``UPDATE`` per batch of published copies. Or
+    simulates doing this if ``dry_run`` is ``True``.
+
+    Yields the same change report entries as the single item version as the
+    changes are found, for use on trees that drifted out of sync.
+    """
+    from .utils import get_publishable_models
+
+    seen = set()
+    reparented = []
+    for model in get_publishable_models():
+        mptt_opts = getattr(model, '_mptt_meta', None)
+        if model._meta.proxy or not mptt_opts:
+            continue
+        drafts = model._base_manager \
+            .filter(publishing_is_draft=True, publishing_linked__isnull=False) \
+            .select_related('publishing_linked') \
+            .order_by(mptt_opts.tree_id_attr, mptt_opts.left_attr)
+        pending = []
+        for draft_copy in drafts.iterator():
+            # Skip items already seen via a parent model
+            if draft_copy.pk in seen:
+                continue
+            seen.add(draft_copy.pk)
+            published_copy = draft_copy.publishing_linked
+            update_kwargs = _get_mptt_tree_field_changes(
+                draft_copy, published_copy)
+            if not update_kwargs:
+                continue
+            for field, new_value in update_kwargs.items():
+                old_value = getattr(published_copy, field)
+                yield (draft_copy, field, old_value, new_value)
+            pending.append((published_copy, update_kwargs))
+            if mptt_opts.parent_attr in update_kwargs:
+                # Make our local published obj aware of the change
+                published_copy.parent = draft_copy.parent
+                reparented.append(published_copy)
+            if len(pending) >= batch_size:
+                if not dry_run:
+                    _bulk_update_mptt_tree_fields(model, pending)
+                pending = []
+        if pending and not dry_run:
+            _bulk_update_mptt_tree_fields(model, pending)
+
+    # If real tree structure (not just MPTT fields) has changed we must
+    # regenerate the cached URLs for published copy translations, which
+    # also covers their descendants.
+    done = []
+    for published_copy in reparented:
+        if not hasattr(published_copy, 'translations'):
+            continue
+        mptt_opts = published_copy._mptt_meta
+        tree_id = getattr(published_copy, mptt_opts.tree_id_attr)
+        left = getattr(published_copy, mptt_opts.left_attr)
+        if any(tree_id == t and l < left < r for t, l, r in done):
+            continue
+        done.append((tree_id, left,
+                     getattr(published_copy, mptt_opts.right_attr)))
+        for change in update_fluent_cached_urls(
+                published_copy, dry_run=dry_run):
+            yield change
+
+
+def _bulk_update_mptt_tree_fields(model, pending):
+    """
+    Apply the given MPTT tree field changes, as pairs of published copy and
+    dict of changed values, with one ``UPDATE`` of the given model.
+    """
+    values_by_field = OrderedDict()
+    for published_copy, update_kwargs in pending:
+        for field, value in update_kwargs.items():
+            if isinstance(value, models.Model):
+                value = value.pk
+            values_by_field.setdefault(field, []).append(
+                When(pk=published_copy.pk, then=Value(value)))
+    update_kwargs = {}
+    for field, whens in values_by_field.items():
+        model_field = model._meta.get_field(field)
+        update_kwargs[field] = Case(
+            *whens,
+            default=F(model_field.attname),
+            output_field=getattr(model_field, 'target_field', model_field))
+    model._base_manager \
+        .filter(pk__in=[published_copy.pk for published_copy, _ in pending]) \
+        .update(**update_kwargs)
+
+
 def update_fluent_cached_urls(item, dry_run=False):
     """
     Regenerate the cached URLs for an item's translations. This is a fiddly
     business: we use "hidden" methods instead of the public ones to avoid
     unnecessary and unwanted slug changes to ensure uniqueness, the logic for
     which doesn't work with our publishing.
+
+    The item's descendants are also processed, in case changes to this item
+    affect the URLs that should be cached for them. The whole subtree and its
+    translations are loaded at once, the new URLs are computed in memory, and
+    the changed URLs are saved with one ``UPDATE`` per batch of translations.
     """
     change_report = []
-    if hasattr(item, 'translations'):
-        for translation in item.translations.all():
+    if not hasattr(item, 'translations'):
+        return change_report
+
+    nodes = _get_fluent_subtree_by_publishing_status(item)
+    translations_by_node = dict((node.pk, []) for node in nodes)
+    for translation in UrlNode_Translation.objects.filter(
+            master__in=list(translations_by_node)):
+        translations_by_node[translation.master_id].append(translation)
+
+    # Cached URLs of parent nodes by node PK and language, for parents outside
+    # the subtree such as the drafts of published copies.
+    cached_urls = dict(
+        ((t.master_id, t.language_code), t._cached_url)
+        for t in UrlNode_Translation.objects.filter(
+            master__in=set(n.parent_id for n in nodes if n.parent_id)
+            - set(translations_by_node)))
+
+    changed_translations = []
+    for node in nodes:
+        for translation in translations_by_node[node.pk]:
             old_url = translation._cached_url
-            item._update_cached_url(translation)
+            # Provide the parent URL computed in this pass, so it isn't
+            # fetched from the database
+            parent_url = cached_urls.get(
+                (node.parent_id, translation.language_code))
+            if parent_url:
+                translation._fetched_parent_url = parent_url
+            node._update_cached_url(translation)
+            cached_urls[(node.pk, translation.language_code)] = \
+                translation._cached_url
             change_report.append(
                 (translation, '_cached_url', old_url, translation._cached_url))
-            if not dry_run:
-                translation.save()
-        if not dry_run:
-            item._expire_url_caches()
-        # Also process all the item's children, in case changes to this item
-        # affect the URL that should be cached for the children. We process
-        # only draft-or-published children, according to the item's status.
-        if item.is_draft:
-            children = [child for child in item.children.all()
-                        if child.is_draft]
-        else:
-            children = [child for child in item.get_draft().children.all()
-                        if child.is_published]
-        for child in children:
-            update_fluent_cached_urls(child, dry_run=dry_run)
+            if translation._cached_url != old_url:
+                changed_translations.append(translation)
+
+    if not dry_run:
+        _bulk_update_cached_urls(changed_translations)
+        expired = set()
+        for node in nodes:
+            if (type(node), node.parent_site_id) not in expired:
+                expired.add((type(node), node.parent_site_id))
+                node._expire_url_caches()
+            update_routing_index(node, translations_by_node[node.pk])
 
     return change_report
 
 
+def _get_fluent_subtree_by_publishing_status(item):
+    """
+    Return the given Fluent page item with its draft-or-published
+    descendants, according to the item's status, in depth-first order.
+
+    Published copies have the same parent as their draft, so the children of
+    a published copy are the published children of its draft.
+    """
+    draft = item if item.is_draft else item.get_draft()
+    opts = draft._mptt_meta
+    subtree = UrlNode.objects.filter(**{
+        opts.tree_id_attr: getattr(draft, opts.tree_id_attr),
+        '%s__gt' % opts.left_attr: getattr(draft, opts.left_attr),
+        '%s__lt' % opts.left_attr: getattr(draft, opts.right_attr),
+    }).order_by(opts.left_attr)
+    children_by_parent = {}
+    draft_pks = {item.pk: draft.pk}
+    for node in subtree:
+        if getattr(node, 'is_draft', False) and node.publishing_linked_id:
+            draft_pks[node.publishing_linked_id] = node.pk
+        if getattr(node, 'is_draft', False) == item.is_draft \
+                and getattr(node, 'is_published', False) == item.is_published:
+            children_by_parent.setdefault(node.parent_id, []).append(node)
+
+    nodes = []
+    stack = [item]
+    while stack:
+        node = stack.pop()
+        nodes.append(node)
+        children = children_by_parent.get(draft_pks.get(node.pk, node.pk), [])
+        stack.extend(reversed(children))
+    return nodes
+
+
+def _bulk_update_cached_urls(translations, batch_size=500):
+    """
+    Save the cached URLs of the given Fluent page translations with one
+    ``UPDATE`` per batch, and refresh them in django-parler's cache as
+    ``save`` would.
+    """
+    for i in range(0, len(translations), batch_size):
+        batch = translations[i:i + batch_size]
+        UrlNode_Translation.objects.filter(pk__in=[t.pk for t in batch]) \
+            .update(_cached_url=Case(
+                *[When(pk=t.pk, then=Value(t._cached_url)) for t in batch],
+                output_field=models.CharField()))
+    for translation in translations:
+        _cache_translation(translation)
+
+
+def make_slugs_unique(translations):
+    """
+    Make the slugs of Fluent page translations unique among the node's
+    siblings, by adding the next free numeric suffix as Fluent does. All the
+    sibling slugs sharing a slug's prefix are fetched with one query per
+    site, parent and language, instead of a query per candidate slug.
+
+    Slugs are also made unique among the given translations, so many drafts
+    in one import can be given unique slugs together.
+
+    :param translations: An iterable of ``(node, translation)`` pairs.
+    """
+    from fluent_pages import appsettings
+
+    groups = OrderedDict()
+    for node, translation in translations:
+        key = (node.parent_site_id, node.parent_id, translation.language_code)
+        groups.setdefault(key, []).append((node, translation))
+
+    for (site_id, parent_id, language_code), group in groups.items():
+        # Ignore the slugs of the nodes themselves and their published copies
+        exclude_pks = set()
+        slugs_q = Q(pk__in=[])
+        for node, translation in group:
+            exclude_pks.update(
+                pk for pk in (
+                    node.pk, getattr(node, 'publishing_linked_id', None))
+                if pk)
+            slugs_q |= Q(slug__startswith=translation.slug)
+        sibling_translations = UrlNode_Translation.objects.filter(
+            slugs_q,
+            language_code=language_code,
+            master__parent=parent_id,
+        ).exclude(master__in=exclude_pks)
+        if appsettings.FLUENT_PAGES_FILTER_SITE_ID:
+            sibling_translations = sibling_translations.filter(
+                master__parent_site=site_id)
+        taken_slugs = set(sibling_translations.values_list('slug', flat=True))
+
+        for node, translation in group:
+            original_slug = translation.slug
+            count = 1
+            while translation.slug in taken_slugs:
+                count += 1
+                translation.slug = '%s-%d' % (original_slug, count)
+            taken_slugs.add(translation.slug)
+
+
 @receiver(models.signals.pre_delete)
 def delete_published_copy_when_draft_deleted(sender, **kwargs):
     # Skip missing or unpublishable instances
@@ -24,6 +24,11 @@ publishing_unpublish_save_draft = Signal(providing_args=['instance'])
 publishing_post_publish = Signal(providing_args=['instance'])
 
 
+# Sent once per model when many models are published together with batched
+# signals, instead of the signals above (the drafts are sent).
+publishing_post_publish_batch = Signal(providing_args=['instances'])
+
+
 # Sent when a model is about to be unpublished (the draft is sent).
 publishing_pre_unpublish = Signal(providing_args=['instance'])
 
@@ -31,5 +36,10 @@ publishing_pre_unpublish = Signal(providing_args=['instance'])
 # Sent when a model is unpublished (the draft is sent).
 publishing_post_unpublish = Signal(providing_args=['instance'])
 
+
+# Sent once per model when many models are unpublished together with batched
+# signals, instead of the signals above (the drafts are sent).
+publishing_post_unpublish_batch = Signal(providing_args=['instances'])
+
 # Sent when a model is saved and all relationships finalised (draft is sent).
 publishing_post_save_related = Signal(providing_args=['instance'])
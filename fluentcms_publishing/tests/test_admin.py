@@ -1,25 +1,40 @@
 # -*- coding: utf-8 -*-
 
 from django.db import models
+from django.db.models import Count
 from django.contrib import admin
+from django.contrib.admin.templatetags.admin_list import items_for_result
 from django.core.urlresolvers import reverse
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
 from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
 from django.test.utils import override_settings, modify_settings
+from django.utils.six import StringIO
 
 from django_dynamic_fixture import G
 
 from django_webtest import WebTest
 
-from fluent_pages.models.db import PageLayout
+from fluent_pages.models.db import PageLayout, UrlNode
 
 from fluent_contents.models import Placeholder
 from fluent_contents.plugins.rawhtml.models import RawHtmlItem
 
-from ..admin import PublishingAdmin
+from ..admin import (
+    FluentPagesParentAdminMixin, PublishingAdmin, PublishingPublishedFilter,
+    PublishingStatusFilter)
+from ..middleware import (
+    PublishedPageCacheMiddleware, override_publishing_middleware_active)
 from ..models import PublishingModel
 from ..pagetypes.fluentpage.models import FluentPage as Page
-from ..utils import create_content_instance, get_draft_hmac#, verify_draft_url, get_draft_url
+from ..utils import (
+    create_content_instance, get_draft_hmac, get_published_page_cache_version,
+    purge_published_page_cache)#, verify_draft_url, get_draft_url
 
 
 User = get_user_model()
@@ -150,6 +165,101 @@ class TestPublishingAdmin(AdminTest):
         self.assertTrue([f for f in response.text.split('\n') if 'submit' in f if '_publish' in f])
         self.assertFalse([f for f in response.text.split('\n') if 'submit' in f if '_unpublish' in f])
 
+    @override_settings(FLUENTCMS_PUBLISHING_USE_JOB_QUEUE=True)
+    def test_publish_model_with_job_queue(self):
+        response = self.app.get(
+            reverse('admin:fluentcms_publishing_modelm_publish',
+                    args=(self.model.pk, )),
+            user=self.staff,
+            xhr=True,
+        )
+        # Publishing is queued instead of being done in the request
+        self.assertEqual(200, response.status_code)
+        self.assertTrue(response.json['success'])
+        self.assertIsNone(self.refresh(self.model).publishing_linked)
+
+        # Job status is available as JSON
+        response = self.app.get(response.json['status_url'], user=self.staff)
+        self.assertEqual('publish', response.json['action'])
+        self.assertEqual('pending', response.json['status'])
+
+        call_command('publishing_worker', once=True, stdout=StringIO())
+        response = self.app.get(
+            reverse('admin:fluentcms_publishing_modelm_publishing_job',
+                    args=(response.json['id'], )),
+            user=self.staff)
+        self.assertEqual('done', response.json['status'])
+        self.assertIsNotNone(self.refresh(self.model).publishing_linked)
+
+    @override_settings(FLUENTCMS_PUBLISHING_USE_JOB_QUEUE=True)
+    def test_bulk_publish_actions_with_job_queue(self):
+        from ..jobs.models import PublishingJob
+        changelist_url = reverse(
+            'admin:fluentcms_publishing_modelm_changelist')
+        for action in ('publish', 'unpublish'):
+            response = self.app.post(
+                changelist_url,
+                params={'action': action,
+                        '_selected_action': [self.model.pk]},
+                user=self.staff)
+            self.assertEqual(302, response.status_code)
+            # The action is queued instead of being done in the request
+            self.assertEqual(
+                [action],
+                [j.action for j in PublishingJob.objects.for_object(
+                    self.model).filter(action=action)])
+            self.assertIsNone(self.refresh(self.model).publishing_linked)
+
+    def test_publishing_job_view_permissions_and_missing_models(self):
+        from ..jobs.models import PublishingJob
+        # Permissions are checked before looking up the job
+        user = G(User, is_staff=True, is_active=True, is_superuser=False)
+        response = self.app.get(
+            reverse('admin:fluentcms_publishing_modelm_publishing_job',
+                    args=(0, )),
+            user=user, expect_errors=True)
+        self.assertEqual(403, response.status_code)
+        # Jobs for models that no longer exist are not found
+        job = PublishingJob.objects.create(
+            content_type=ContentType.objects.create(
+                app_label='removed_app', model='removedmodel'),
+            object_id=self.model.pk,
+            action='publish',
+        )
+        response = self.app.get(
+            reverse('admin:fluentcms_publishing_modelm_publishing_job',
+                    args=(job.pk, )),
+            user=self.staff, expect_errors=True)
+        self.assertEqual(404, response.status_code)
+
+
+    def test_changelist_query_count_is_constant(self):
+        changelist_url = reverse('admin:fluentcms_publishing_modelm_changelist')
+        self.model.publish()
+
+        def count_changelist_queries():
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.app.get(changelist_url, user=self.staff)
+            self.assertEqual(response.status_code, 200)
+            return len(ctx.captured_queries)
+
+        # Warm up caches, such as for content types
+        count_changelist_queries()
+        num_queries = count_changelist_queries()
+        for i in range(10):
+            ModelM.objects.create(title='Item %d' % i).publish()
+        self.assertEqual(num_queries, count_changelist_queries())
+
+        # Admin URLs reversed once per request are correct for each item
+        model_admin = admin.site._registry[ModelM]
+        request = RequestFactory().get(changelist_url)
+        for obj in ModelM.objects.draft():
+            self.assertEqual(
+                reverse('admin:fluentcms_publishing_modelm_unpublish',
+                        args=(obj.pk, )),
+                model_admin._reverse_publishing_url(
+                    request, model_admin.unpublish_reverse(), obj))
+
 
 class TestPublishingAdminForPage(AdminTest):
 
@@ -184,6 +294,88 @@ class TestPublishingAdminForPage(AdminTest):
             'admin:fluentpage_fluentpage_change',
             args=(self.page.pk, ))
 
+    def test_changelist_results_are_real_instances_with_status(self):
+        self.page.publish()
+        model_admin = admin.site._registry[ModelM]
+        nodes = list(UrlNode.objects.non_polymorphic().filter(
+            pk=self.page.pk))
+        with self.assertNumQueries(1):
+            results = model_admin.get_publishing_changelist_results(nodes)
+        self.assertEqual([self.page.pk], [obj.pk for obj in results])
+        page = results[0]
+        self.assertIsInstance(page, Page)
+        with self.assertNumQueries(0):
+            self.assertTrue(page.has_been_published)
+            self.assertFalse(page.is_dirty)
+
+    def test_changelist_results_keep_admin_queryset_values(self):
+        class AnnotatedPageAdmin(FluentPagesParentAdminMixin):
+            list_display = ('title', 'author_name', 'child_count')
+
+            def get_queryset(self, request):
+                return super(AnnotatedPageAdmin, self) \
+                    .get_queryset(request) \
+                    .select_related('author') \
+                    .annotate(num_children=Count('children'))
+
+            def author_name(self, obj):
+                return obj.author.username
+
+            def child_count(self, obj):
+                return obj.num_children
+
+        Page.objects.create(
+            author=self.admin,
+            title='Child',
+            slug='child',
+            layout=self.layout,
+            parent=self.page,
+        )
+        model_admin = AnnotatedPageAdmin(UrlNode, admin.site)
+        request = RequestFactory().get('/')
+        request.user = self.admin
+        response = model_admin.changelist_view(request)
+        changelist = response.context_data['cl']
+        results = dict((obj.pk, obj) for obj in changelist.result_list)
+        page = results[self.page.pk]
+        self.assertIsInstance(page, Page)
+        with self.assertNumQueries(0):
+            self.assertEqual(1, page.num_children)
+            self.assertEqual(self.admin, page.author)
+            row = list(items_for_result(changelist, page, None))
+        self.assertIn('>%s<' % self.admin.username, row[-2])
+        self.assertIn('>1<', row[-1])
+
+    def test_list_filters_for_urlnode_queryset(self):
+        def filter_pks(filter_class, value):
+            list_filter = filter_class(
+                None, {filter_class.parameter_name: value}, UrlNode, None)
+            qs = list_filter.queryset(
+                None, UrlNode.objects.filter(status=UrlNode.DRAFT))
+            with self.assertNumQueries(1):
+                return set(qs.values_list('pk', flat=True))
+
+        def assertStatus(unpublished, published, out_of_date, up_to_date):
+            page_pks = set([self.page.pk])
+            for expected, filter_class, value in (
+                (unpublished, PublishingStatusFilter, 'unpublished'),
+                (published, PublishingStatusFilter, 'published'),
+                (out_of_date, PublishingStatusFilter, 'out_of_date'),
+                (up_to_date, PublishingStatusFilter, 'up_to_date'),
+                (published, PublishingPublishedFilter, '1'),
+                (unpublished, PublishingPublishedFilter, '0'),
+            ):
+                self.assertEqual(
+                    page_pks if expected else set(),
+                    filter_pks(filter_class, value))
+
+        assertStatus(True, False, False, False)
+        self.page.publish()
+        assertStatus(False, True, False, True)
+        self.page.title += ' changed'
+        self.page.save()
+        assertStatus(False, True, True, False)
+
     def test_admin_monkey_patch_slug_duplicates(self):
         # Test our monkey patch works to fix duplicate `slug` field errors
         # caused by draft and published copies of the same item sharing a slug.
@@ -426,3 +618,134 @@ class TestPublishingForPageViews(AdminTest):
             self.page.get_absolute_url(),
             user=self.user)
         self.assertEqual(response.status_code, 200)
+
+
+@modify_settings(MIDDLEWARE_CLASSES={'append': [
+    'fluentcms_publishing.middleware.PublishingMiddleware',
+    'fluentcms_publishing.middleware.PublishedPageCacheMiddleware',
+]})
+class TestPublishedPageCache(AdminTest):
+
+    def setUp(self):
+        self.admin = G(
+            User,
+            is_staff=True,
+            is_active=True,
+            is_superuser=True,
+        )
+        self.layout = G(
+            PageLayout,
+            template_path='default.html',
+        )
+        self.page = Page.objects.create(
+            author=self.admin,
+            title='Hello, world!',
+            slug='hello-world',
+            layout=self.layout,
+        )
+
+    def test_published_page_cache(self):
+        purge_published_page_cache()
+        self.page.publish()
+        response = self.app.get('/hello-world/')
+        self.assertContains(response, 'Hello, world!')
+
+        # Published page is served from cache without queries
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.app.get('/hello-world/')
+        self.assertContains(response, 'Hello, world!')
+        self.assertEqual([], ctx.captured_queries)
+
+        # Draft content is never served from or stored in the cache
+        self.page.title = 'O hai, world!'
+        self.page.save()
+        response = self.app.get(
+            '/hello-world/?edit', user=self.admin).follow()
+        self.assertContains(response, 'O hai, world!')
+        self.app.reset()  # Log out
+        response = self.app.get('/hello-world/')
+        self.assertContains(response, 'Hello, world!')
+
+        # Publishing purges the cache
+        self.page.publish()
+        response = self.app.get('/hello-world/')
+        self.assertContains(response, 'O hai, world!')
+
+        # Unpublishing purges the cache
+        self.page.unpublish()
+        response = self.app.get('/hello-world/', expect_errors=True)
+        self.assertEqual(response.status_code, 404)
+
+    def test_published_page_cache_for_content_changes(self):
+        purge_published_page_cache()
+        other_page = Page.objects.create(
+            author=self.admin,
+            title='Other page',
+            slug='other-page',
+            layout=self.layout,
+        )
+        other_page.publish()
+        item = create_content_instance(
+            RawHtmlItem, self.page, placeholder_name='content',
+            html='<b>Original</b>')
+        self.page.publish()
+        response = self.app.get('/hello-world/')
+        self.assertContains(response, '<b>Original</b>')
+        self.app.get('/other-page/')
+        cache_version = get_published_page_cache_version()
+
+        # Publishing changes only shown by the page itself purges only the
+        # page's cached responses
+        item.html = '<b>Changed</b>'
+        item.save()
+        self.page.save()
+        self.page.publish()
+        self.assertEqual(cache_version, get_published_page_cache_version())
+        response = self.app.get('/hello-world/')
+        self.assertContains(response, '<b>Changed</b>')
+        with CaptureQueriesContext(connection) as ctx:
+            self.app.get('/other-page/')
+        self.assertEqual([], ctx.captured_queries)
+
+        # Publishing changes shown by other pages, like titles in menus,
+        # purges the whole cache
+        self.page.title = 'O hai, world!'
+        self.page.save()
+        self.page.publish()
+        self.assertNotEqual(
+            cache_version, get_published_page_cache_version())
+
+    def test_published_page_cache_respects_vary(self):
+        purge_published_page_cache()
+        self.page.publish()
+        published = self.page.get_published()
+        middleware = PublishedPageCacheMiddleware()
+        factory = RequestFactory()
+
+        def get_response(vary=None, **headers):
+            request = factory.get('/hello-world/', **headers)
+            request.user = AnonymousUser()
+            with override_publishing_middleware_active(True):
+                response = middleware.process_request(request)
+                if response is not None:
+                    return response
+                response = HttpResponse(headers.get('HTTP_ACCEPT', ''))
+                if vary:
+                    response['Vary'] = vary
+                request._current_fluent_page = published
+                return middleware.process_response(request, response)
+
+        # Responses are cached per value of the headers they vary on
+        self.assertEqual(
+            b'text/html',
+            get_response('Accept', HTTP_ACCEPT='text/html').content)
+        self.assertEqual(
+            b'text/plain',
+            get_response('Accept', HTTP_ACCEPT='text/plain').content)
+        self.assertEqual(
+            b'text/html', get_response(HTTP_ACCEPT='text/html').content)
+        # Responses that vary on everything are never cached
+        purge_published_page_cache()
+        get_response('*', HTTP_ACCEPT='text/html')
+        self.assertEqual(
+            b'text/plain', get_response('*', HTTP_ACCEPT='text/plain').content)
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils import timezone
+from django.utils.six import StringIO
+
+from django_dynamic_fixture import G
+
+from fluent_pages.models.db import UrlNode
+
+from ..jobs.models import PublishingJob
+from ..pagetypes.fluentpage.models import FluentPage as Page
+from .test_models import ModelA
+
+User = get_user_model()
+
+
+class TestPublishingJobs(TestCase):
+
+    def setUp(self):
+        self.model = ModelA.objects.create(title='O hai, world!')
+
+    def run_worker(self):
+        out = StringIO()
+        call_command('publishing_worker', once=True, stdout=out)
+        return out.getvalue()
+
+    def test_enqueue(self):
+        job = PublishingJob.objects.enqueue(self.model, 'publish')
+        self.assertEqual(PublishingJob.PENDING, job.status)
+        self.assertEqual(self.model, job.content_object)
+        # A pending job for the same object and action is reused
+        self.assertEqual(
+            job, PublishingJob.objects.enqueue(self.model, 'publish'))
+        self.assertNotEqual(
+            job, PublishingJob.objects.enqueue(self.model, 'unpublish'))
+        self.assertRaises(
+            ValueError, PublishingJob.objects.enqueue, self.model, 'delete')
+
+    def test_claim(self):
+        job = PublishingJob.objects.enqueue(self.model, 'publish')
+        claimed_job = PublishingJob.objects.claim()
+        self.assertEqual(job, claimed_job)
+        self.assertEqual(PublishingJob.RUNNING, claimed_job.status)
+        self.assertIsNotNone(claimed_job.started_at)
+        self.assertEqual(
+            PublishingJob.RUNNING, PublishingJob.objects.get(pk=job.pk).status)
+        # A running job cannot be claimed again
+        self.assertIsNone(PublishingJob.objects.claim())
+
+    @override_settings(FLUENTCMS_PUBLISHING_JOB_TIMEOUT=60)
+    def test_claim_requeues_stale_jobs(self):
+        job = PublishingJob.objects.enqueue(self.model, 'publish')
+        PublishingJob.objects.claim()
+        # A job running for less than the timeout is left alone...
+        PublishingJob.objects.filter(pk=job.pk).update(
+            started_at=timezone.now() - timedelta(seconds=30))
+        self.assertIsNone(PublishingJob.objects.claim())
+        # ...but a job left running for longer, such as by a worker that
+        # crashed, is claimed and run again
+        PublishingJob.objects.filter(pk=job.pk).update(
+            started_at=timezone.now() - timedelta(seconds=90))
+        self.assertIn('job %s: done' % job.pk, self.run_worker())
+        job = PublishingJob.objects.get(pk=job.pk)
+        self.assertGreater(
+            job.started_at, timezone.now() - timedelta(seconds=30))
+        self.assertIn('Re-queued', job.error)
+        self.assertIsNotNone(
+            ModelA.objects.get(pk=self.model.pk).publishing_linked)
+
+    def test_worker_runs_jobs(self):
+        job = PublishingJob.objects.enqueue(self.model, 'publish')
+        self.assertIn('job %s: done' % job.pk, self.run_worker())
+        job = PublishingJob.objects.get(pk=job.pk)
+        self.assertEqual(PublishingJob.DONE, job.status)
+        self.assertIsNotNone(job.finished_at)
+        self.model = ModelA.objects.get(pk=self.model.pk)
+        self.assertIsNotNone(self.model.publishing_linked)
+
+        job = PublishingJob.objects.enqueue(self.model, 'unpublish')
+        self.run_worker()
+        self.assertEqual(
+            PublishingJob.DONE, PublishingJob.objects.get(pk=job.pk).status)
+        self.model = ModelA.objects.get(pk=self.model.pk)
+        self.assertIsNone(self.model.publishing_linked)
+
+    def test_worker_records_failed_jobs(self):
+        self.model.publish()
+        published_job = PublishingJob.objects.enqueue(
+            self.model.publishing_linked, 'publish')
+        draft_job = PublishingJob.objects.enqueue(self.model, 'unpublish')
+        self.run_worker()
+        # Publishing a published copy fails...
+        published_job = PublishingJob.objects.get(pk=published_job.pk)
+        self.assertEqual(PublishingJob.FAILED, published_job.status)
+        self.assertIn('NotDraftException', published_job.error)
+        # ...without preventing later jobs from running
+        self.assertEqual(
+            PublishingJob.DONE,
+            PublishingJob.objects.get(pk=draft_job.pk).status)
+
+
+@override_settings(FLUENTCMS_PUBLISHING_USE_SCHEDULER=True)
+class TestPublishingScheduler(TestCase):
+
+    def setUp(self):
+        self.user = G(User)
+        self.page = Page.objects.create(
+            author=self.user,
+            title='O hai, world!',
+        )
+
+    def refresh(self, obj):
+        return type(obj).objects.get(pk=obj.pk)
+
+    def make_due(self, job):
+        """
+        Simulate time passing until the given job is due.
+        """
+        past = timezone.now() - timedelta(seconds=1)
+        PublishingJob.objects.filter(pk=job.pk).update(run_at=past)
+
+    def make_date_reached(self, obj, *date_fields):
+        """
+        Simulate time passing until the given date fields of the given item
+        have been reached.
+        """
+        past = timezone.now() - timedelta(seconds=1)
+        type(obj).objects.filter(pk=obj.pk).update(
+            **dict((f, past) for f in date_fields))
+
+    def test_publish_within_publication_dates(self):
+        self.page.publish()
+        self.assertIsNotNone(self.refresh(self.page).publishing_linked)
+        self.assertFalse(PublishingJob.objects.exists())
+
+    def test_scheduled_publish(self):
+        publication_date = timezone.now() + timedelta(days=1)
+        self.page.publication_date = publication_date
+        self.page.save()
+        self.page.publish()
+        # The approved published copy is kept, but is not visible until its
+        # publication date...
+        published = self.refresh(self.page).publishing_linked
+        self.assertIsNotNone(published)
+        self.assertEqual([], list(Page.objects.published()))
+        self.assertFalse(PublishingJob.objects.exists())
+        # ...when it becomes visible as approved
+        self.make_date_reached(published, 'publication_date')
+        self.assertEqual([published], list(Page.objects.published()))
+
+    def test_scheduled_publish_ignores_later_draft_changes(self):
+        self.page.publication_date = timezone.now() + timedelta(days=1)
+        self.page.save()
+        self.page.publish()
+        published = self.refresh(self.page).publishing_linked
+        # Unreviewed changes made to the draft after it was approved...
+        self.page.title = 'Unreviewed changes'
+        self.page.save()
+        # ...are not published when the publication date is reached
+        self.make_date_reached(published, 'publication_date')
+        self.assertFalse(PublishingJob.objects.exists())
+        call_command('publishing_worker', once=True, stdout=StringIO())
+        self.assertEqual(
+            [(published.pk, 'O hai, world!')],
+            [(p.pk, p.title) for p in Page.objects.published()])
+        self.assertEqual(published, self.refresh(self.page).publishing_linked)
+
+    def test_scheduled_unpublish(self):
+        publication_end_date = timezone.now() + timedelta(days=1)
+        self.page.publication_end_date = publication_end_date
+        self.page.save()
+        self.page.publish()
+        self.assertIsNotNone(self.refresh(self.page).publishing_linked)
+        job = PublishingJob.objects.get()
+        self.assertEqual(PublishingJob.UNPUBLISH, job.action)
+        self.assertEqual(publication_end_date, job.run_at)
+        self.make_due(job)
+        call_command('publishing_worker', once=True, stdout=StringIO())
+        self.assertIsNone(self.refresh(self.page).publishing_linked)
+
+    def test_expired_items_are_unpublished_immediately(self):
+        self.page.publication_end_date = timezone.now() - timedelta(days=1)
+        self.page.save()
+        self.page.publish()
+        self.assertIsNone(self.refresh(self.page).publishing_linked)
+        self.assertFalse(PublishingJob.objects.exists())
+
+    def test_unpublish_cancels_scheduled_transitions(self):
+        self.page.publication_end_date = timezone.now() + timedelta(days=1)
+        self.page.save()
+        self.page.publish()
+        self.assertTrue(PublishingJob.objects.exists())
+        self.page.unpublish()
+        self.assertFalse(PublishingJob.objects.exists())
+
+    def test_published_queries_check_end_dates(self):
+        self.page.publication_end_date = timezone.now() + timedelta(days=1)
+        self.page.save()
+        self.page.publish()
+        published = self.refresh(self.page).publishing_linked
+        path = published.get_absolute_url()
+        language_code = published.get_current_language()
+        self.assertEqual([published], list(Page.objects.published()))
+        self.assertEqual(
+            published,
+            UrlNode.objects.get_for_path(path, language_code))
+        # Items past their end date are not public even before the scheduled
+        # job to unpublish them has run
+        self.make_date_reached(published, 'publication_end_date')
+        self.assertTrue(PublishingJob.objects.exists())
+        self.assertEqual([], list(Page.objects.published()))
+        with self.assertRaises(UrlNode.DoesNotExist):
+            UrlNode.objects.get_for_path(path, language_code)
+        with self.assertRaises(UrlNode.DoesNotExist):
+            UrlNode.objects.best_match_for_path(path, language_code)
+
+    def test_schedule_command(self):
+        with override_settings(FLUENTCMS_PUBLISHING_USE_SCHEDULER=False):
+            self.page.publication_end_date = \
+                timezone.now() + timedelta(days=1)
+            self.page.save()
+            self.page.publish()
+        self.assertFalse(PublishingJob.objects.exists())
+        call_command('publishing_schedule', stdout=StringIO())
+        self.assertIsNotNone(self.refresh(self.page).publishing_linked)
+        self.assertEqual(
+            PublishingJob.UNPUBLISH, PublishingJob.objects.get().action)
@@ -1,18 +1,26 @@
 # -*- coding: utf-8 -*-
 
+from threading import Thread
+import time
+
 try:
     import urlparse
 except ImportError:
     import urllib.parse as urlparse
 
-from django.core.urlresolvers import reverse
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
+from django.core.urlresolvers import resolve, reverse
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser, Group
 from django.http import HttpResponseNotFound, QueryDict
 from django.test import TestCase, RequestFactory
+from django.utils.crypto import salted_hmac
+from django.utils.six import StringIO
 
-from mock import Mock
+from mock import Mock, patch
 from django_dynamic_fixture import G
+from model_settings.models import Text
 
 from ..managers import DraftItemBoobyTrap
 from ..middleware import (
@@ -21,8 +29,11 @@ from ..middleware import (
     get_current_user,
     is_draft_request_context,
     override_current_user,
+    override_draft_request_context,
 )
-from ..utils import get_draft_hmac, verify_draft_url, get_draft_url
+from ..utils import (
+    get_draft_hmac, get_draft_secret_key, rotate_draft_secret_key,
+    verify_draft_hmac, verify_draft_url, get_draft_url)
 
 User = get_user_model()
 
@@ -141,6 +152,45 @@ class TestPublishingMiddleware(TestCase):
         request = self._request('/', data={'edit': '1:abc'})
         self.assertFalse(PublishingMiddleware.is_draft(request))
 
+    def test_middleware_resolves_request_once(self):
+        mw = PublishingMiddleware()
+        request = self._request(data={'edit': ''}, user=self.staff)
+        with patch('fluentcms_publishing.middleware.resolve',
+                   wraps=resolve) as mock_resolve:
+            mw.process_request(request)
+            mw.process_response(request, HttpResponseNotFound())
+            self.assertEqual(1, mock_resolve.call_count)
+
+    def test_middleware_anonymous_requests_need_no_queries(self):
+        mw = PublishingMiddleware()
+        for data in (None, {'edit': '1:abc'}):
+            request = self._request(data=data)
+            with self.assertNumQueries(0):
+                mw.process_request(request)
+                mw.process_response(request, self.response)
+
+    def test_middleware_checks_content_reviewer_once_per_request(self):
+        request = self._request(user=self.reviewer)
+        with self.assertNumQueries(1):
+            self.assertTrue(
+                PublishingMiddleware.is_content_reviewer_user(request))
+            self.assertTrue(PublishingMiddleware.is_draft(request))
+        # Removing a user from the group takes effect on their next request
+        self.reviewer.groups.clear()
+        request = self._request(user=self.reviewer)
+        self.assertFalse(
+            PublishingMiddleware.is_content_reviewer_user(request))
+
+    def test_middleware_draft_only_views(self):
+        request = self._request()
+        self.assertFalse(PublishingMiddleware.is_draft_only_view(request))
+        self.assertFalse(PublishingMiddleware.is_draft(request))
+        with patch.object(PublishingMiddleware, '_draft_only_views',
+                          ['fluent_pages.views.dispatcher.CmsPageDispatcher']):
+            request = self._request()
+            self.assertTrue(PublishingMiddleware.is_draft_only_view(request))
+            self.assertTrue(PublishingMiddleware.is_draft(request))
+
     def test_middleware_active_status(self):
         mw = PublishingMiddleware()
 
@@ -178,6 +228,44 @@ class TestPublishingMiddleware(TestCase):
         self.assertIsNone(mw.get_current_user())
         self.assertIsNone(get_current_user())
 
+    def test_middleware_restores_state_from_before_request(self):
+        mw = PublishingMiddleware()
+        with override_current_user(self.staff):
+            request = self._request(user=self.reviewer)
+            mw.process_request(request)
+            self.assertEqual(self.reviewer, get_current_user())
+            self.assertTrue(is_draft_request_context())
+            mw.process_response(request, self.response)
+            self.assertEqual(self.staff, get_current_user())
+            self.assertFalse(is_draft_request_context())
+            self.assertFalse(is_publishing_middleware_active())
+        self.assertIsNone(get_current_user())
+
+    def test_override_restores_state_on_exception(self):
+        try:
+            with override_draft_request_context(True):
+                with override_current_user(self.staff):
+                    self.assertTrue(is_draft_request_context())
+                    raise ValueError()
+        except ValueError:
+            pass
+        self.assertFalse(is_draft_request_context())
+        self.assertIsNone(get_current_user())
+
+    def test_request_state_is_isolated_per_thread(self):
+        mw = PublishingMiddleware()
+        request = self._request(user=self.reviewer)
+        mw.process_request(request)
+        try:
+            results = []
+            thread = Thread(target=lambda: results.append(
+                (get_current_user(), is_draft_request_context())))
+            thread.start()
+            thread.join()
+            self.assertEqual([(None, False)], results)
+        finally:
+            mw.process_response(request, self.response)
+
     def test_middleware_edit_param_triggers_draft_request_context(self):
         mw = PublishingMiddleware()
 
@@ -266,6 +354,84 @@ class TestPublishingMiddleware(TestCase):
         except UnicodeEncodeError:
             self.fail("get_draft_url mishandles non-ASCII unicode text")
 
+    def test_draft_hmac_is_compatible_with_salted_hmac(self):
+        for salt, url in ((1, '/'), ('abcde', '/search/?q=Eug%C3%A8ne')):
+            self.assertEqual(
+                salted_hmac(salt, url, get_draft_secret_key()).hexdigest(),
+                get_draft_hmac(salt, url))
+
+    def test_middleware_verifies_draft_request_once(self):
+        mw = PublishingMiddleware()
+        request = self._request(
+            '/',
+            data={'edit': '%s:%s' % (1, get_draft_hmac(1, '/'))},
+            user=self.staff,
+        )
+        with patch('fluentcms_publishing.middleware.verify_draft_hmac',
+                   wraps=verify_draft_hmac) as verify:
+            self.assertIsNone(mw.process_request(request))
+            self.assertTrue(request.IS_DRAFT)
+            self.assertTrue(mw.is_verified_draft_request(request))
+            mw.process_response(request, self.response)
+            self.assertEqual(1, verify.call_count)
+
+    @patch('fluentcms_publishing.utils._draft_secret_key_state', None)
+    def test_draft_secret_key_is_cached(self):
+        key = get_draft_secret_key()
+        with self.assertNumQueries(0):
+            self.assertEqual(key, get_draft_secret_key())
+            draft_url = get_draft_url('/')
+            self.assertTrue(verify_draft_url(draft_url))
+        # Processes with an expired process-local copy read the key from the
+        # database again
+        with patch('fluentcms_publishing.utils._draft_secret_key_state',
+                   (key, 0)):
+            with self.assertNumQueries(1):
+                self.assertEqual(key, get_draft_secret_key())
+            with self.assertNumQueries(0):
+                self.assertEqual(key, get_draft_secret_key())
+
+    @patch('fluentcms_publishing.utils._draft_secret_key_state', None)
+    def test_rotate_draft_secret_key(self):
+        key = get_draft_secret_key()
+        draft_url = get_draft_url('/')
+        self.assertTrue(verify_draft_url(draft_url))
+        call_command('publishing_rotate_draft_secret_key', stdout=StringIO())
+        new_key = get_draft_secret_key()
+        self.assertNotEqual(key, new_key)
+        self.assertEqual(
+            new_key, Text.objects.get(name='DRAFT_SECRET_KEY').value)
+        # Existing draft URLs are no longer valid
+        self.assertFalse(verify_draft_url(draft_url))
+        # Other processes pick up the new key once their copy expires
+        with patch('fluentcms_publishing.utils._draft_secret_key_state',
+                   (key, 0)):
+            self.assertEqual(new_key, get_draft_secret_key())
+
+    @patch('fluentcms_publishing.utils._draft_secret_key_state', None)
+    def test_rotate_draft_secret_key_without_shared_cache(self):
+        key = get_draft_secret_key()
+        draft_url = get_draft_url('/')
+        # Simulate another process, with its own process-local cache, which
+        # has a copy of the key that is still valid...
+        other_process_state = (key, time.time() + 60)
+        other_process_cache = LocMemCache('other-process', {})
+        with patch('fluentcms_publishing.utils.cache', other_process_cache):
+            rotate_draft_secret_key()
+        with patch('fluentcms_publishing.utils._draft_secret_key_state',
+                   other_process_state):
+            self.assertTrue(verify_draft_url(draft_url))
+        # ...then expires, after which it uses the rotated key even though
+        # its cache was never updated
+        with patch('fluentcms_publishing.utils._draft_secret_key_state',
+                   (key, 0)):
+            self.assertFalse(verify_draft_url(draft_url))
+        # Keys edited directly in the database are picked up too
+        Text.objects.filter(name='DRAFT_SECRET_KEY').update(value=key)
+        with patch('fluentcms_publishing.utils._draft_secret_key_state',
+                   (key + 'x', 0)):
+            self.assertEqual(key, get_draft_secret_key())
+
     def test_middleware_redirect_staff_to_draft_view_on_404(self):
         mw = PublishingMiddleware()
 
@@ -2,30 +2,40 @@
 
 from datetime import timedelta
 
-from django.db import models
+from django.db import connection, models
+from django.db.models import Count
+from django.db.models.sql.compiler import SQLInsertCompiler
 from django.conf import settings
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.models import ContentType
-from django.test.utils import override_settings, modify_settings
+from django.core.management import call_command
+from django.test.utils import (
+    CaptureQueriesContext, override_settings, modify_settings)
 from django.test import TestCase, TransactionTestCase
 
-from mock import patch
+from mock import Mock, patch
+from six import StringIO
 from django_dynamic_fixture import G
 
-from fluent_pages.models.db import UrlNode
+from fluent_pages.models.db import UrlNode, UrlNode_Translation
 
-from fluent_contents.models import Placeholder
+from fluent_contents.models import ContentItem, Placeholder
 from fluent_contents.plugins.rawhtml.models import RawHtmlItem
 
-from ..models import PublishingModel, PublishableFluentContents
-from ..managers import DraftItemBoobyTrap
+from .. import signals as publishing_signals
+from ..models import (
+    PublishingModel, PublishableFluentContents, _bulk_copy_content_items,
+    make_slugs_unique, update_fluent_cached_urls)
+from ..managers import DraftItemBoobyTrap, _exchange_for_published
 from ..pagetypes.fluentpage.models import FluentPage as Page
 from ..middleware import (
     override_draft_request_context,
     override_publishing_middleware_active,
 )
-from ..utils import NotDraftException, PublishingException, create_content_instance
+from ..utils import (
+    NotDraftException, PublishingException, create_content_instance,
+    get_routing_index_entry, set_routing_index_entry)
 
 User = get_user_model()
 
@@ -44,6 +54,21 @@ class ModelB(PublishableFluentContents):
         app_label = 'fluentcms_publishing'
 
 
+class ModelC(PublishingModel):
+    title = models.CharField(max_length=255)
+
+    class Meta:
+        app_label = 'fluentcms_publishing'
+
+
+class ModelD(PublishingModel):
+    title = models.CharField(max_length=255)
+    models_c = models.ManyToManyField(ModelC, blank=True)
+
+    class Meta:
+        app_label = 'fluentcms_publishing'
+
+
 class TestPublishingModelAndQueryset(TestCase):
 
     def setUp(self):
@@ -265,6 +290,232 @@ class TestPublishingModelAndQueryset(TestCase):
             [p.pk for p in qs.filter(publishing_is_draft=False)],
             [p.pk for p in qs.exchange_for_published()])
 
+    def test_queryset_exchange_for_published_is_lazy(self):
+        self.model.publish()
+        # No queries are run until the exchanged queryset is evaluated...
+        with self.assertNumQueries(0):
+            qs = ModelA.objects.published(force_exchange=True)
+        # ...and then only a single query, also for `count` and `exists`
+        with self.assertNumQueries(1):
+            self.assertEqual(1, qs.count())
+        with self.assertNumQueries(1):
+            self.assertTrue(qs.exists())
+        with self.assertNumQueries(1):
+            self.assertEqual([self.model.publishing_linked], list(qs[:1]))
+        # Exchange also works for sliced querysets
+        self.assertEqual(
+            [self.model.publishing_linked],
+            list(ModelA.objects.order_by('pk')[:1].exchange_for_published()))
+
+    def test_queryset_exchange_for_published_keeps_draft_ordering(self):
+        model_b = ModelA.objects.create(title='B')
+        # Publish in reverse order so published PKs are ordered differently to
+        # the PKs of their drafts
+        model_b.publish()
+        self.model.publish()
+        self.assertTrue(
+            self.model.publishing_linked.pk > model_b.publishing_linked.pk)
+        # Exchanged items follow the ordering of their drafts...
+        qs = ModelA.objects.draft().order_by('pk')
+        self.assertEqual(
+            [self.model.publishing_linked, model_b.publishing_linked],
+            list(qs.exchange_for_published()))
+        qs = ModelA.objects.draft().order_by('-pk')
+        self.assertEqual(
+            [model_b.publishing_linked, self.model.publishing_linked],
+            list(qs.exchange_for_published()))
+        # ...including when drafts and published copies are both present
+        qs = ModelA.objects.order_by('title')
+        self.assertEqual(
+            [model_b.publishing_linked, self.model.publishing_linked],
+            list(qs.exchange_for_published()))
+        # Ordering SQL does not grow with the number of items exchanged
+        self.assertNotIn(
+            'CASE', str(qs.exchange_for_published().query))
+
+    def test_queryset_exchange_for_published_keeps_loading_options(self):
+        programs = [
+            ModelC.objects.create(title='Program %d' % i) for i in range(2)]
+        for i in range(3):
+            event = ModelD.objects.create(title='Event %d' % i)
+            event.models_c.add(*programs[:i])
+            event.publish()
+        qs = ModelD.objects.prefetch_related('models_c') \
+            .annotate(num_programs=Count('models_c')) \
+            .order_by('-num_programs')
+        with self.assertNumQueries(2):
+            published = list(qs.published(force_exchange=True))
+            self.assertEqual(
+                ['Event 2', 'Event 1', 'Event 0'],
+                [e.title for e in published])
+            self.assertEqual(
+                [2, 1, 0], [e.num_programs for e in published])
+            self.assertEqual(
+                [2, 1, 0], [len(e.models_c.all()) for e in published])
+        self.assertTrue(all(not e.publishing_is_draft for e in published))
+
+    def test_queryset_publish(self):
+        self.model.publish()
+        original_published_pk = self.model.publishing_linked.pk
+        self.model.title += ' changed'
+        self.model.save()
+        ModelA.objects.create(title='Z')
+        ModelA.objects.create(title='Y')
+        # Publish all drafts together
+        published = ModelA.objects.order_by('pk').publish()
+        self.assertEqual(
+            ['O hai, world! changed', 'Z', 'Y'],
+            [p.title for p in published])
+        self.assertEqual(
+            3, ModelA.objects.filter(publishing_is_draft=False).count())
+        # Previously published copy was replaced
+        self.assertFalse(
+            ModelA.objects.filter(pk=original_published_pk).exists())
+        # End state is the same as for publishing drafts one at a time
+        for draft in ModelA.objects.draft():
+            published_copy = draft.publishing_linked
+            self.assertEqual(draft.title, published_copy.title)
+            self.assertTrue(published_copy.is_published)
+            self.assertIsNone(published_copy.publishing_linked)
+            self.assertEqual(draft, published_copy.publishing_draft)
+            self.assertIsNotNone(draft.publishing_published_at)
+            self.assertEqual(
+                draft.publishing_published_at,
+                published_copy.publishing_published_at)
+            self.assertFalse(draft.is_dirty)
+
+    def test_queryset_publish_query_count_is_constant(self):
+        ModelA.objects.create(title='Z')
+
+        def count_publish_queries():
+            ModelA.objects.filter(publishing_is_draft=False).delete()
+            ModelA.objects.update(publishing_linked=None)
+            with CaptureQueriesContext(connection) as ctx:
+                ModelA.objects.all().publish()
+            return len(ctx.captured_queries)
+
+        num_queries = count_publish_queries()
+        for i in range(10):
+            ModelA.objects.create(title='Item %d' % i)
+        self.assertEqual(num_queries, count_publish_queries())
+
+    def test_queryset_publish_signals(self):
+        ModelA.objects.create(title='Z')
+        post_publish_handler = Mock()
+        post_publish_batch_handler = Mock()
+        publishing_signals.publishing_post_publish.connect(
+            post_publish_handler, sender=ModelA)
+        publishing_signals.publishing_post_publish_batch.connect(
+            post_publish_batch_handler, sender=ModelA)
+        try:
+            # Publishing signals are sent per draft by default...
+            ModelA.objects.all().publish()
+            self.assertEqual(2, post_publish_handler.call_count)
+            self.assertEqual(0, post_publish_batch_handler.call_count)
+            # ...or as a single batch signal
+            post_publish_handler.reset_mock()
+            ModelA.objects.all().publish(batch_signals=True)
+            self.assertEqual(0, post_publish_handler.call_count)
+            self.assertEqual(1, post_publish_batch_handler.call_count)
+            self.assertEqual(
+                set(ModelA.objects.draft()),
+                set(post_publish_batch_handler.call_args[1]['instances']))
+        finally:
+            publishing_signals.publishing_post_publish.disconnect(
+                post_publish_handler, sender=ModelA)
+            publishing_signals.publishing_post_publish_batch.disconnect(
+                post_publish_batch_handler, sender=ModelA)
+
+    def test_queryset_unpublish(self):
+        other = ModelA.objects.create(title='Z')
+        unpublished = ModelA.objects.create(title='Y')
+        self.model.publish()
+        other.publish()
+        published_pks = [self.model.publishing_linked.pk,
+                         other.publishing_linked.pk]
+        ModelA.objects.all().unpublish()
+        self.assertFalse(ModelA.objects.filter(pk__in=published_pks).exists())
+        self.assertEqual(
+            [], list(ModelA.objects.filter(publishing_is_draft=False)))
+        # End state is the same as for unpublishing drafts one at a time
+        for draft in ModelA.objects.filter(
+                pk__in=[self.model.pk, other.pk, unpublished.pk]):
+            self.assertIsNone(draft.publishing_linked)
+            self.assertIsNone(draft.publishing_published_at)
+            self.assertTrue(draft.is_dirty)
+
+    def test_queryset_unpublish_query_count_is_constant(self):
+        ModelA.objects.create(title='Z')
+
+        def count_unpublish_queries():
+            ModelA.objects.all().publish()
+            with CaptureQueriesContext(connection) as ctx:
+                ModelA.objects.all().unpublish()
+            return len(ctx.captured_queries)
+
+        num_queries = count_unpublish_queries()
+        for i in range(10):
+            ModelA.objects.create(title='Item %d' % i)
+        self.assertEqual(num_queries, count_unpublish_queries())
+
+    def test_queryset_unpublish_signals(self):
+        ModelA.objects.create(title='Z')
+        post_unpublish_handler = Mock()
+        post_unpublish_batch_handler = Mock()
+        publishing_signals.publishing_post_unpublish.connect(
+            post_unpublish_handler, sender=ModelA)
+        publishing_signals.publishing_post_unpublish_batch.connect(
+            post_unpublish_batch_handler, sender=ModelA)
+        try:
+            # Publishing signals are sent per draft by default...
+            ModelA.objects.all().publish()
+            ModelA.objects.all().unpublish()
+            self.assertEqual(2, post_unpublish_handler.call_count)
+            self.assertEqual(0, post_unpublish_batch_handler.call_count)
+            # ...or as a single batch signal
+            post_unpublish_handler.reset_mock()
+            ModelA.objects.all().publish()
+            ModelA.objects.all().unpublish(batch_signals=True)
+            self.assertEqual(0, post_unpublish_handler.call_count)
+            self.assertEqual(1, post_unpublish_batch_handler.call_count)
+            self.assertEqual(
+                set(ModelA.objects.draft()),
+                set(post_unpublish_batch_handler.call_args[1]['instances']))
+        finally:
+            publishing_signals.publishing_post_unpublish.disconnect(
+                post_unpublish_handler, sender=ModelA)
+            publishing_signals.publishing_post_unpublish_batch.disconnect(
+                post_unpublish_batch_handler, sender=ModelA)
+
+    def test_queryset_with_publishing_status(self):
+        def get_status(obj):
+            obj = ModelA.objects.with_publishing_status().get(pk=obj.pk)
+            with self.assertNumQueries(0):
+                return (
+                    obj.publishing_status_is_published,
+                    obj.publishing_status_is_out_of_date,
+                    obj.is_dirty,
+                )
+
+        # Unpublished draft is dirty
+        self.assertEqual((False, False, True), get_status(self.model))
+        # Published draft and published copy are not dirty
+        self.model.publish()
+        published = self.model.get_published()
+        self.assertEqual((True, False, False), get_status(self.model))
+        self.assertEqual((True, False, False), get_status(published))
+        # Modified draft is out-of-date and dirty
+        self.model.title += ' changed'
+        self.model.save()
+        self.assertEqual((True, True, True), get_status(self.model))
+        # Status flags agree with the non-annotated properties
+        for obj in ModelA.objects.with_publishing_status():
+            fresh_obj = ModelA.objects.get(pk=obj.pk)
+            self.assertEqual(fresh_obj.is_dirty, obj.is_dirty)
+            self.assertEqual(
+                fresh_obj.has_been_published,
+                obj.publishing_status_is_published)
+
     def test_draft_item_booby_trap(self):
         # Published item cannot be wrapped by DraftItemBoobyTrap
         self.model.publish()
@@ -384,6 +635,95 @@ class TestPublishingModelAndQueryset(TestCase):
             self.model.publishing_linked,
             self.model.publishing_linked.get_published())
 
+    def test_m2m_relationships_cloned_on_publish(self):
+        program = ModelC.objects.create(title='Program')
+        program.publish()
+        event = ModelD.objects.create(title='Event')
+        event.models_c.add(program)
+        # Publishing applies the relationship to published copies on both
+        # sides
+        event.publish()
+        program_published = program.get_published()
+        self.assertEqual(
+            [program], list(event.get_published().models_c.all()))
+        self.assertEqual(
+            set([program, program_published]), set(event.models_c.all()))
+        self.assertEqual([event], list(program_published.modeld_set.all()))
+        # Republishing doesn't duplicate relationships
+        event.publish()
+        self.assertEqual(2, event.models_c.count())
+        self.assertEqual(
+            [program], list(event.get_published().models_c.all()))
+
+        # Removing the draft relationship leaves published copies unaffected
+        event.models_c.remove(program)
+        self.assertEqual([program], list(
+            event.get_published().models_c.all()))
+        self.assertEqual([event], list(
+            program.get_published().modeld_set.all()))
+        # Publishing either side removes the obsolete relationships
+        program.publish()
+        self.assertEqual([], list(event.models_c.all()))
+        self.assertEqual([], list(event.get_published().models_c.all()))
+        self.assertEqual([], list(program.get_published().modeld_set.all()))
+
+    def test_m2m_relationships_clone_query_count_is_constant(self):
+        event = ModelD.objects.create(title='Event')
+
+        def count_publish_queries():
+            with CaptureQueriesContext(connection) as ctx:
+                event.publish()
+            return len(ctx.captured_queries)
+
+        for i in range(2):
+            program = ModelC.objects.create(title='Program %d' % i)
+            program.publish()
+            event.models_c.add(program)
+        # Republish, to compare publishes that replace a published copy
+        event.publish()
+        num_queries = count_publish_queries()
+        for i in range(5):
+            program = ModelC.objects.create(title='Item %d' % i)
+            program.publish()
+            event.models_c.add(program)
+        self.assertEqual(num_queries, count_publish_queries())
+        self.assertEqual(7, event.get_published().models_c.count())
+
+    def test_queryset_publish_m2m_relationships_query_count_is_constant(self):
+        programs = [
+            ModelC.objects.create(title='Program %d' % i) for i in range(2)]
+        for program in programs:
+            program.publish()
+
+        def add_events(count):
+            for i in range(count):
+                event = ModelD.objects.create(title='Event %d' % i)
+                event.models_c.add(*programs)
+
+        def count_publish_queries():
+            with CaptureQueriesContext(connection) as ctx:
+                ModelD.objects.all().publish()
+            return len(ctx.captured_queries)
+
+        add_events(1)
+        ModelD.objects.all().publish()
+        num_queries = count_publish_queries()
+        add_events(5)
+        ModelD.objects.all().publish()
+        self.assertEqual(num_queries, count_publish_queries())
+        # Relationships are cloned as for publishing drafts one at a time
+        for event in ModelD.objects.draft():
+            self.assertEqual(
+                set(programs),
+                set(event.get_published().models_c.all()))
+            self.assertEqual(
+                set(programs + [p.get_published() for p in programs]),
+                set(event.models_c.all()))
+        for program in programs:
+            self.assertEqual(
+                set(ModelD.objects.draft()),
+                set(program.get_published().modeld_set.all()))
+
 
 class TestPublishableFluentContentsPage(TestCase):
     """ Test publishing features with a Fluent Contents Page """
@@ -494,6 +834,291 @@ class TestPublishableFluentContentsPage(TestCase):
              for i in published_page.contentitem_set.all()],
             ['lorem-ipsum-updated', 'lorem-ipsum-updated'])
 
+    def test_queryset_with_publishing_status_for_fluent_contents(self):
+        item = create_content_instance(
+            RawHtmlItem, self.page, placeholder_name='lorem-ipsum',
+            html='<b>Original</b>')
+
+        def get_statuses():
+            with self.assertNumQueries(1):
+                return dict(
+                    (p.pk, (p.publishing_status_is_out_of_date, p.is_dirty))
+                    for p in Page.objects.with_publishing_status())
+
+        self.page.publish()
+        published = self.page.get_published()
+        self.assertEqual(
+            {self.page.pk: (False, False), published.pk: (False, False)},
+            get_statuses())
+        # Content item edits are saved with their page, as by the admin,
+        # which makes the draft out-of-date and dirty
+        item.html = '<b>Changed</b>'
+        item.save()
+        self.page.save()
+        self.assertEqual(
+            {self.page.pk: (True, True), published.pk: (False, False)},
+            get_statuses())
+        self.assertTrue(Page.objects.get(pk=self.page.pk).is_dirty)
+
+    def test_contentitems_cloned_in_bulk_on_publish(self):
+        Placeholder.objects.create_for_object(self.page, slot='sidebar')
+
+        def add_items(count):
+            for i in range(count):
+                create_content_instance(
+                    RawHtmlItem, self.page,
+                    placeholder_name=('lorem-ipsum', 'sidebar')[i % 2],
+                    html='<b>%d</b>' % i, sort_order=i)
+
+        def count_publish_queries():
+            with CaptureQueriesContext(connection) as ctx:
+                self.page.publish()
+            return len(ctx.captured_queries)
+
+        def get_items(page):
+            return [
+                (i.placeholder.slot, i.sort_order, i.language_code, i.html)
+                for i in page.contentitem_set.order_by(
+                    'placeholder__slot', 'sort_order')]
+
+        add_items(3)
+        self.page.publish()
+        num_queries = count_publish_queries()
+        add_items(10)
+        self.assertEqual(num_queries, count_publish_queries())
+        published_page = self.page.get_published()
+        self.assertEqual(13, len(get_items(published_page)))
+        self.assertEqual(get_items(self.page), get_items(published_page))
+        for item in published_page.contentitem_set.all():
+            self.assertEqual(published_page.pk, item.parent_id)
+            self.assertEqual(published_page, item.placeholder.parent)
+
+        # Items are copied in chunks
+        other_page = Page.objects.create(author=self.user, title='Other')
+        placeholder_map = dict(
+            (placeholder.pk, Placeholder.objects.create_for_object(
+                other_page, slot=placeholder.slot))
+            for placeholder in Placeholder.objects.parent(self.page))
+        _bulk_copy_content_items(placeholder_map, chunk_size=4)
+        self.assertEqual(get_items(self.page), get_items(other_page))
+
+    def test_queryset_exchange_for_published_keeps_select_related(self):
+        child = Page.objects.create(
+            author=self.user, title='Child', parent=self.page)
+        self.page.publish()
+        child.publish()
+        qs = Page.objects.order_by('pk').select_related('author') \
+            .annotate(num_translations=Count('translations')) \
+            .published(force_exchange=True)
+        with self.assertNumQueries(1):
+            published = list(qs)
+            self.assertEqual(
+                [self.page.publishing_linked, child.publishing_linked],
+                published)
+            self.assertEqual(
+                [self.user, self.user], [p.author for p in published])
+            self.assertEqual([1, 1], [p.num_translations for p in published])
+
+    def test_queryset_publish(self):
+        child = Page.objects.create(
+            author=self.user, title='Child', parent=self.page)
+        other = Page.objects.create(author=self.user, title='Other')
+        for page in (self.page, child, other):
+            create_content_instance(
+                RawHtmlItem, page, placeholder_name='lorem-ipsum',
+                html='<b>%s</b>' % page.title)
+        self.page.publish()
+        original_published_pk = self.page.publishing_linked.pk
+        # Publish all drafts together
+        published = Page.objects.order_by('pk').publish()
+        self.assertEqual(
+            ['O hai, world!', 'Child', 'Other'],
+            [p.title for p in published])
+        self.assertEqual(3, Page.objects.published().count())
+        # Previously published copy was replaced
+        self.assertFalse(
+            UrlNode.objects.filter(pk=original_published_pk).exists())
+        # End state is the same as for publishing drafts one at a time, with
+        # published copies mirroring the tree structure of their drafts
+        for draft in Page.objects.draft():
+            published_copy = draft.publishing_linked
+            self.assertEqual(UrlNode.DRAFT, draft.status)
+            self.assertEqual(UrlNode.PUBLISHED, published_copy.status)
+            self.assertEqual(draft, published_copy.publishing_draft)
+            self.assertFalse(draft.is_dirty)
+            for attname in ('parent_id', 'tree_id', 'lft', 'rght', 'level'):
+                self.assertEqual(
+                    getattr(draft, attname),
+                    getattr(published_copy, attname))
+            self.assertEqual(
+                list(draft.translations.values_list(
+                    'language_code', 'title', 'slug', '_cached_url')),
+                list(published_copy.translations.values_list(
+                    'language_code', 'title', 'slug', '_cached_url')))
+            self.assertEqual(
+                ['<b>%s</b>' % draft.title],
+                [i.html for i in published_copy.contentitem_set.all()])
+        child = Page.objects.get(pk=child.pk)
+        with override_draft_request_context(False):
+            self.assertEqual(
+                child.get_published().pk,
+                UrlNode.objects.get_for_path(
+                    child.get_absolute_url(),
+                    child.get_current_language()).pk)
+
+    @override_settings(FLUENTCMS_PUBLISHING_INCREMENTAL_PUBLISH=False)
+    def test_edited_content_item_republished_by_replacing(self):
+        def get_published_items():
+            published = Page.objects.get(pk=self.page.pk).get_published()
+            return [
+                (i.placeholder.slot, i.sort_order, i.html)
+                for i in published.contentitem_set.order_by('sort_order')]
+
+        for i in range(2):
+            create_content_instance(
+                RawHtmlItem, self.page, placeholder_name='lorem-ipsum',
+                html='<b>%d</b>' % i, sort_order=i)
+        self.page.publish()
+        for republish in (
+                lambda: Page.objects.get(pk=self.page.pk).publish(),
+                lambda: Page.objects.filter(pk=self.page.pk).publish()):
+            previous_published = self.page.get_published()
+            item = self.page.contentitem_set.get(sort_order=1)
+            item.html = '<b>edited %s</b>' % previous_published.pk
+            item.save()
+            republish()
+            # The published copy and its items are replaced
+            self.assertFalse(
+                Page.objects.filter(pk=previous_published.pk).exists())
+            self.assertEqual(
+                [('lorem-ipsum', 0, '<b>0</b>'),
+                 ('lorem-ipsum', 1, item.html)],
+                get_published_items())
+            self.assertEqual(4, RawHtmlItem.objects.count())
+            self.assertEqual(4, ContentItem.objects.count())
+
+    def test_queryset_publish_matches_publish(self):
+        def get_published_state(draft):
+            # Everything about the published copy of a draft that does not
+            # depend on its PK or on when it was published
+            published_copy = Page.objects.get(pk=draft.pk).publishing_linked
+            fields = dict(
+                (f.attname, getattr(published_copy, f.attname))
+                for f in published_copy._meta.concrete_fields
+                if not (f.primary_key
+                        or getattr(f, 'auto_now', False)
+                        or getattr(f, 'auto_now_add', False)
+                        or f.attname == 'publishing_modified_at'))
+            translations = list(published_copy.translations.values_list(
+                'language_code', 'title', 'slug', '_cached_url'))
+            placeholders = sorted(
+                Placeholder.objects.parent(published_copy).values_list(
+                    'slot', 'role', 'title'))
+            items = [
+                (type(i), i.placeholder.slot, i.sort_order, i.language_code,
+                 i.html)
+                for i in published_copy.contentitem_set.all()]
+            return fields, translations, placeholders, items
+
+        child = Page.objects.create(
+            author=self.user, title='Child', parent=self.page)
+        other = Page.objects.create(author=self.user, title='Other')
+        drafts = (self.page, child, other)
+        for page in drafts:
+            for i in range(2):
+                create_content_instance(
+                    RawHtmlItem, page, placeholder_name='lorem-ipsum',
+                    html='<b>%s %d</b>' % (page.title, i))
+        self.page.publish()
+
+        Page.objects.order_by('pk').publish()
+        bulk_states = [get_published_state(draft) for draft in drafts]
+        for draft in drafts:
+            Page.objects.get(pk=draft.pk).publish()
+        self.assertEqual(
+            bulk_states, [get_published_state(draft) for draft in drafts])
+
+        # Placeholders are patched for republished drafts, as by `publish`
+        draft = Page.objects.get(pk=self.page.pk)
+        previous_published_copy = draft.publishing_linked
+        with patch.object(
+                Page, 'patch_placeholders', autospec=True,
+                side_effect=Page.patch_placeholders) as patch_placeholders:
+            Page.objects.filter(pk=draft.pk).publish()
+        patch_placeholders.assert_called_once_with(
+            draft, previous_published_copy)
+
+    def test_queryset_publish_with_concurrent_inserts(self):
+        other = Page.objects.create(author=self.user, title='Other')
+        execute_sql = SQLInsertCompiler.execute_sql
+        concurrent_pks = []
+        in_concurrent_insert = []
+
+        def concurrent_execute_sql(compiler, *args, **kwargs):
+            # Another process inserts a node before each insert of nodes
+            query = compiler.query
+            if query.model is UrlNode and not in_concurrent_insert:
+                in_concurrent_insert.append(True)
+                try:
+                    concurrent_pks.append(models.QuerySet(UrlNode)._insert(
+                        [UrlNode(**dict(
+                            (f.attname, getattr(query.objs[0], f.attname))
+                            for f in query.fields))],
+                        fields=query.fields, return_id=True))
+                finally:
+                    in_concurrent_insert.pop()
+            return execute_sql(compiler, *args, **kwargs)
+
+        with patch.object(
+                SQLInsertCompiler, 'execute_sql', concurrent_execute_sql):
+            published = Page.objects.filter(
+                pk__in=[self.page.pk, other.pk]).order_by('pk').publish()
+        self.assertTrue(concurrent_pks)
+        published_pks = [obj.pk for obj in published]
+        self.assertFalse(set(concurrent_pks) & set(published_pks))
+        self.assertEqual(
+            [self.page.title, other.title],
+            [Page.objects.get(pk=pk).title for pk in published_pks])
+        for draft, published_obj in zip((self.page, other), published):
+            draft = Page.objects.get(pk=draft.pk)
+            self.assertEqual(published_obj.pk, draft.publishing_linked_id)
+        models.QuerySet(UrlNode).filter(pk__in=concurrent_pks).delete()
+
+    def test_queryset_publish_query_count_is_constant(self):
+        def add_pages(count):
+            for i in range(count):
+                page = Page.objects.create(
+                    author=self.user, title='Page %d' % i, parent=self.page)
+                create_content_instance(
+                    RawHtmlItem, page, placeholder_name='lorem-ipsum',
+                    html='<b>%d</b>' % i)
+
+        def count_publish_queries():
+            # Publishing signals sent for each draft update its published
+            # URLs, so batch them.
+            with CaptureQueriesContext(connection) as ctx:
+                Page.objects.all().publish(batch_signals=True)
+            return len(ctx.captured_queries)
+
+        add_pages(1)
+        Page.objects.all().publish()
+        num_queries = count_publish_queries()
+        add_pages(5)
+        Page.objects.all().publish()
+        if not connection.features.can_return_ids_from_bulk_insert:
+            # `UrlNode` rows are inserted one at a time to get their PKs
+            num_queries += 5
+        self.assertEqual(num_queries, count_publish_queries())
+        self.assertEqual(7, Page.objects.published().count())
+        # Published copies are added to the routing index without the
+        # publishing signals for each draft
+        for draft in Page.objects.draft():
+            self.assertEqual(
+                draft.get_published().pk,
+                get_routing_index_entry(
+                    settings.SITE_ID, draft.get_current_language(),
+                    draft.get_absolute_url(), False))
+
     def test_model_is_within_publication_dates(self):
         # Empty publication start/end dates
         self.assertTrue(self.page.is_within_publication_dates())
@@ -572,6 +1197,321 @@ class TestPublishableFluentContentsPage(TestCase):
             set([self.page.publishing_linked]),
             set(Page.objects.published(force_exchange=True)))
 
+    def test_queryset_exchange_for_published_with_urlnode(self):
+        # Generic `UrlNode` querysets know nothing of publishing fields
+        self.assertEqual(
+            [], list(_exchange_for_published(UrlNode.objects.all())))
+        self.page.publish()
+        self.assertEqual(
+            [self.page.publishing_linked.pk],
+            [i.pk for i in _exchange_for_published(
+                UrlNode.objects.filter(pk=self.page.pk))])
+        self.assertEqual(
+            [self.page.publishing_linked.pk],
+            [i.pk for i in _exchange_for_published(UrlNode.objects.all())])
+
+    def test_get_for_path_uses_routing_index(self):
+        path = self.page.get_absolute_url()
+        language_code = self.page.get_current_language()
+        self.page.publish()
+        published = self.page.get_published()
+        # Publishing adds the published copy to the routing index
+        self.assertEqual(
+            published.pk,
+            get_routing_index_entry(
+                settings.SITE_ID, language_code, path, False))
+        with override_draft_request_context(False):
+            self.assertEqual(
+                published.pk,
+                UrlNode.objects.get_for_path(path, language_code).pk)
+        with override_draft_request_context(True):
+            self.assertEqual(
+                self.page.pk,
+                UrlNode.objects.get_for_path(path, language_code).pk)
+            self.assertEqual(
+                self.page.pk,
+                get_routing_index_entry(
+                    settings.SITE_ID, language_code, path, True))
+
+        # Stale entries are ignored, and replaced
+        set_routing_index_entry(
+            settings.SITE_ID, language_code, path, False, self.page.pk)
+        with override_draft_request_context(False):
+            self.assertEqual(
+                published.pk,
+                UrlNode.objects.get_for_path(path, language_code).pk)
+        self.assertEqual(
+            published.pk,
+            get_routing_index_entry(
+                settings.SITE_ID, language_code, path, False))
+
+        # Unpublishing removes the published copy from the routing index
+        self.page.unpublish()
+        self.assertIsNone(get_routing_index_entry(
+            settings.SITE_ID, language_code, path, False))
+        with override_draft_request_context(False):
+            self.assertRaises(
+                UrlNode.DoesNotExist,
+                UrlNode.objects.get_for_path, path, language_code)
+
+    def test_batched_unpublish_removes_routing_index_entries(self):
+        path = self.page.get_absolute_url()
+        language_code = self.page.get_current_language()
+        self.page.publish()
+        self.assertEqual(
+            self.page.get_published().pk,
+            get_routing_index_entry(
+                settings.SITE_ID, language_code, path, False))
+        Page.objects.filter(pk=self.page.pk).unpublish(batch_signals=True)
+        self.assertIsNone(get_routing_index_entry(
+            settings.SITE_ID, language_code, path, False))
+        with override_draft_request_context(False):
+            self.assertRaises(
+                UrlNode.DoesNotExist,
+                UrlNode.objects.get_for_path, path, language_code)
+
+    def test_best_match_for_path_by_published_status(self):
+        child = Page.objects.create(
+            author=self.user,
+            title='Child',
+            parent=self.page,
+        )
+        path = child.get_absolute_url() + 'extra/'
+        language_code = child.get_current_language()
+
+        def best_match(is_draft_context):
+            with override_draft_request_context(is_draft_context):
+                try:
+                    return UrlNode.objects.best_match_for_path(
+                        path, language_code)
+                except UrlNode.DoesNotExist:
+                    return None
+
+        # Only drafts match in a draft context, nothing matches otherwise
+        self.assertEqual(child.pk, best_match(True).pk)
+        self.assertIsNone(best_match(False))
+        # The deepest published copy is the best match once published
+        self.page.publish()
+        self.assertEqual(self.page.get_published().pk, best_match(False).pk)
+        child.publish()
+        self.assertEqual(child.get_published().pk, best_match(False).pk)
+        self.assertEqual(child.pk, best_match(True).pk)
+        # Only the best match is instantiated
+        with override_draft_request_context(False):
+            with self.assertNumQueries(2):  # Base node and real instance
+                UrlNode.objects.best_match_for_path(path, language_code)
+        # Published copies outside their publication dates don't match
+        child.get_published().__class__.objects \
+            .filter(pk=child.get_published().pk) \
+            .update(publication_end_date=timezone.now())
+        self.assertEqual(self.page.get_published().pk, best_match(False).pk)
+
+    def test_make_slug_unique(self):
+        for slug in ('news', 'news-2', 'news-3', 'newsletter'):
+            Page.objects.create(author=self.user, title=slug, slug=slug)
+        page = Page.objects.create(
+            author=self.user, title='Other', slug='other')
+        translation = page.get_translation(page.get_current_language())
+        translation.slug = 'news'
+        with self.assertNumQueries(1):
+            page._make_slug_unique(translation)
+        self.assertEqual('news-4', translation.slug)
+        # Published copies of the page itself are ignored
+        page.publish()
+        page = Page.objects.get(pk=page.pk)
+        translation = page.get_translation(page.get_current_language())
+        translation.slug = 'other'
+        page._make_slug_unique(translation)
+        self.assertEqual('other', translation.slug)
+
+    def test_make_slugs_unique_in_bulk(self):
+        for slug in ('news', 'news-2'):
+            Page.objects.create(author=self.user, title=slug, slug=slug)
+        items = []
+        for i in range(3):
+            page = Page.objects.create(
+                author=self.user, title='Import', slug='import-%d' % i)
+            translation = page.get_translation(page.get_current_language())
+            translation.slug = 'news'
+            items.append((page, translation))
+        with self.assertNumQueries(1):
+            make_slugs_unique(items)
+        self.assertEqual(
+            ['news-3', 'news-4', 'news-5'],
+            [translation.slug for page, translation in items])
+
+    def test_get_ancestors_and_descendants_by_publishing_status(self):
+        child = Page.objects.create(
+            author=self.user, title='Child', parent=self.page)
+        grandchild = Page.objects.create(
+            author=self.user, title='Grandchild', parent=child)
+        for page in (self.page, child, grandchild):
+            page.publish()
+        self.page, child, grandchild = [
+            Page.objects.get(pk=p.pk) for p in (self.page, child, grandchild)]
+
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                [self.page, child], list(grandchild.get_ancestors()))
+        self.assertEqual(
+            [child, self.page],
+            list(grandchild.get_ancestors(ascending=True)))
+        self.assertEqual(
+            [child, grandchild], list(self.page.get_descendants()))
+        self.assertEqual(
+            [self.page, child, grandchild],
+            list(self.page.get_descendants(include_self=True)))
+
+        published_pks = [
+            p.get_published().pk for p in (self.page, child, grandchild)]
+        published_grandchild = grandchild.get_published()
+        self.assertEqual(
+            published_pks[:2],
+            [p.pk for p in published_grandchild.get_ancestors()])
+        self.assertEqual(
+            published_pks[1:],
+            [p.pk for p in
+             self.page.get_published().get_descendants()])
+
+        # Ancestors are cached on the item
+        self.assertEqual(
+            [self.page, child], grandchild.get_cached_ancestors())
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                [self.page, child], grandchild.get_cached_ancestors())
+            self.assertEqual(
+                [self.page, child, grandchild], grandchild.breadcrumb)
+
+    def test_update_fluent_cached_urls_for_subtree(self):
+        child = Page.objects.create(
+            author=self.user, title='Child', slug='child', parent=self.page)
+        grandchild = Page.objects.create(
+            author=self.user, title='Grandchild', slug='grandchild',
+            parent=child)
+        for page in (self.page, child, grandchild):
+            page.publish()
+
+        # Change the root's URL without updating its descendants
+        UrlNode_Translation.objects.filter(master=self.page.pk) \
+            .update(slug='renamed', _cached_url='/renamed/')
+        change_report = update_fluent_cached_urls(self.page, dry_run=True)
+        self.assertEqual(
+            ['/renamed/', '/renamed/child/', '/renamed/child/grandchild/'],
+            [new_url for translation, field, old_url, new_url
+             in change_report])
+        # Published copies of children are under the draft parent's URL
+        change_report = update_fluent_cached_urls(
+            self.page.get_published(), dry_run=True)
+        self.assertEqual(
+            ['/o-hai-world/', '/renamed/child/',
+             '/o-hai-world/child/grandchild/'],
+            [new_url for translation, field, old_url, new_url
+             in change_report])
+        # Nothing is changed in a dry run
+        self.assertEqual(
+            '/o-hai-world/child/grandchild/',
+            Page.objects.get(pk=grandchild.pk).get_absolute_url())
+
+        def count_queries(slug):
+            UrlNode_Translation.objects.filter(master=self.page.pk) \
+                .update(slug=slug, _cached_url='/%s/' % slug)
+            with CaptureQueriesContext(connection) as ctx:
+                update_fluent_cached_urls(self.page)
+            return len(ctx.captured_queries)
+
+        num_queries = count_queries('renamed')
+        self.assertEqual(
+            '/renamed/child/grandchild/',
+            Page.objects.get(pk=grandchild.pk).get_absolute_url())
+        # Query count is independent of the number of descendants
+        for i in range(5):
+            Page.objects.create(
+                author=self.user, title='Child %d' % i, parent=child)
+        self.assertEqual(num_queries, count_queries('moved'))
+        self.assertEqual(
+            '/moved/child/grandchild/',
+            Page.objects.get(pk=grandchild.pk).get_absolute_url())
+
+    def test_sync_tree_command(self):
+        child = Page.objects.create(
+            author=self.user, title='Child', slug='child', parent=self.page)
+        other = Page.objects.create(
+            author=self.user, title='Other', slug='other')
+        for page in (self.page, child, other):
+            page.publish()
+        # Move the draft child without syncing its published copy
+        UrlNode.objects.filter(pk=child.pk).update(parent=other.pk)
+        UrlNode.objects.rebuild()
+
+        out = StringIO()
+        call_command('publishing_sync_tree', dry_run=True, stdout=out)
+        self.assertIn('Page #%d parent: %s -> %s' % (
+            child.pk, self.page.pk, other.pk), out.getvalue())
+        published_child = Page.objects.get(pk=child.publishing_linked_id)
+        self.assertEqual(self.page.pk, published_child.parent_id)
+
+        call_command('publishing_sync_tree', stdout=StringIO())
+        child = Page.objects.get(pk=child.pk)
+        published_child = Page.objects.get(pk=child.publishing_linked_id)
+        for field in ('parent_id', 'tree_id', 'lft', 'rght', 'level'):
+            self.assertEqual(
+                getattr(child, field), getattr(published_child, field))
+        self.assertEqual('/other/child/', published_child.get_absolute_url())
+        # Nothing left to sync
+        out = StringIO()
+        call_command('publishing_sync_tree', dry_run=True, stdout=out)
+        self.assertEqual('Found 0 changes\n', out.getvalue())
+
+    def test_parler_translations_cloned_on_publish(self):
+        for language_code in ('nl', 'de'):
+            self.page.set_current_language(language_code)
+            self.page.title = 'Title %s' % language_code
+            self.page.slug = 'slug-%s' % language_code
+            self.page.save()
+        translation_fields = (
+            'language_code', 'title', 'slug', 'override_url', '_cached_url')
+        with CaptureQueriesContext(connection) as ctx:
+            self.page.publish()
+        inserts = [
+            q for q in ctx.captured_queries
+            if q['sql'].startswith('INSERT')
+            and UrlNode_Translation._meta.db_table in q['sql']]
+        self.assertEqual(1, len(inserts))
+
+        published = self.page.get_published()
+        self.assertEqual(
+            list(self.page.translations.order_by('language_code')
+                 .values_list(*translation_fields)),
+            list(published.translations.order_by('language_code')
+                 .values_list(*translation_fields)))
+        # Translations of the published copy are available from parler's
+        # cache, or refetched, without stale entries
+        published = Page.objects.get(pk=published.pk)
+        published.set_current_language('nl')
+        self.assertEqual('Title nl', published.title)
+        published.set_current_language('de')
+        self.assertEqual('slug-de', published.slug)
+
+    def test_queryset_unpublish_with_urlnode(self):
+        child = Page.objects.create(
+            author=self.user,
+            title='Child',
+            parent=self.page,
+        )
+        self.page.publish()
+        child.publish()
+        published_pks = [self.page.publishing_linked.pk,
+                         child.publishing_linked.pk]
+        Page.objects.all().unpublish()
+        self.assertFalse(UrlNode.objects.filter(pk__in=published_pks).exists())
+        self.assertEqual([], list(Page.objects.published()))
+        for draft in Page.objects.filter(pk__in=[self.page.pk, child.pk]):
+            self.assertIsNone(draft.publishing_linked)
+            self.assertIsNone(draft.publishing_published_at)
+        # Draft tree structure is unaffected
+        self.assertEqual(
+            [child], list(Page.objects.get(pk=self.page.pk).get_children()))
+
     def test_fluent_page_model_get_draft(self):
         self.page.publish()
         self.assertEqual(
@@ -587,6 +1527,155 @@ class TestPublishableFluentContentsPage(TestCase):
             self.page.publishing_linked.publishing_draft)
 
 
+@override_settings(FLUENTCMS_PUBLISHING_INCREMENTAL_PUBLISH=True)
+class TestIncrementalPublish(TestCase):
+    """ Test republishing by updating published copies in place """
+
+    def setUp(self):
+        self.user = G(User)
+        self.page = Page.objects.create(
+            author=self.user,
+            title='O hai, world!',
+            slug='o-hai-world',
+        )
+        Placeholder.objects.create_for_object(self.page, slot='main')
+        Placeholder.objects.create_for_object(self.page, slot='sidebar')
+        for i, slot in enumerate(('main', 'main', 'sidebar')):
+            create_content_instance(
+                RawHtmlItem, self.page, placeholder_name=slot,
+                html='<b>%d</b>' % i, sort_order=i)
+        self.page.publish()
+        self.published = self.page.get_published()
+
+    def get_items(self, page):
+        return [
+            (i.placeholder.slot, i.sort_order, i.html)
+            for i in page.contentitem_set.order_by(
+                'placeholder__slot', 'sort_order')]
+
+    def test_model_republished_in_place(self):
+        model = ModelA.objects.create(title='Before')
+        model.publish()
+        published_pk = model.get_published().pk
+        model.title = 'After'
+        model.save()
+        self.assertTrue(model.is_dirty)
+        model.publish()
+        model = ModelA.objects.get(pk=model.pk)
+        self.assertEqual(published_pk, model.get_published().pk)
+        self.assertEqual('After', model.get_published().title)
+        self.assertFalse(model.is_dirty)
+
+    def test_page_republished_in_place(self):
+        item_pks = list(
+            self.published.contentitem_set.values_list('pk', flat=True))
+        language_code = self.page.get_current_language()
+        self.page.title = 'Renamed'
+        self.page.slug = 'renamed'
+        self.page.save()
+        self.page.set_current_language('nl')
+        self.page.title = 'Hallo'
+        self.page.slug = 'hallo'
+        self.page.save()
+        item = self.page.contentitem_set.get(sort_order=0)
+        item.html = '<b>updated</b>'
+        item.save()
+
+        self.page.publish()
+        published = Page.objects.get(pk=self.published.pk)
+        self.assertEqual(published, self.page.get_published())
+        self.assertEqual(
+            sorted([language_code, 'nl']),
+            sorted(published.get_available_languages()))
+        published.set_current_language(language_code)
+        self.assertEqual('Renamed', published.title)
+        self.assertEqual('/renamed/', published.get_absolute_url())
+        published.set_current_language('nl')
+        self.assertEqual('Hallo', published.title)
+        # Content items are updated, and keep their PKs
+        self.assertEqual(self.get_items(self.page), self.get_items(published))
+        self.assertEqual(
+            sorted(item_pks),
+            sorted(published.contentitem_set.values_list('pk', flat=True)))
+        self.assertFalse(
+            Page.objects.get(pk=self.page.pk).is_dirty)
+
+    def test_edited_content_item_republished_in_place(self):
+        for html in ('<b>edited</b>', '<b>edited again</b>'):
+            item = self.page.contentitem_set.get(sort_order=1)
+            item.html = html
+            item.save()
+            self.page.publish()
+            published = Page.objects.get(pk=self.published.pk)
+            self.assertEqual(published, self.page.get_published())
+            self.assertEqual(
+                [('main', 0, '<b>0</b>'), ('main', 1, html),
+                 ('sidebar', 2, '<b>2</b>')],
+                self.get_items(published))
+            self.assertEqual(3, published.contentitem_set.count())
+            self.assertEqual(
+                6, RawHtmlItem.objects.filter(
+                    parent_id__in=[self.page.pk, published.pk]).count())
+
+    def test_unchanged_page_republished_without_writing_content(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.page.publish()
+        tables = (
+            Placeholder._meta.db_table,
+            ContentItem._meta.db_table,
+            RawHtmlItem._meta.db_table,
+            UrlNode_Translation._meta.db_table,
+        )
+        writes = [
+            q['sql'] for q in ctx.captured_queries
+            if q['sql'].split(' ', 1)[0] in ('INSERT', 'UPDATE', 'DELETE')
+            and any('"%s"' % table in q['sql'] for table in tables)]
+        # Only the cached URL of the published page's translation is saved
+        self.assertEqual([], [
+            sql for sql in writes
+            if UrlNode_Translation._meta.db_table not in sql])
+        self.assertEqual(self.published, self.page.get_published())
+
+    def test_changed_placeholders_and_content_item_types_are_copied(self):
+        # Remove a placeholder, add a placeholder and change the items of an
+        # existing placeholder
+        Placeholder.objects.parent(self.page).get(slot='sidebar').delete()
+        self.page.contentitem_set.filter(placeholder__isnull=True).delete()
+        Placeholder.objects.create_for_object(self.page, slot='footer')
+        create_content_instance(
+            RawHtmlItem, self.page, placeholder_name='footer',
+            html='<b>footer</b>')
+        create_content_instance(
+            RawHtmlItem, self.page, placeholder_name='main',
+            html='<b>extra</b>', sort_order=5)
+
+        self.page.publish()
+        published = Page.objects.get(pk=self.published.pk)
+        self.assertEqual(published, self.page.get_published())
+        self.assertEqual(
+            ['footer', 'main'],
+            sorted(Placeholder.objects.parent(published)
+                   .values_list('slot', flat=True)))
+        self.assertEqual(self.get_items(self.page), self.get_items(published))
+        self.assertEqual(
+            4, ContentItem.objects.filter(parent_id=published.pk).count())
+
+    def test_m2m_relationships_updated_in_place(self):
+        program = ModelC.objects.create(title='Program')
+        program.publish()
+        event = ModelD.objects.create(title='Event')
+        event.models_c.add(program)
+        event.publish()
+        event_published = event.get_published()
+        self.assertEqual([program], list(event_published.models_c.all()))
+
+        event.models_c.remove(program)
+        event.publish()
+        self.assertEqual(event_published, event.get_published())
+        self.assertEqual([], list(event_published.models_c.all()))
+        self.assertEqual([], list(event.models_c.all()))
+
+
 class TestPublishableFluentContents(TestCase):
     """ Test publishing features with a Fluent Contents item (not a page) """
 
@@ -695,6 +1784,70 @@ class TestPublishableFluentContents(TestCase):
              for i in published_page.contentitem_set.all()],
             ['lorem-ipsum-updated', 'lorem-ipsum-updated'])
 
+    def test_queryset_publish_clones_placeholders_and_content_items(self):
+        ctype = ContentType.objects.get_for_model(ModelB)
+        RawHtmlItem.objects.create(
+            parent_type=ctype,
+            parent_id=self.fluent_contents.id,
+            placeholder=self.placeholder,
+            html='<b>ping</b>'
+        )
+        other = ModelB.objects.create(title='Other')
+        other_placeholder = Placeholder.objects.create_for_object(
+            other, slot='lorem-ipsum', role='l')
+        RawHtmlItem.objects.create(
+            parent_type=ctype,
+            parent_id=other.id,
+            placeholder=other_placeholder,
+            html='<b>pong</b>'
+        )
+        ModelB.objects.all().publish()
+        for draft, html in ((self.fluent_contents, '<b>ping</b>'),
+                            (other, '<b>pong</b>')):
+            published = ModelB.objects.get(pk=draft.pk).publishing_linked
+            self.assertEqual(
+                [html], [i.html for i in published.contentitem_set.all()])
+            self.assertEqual(
+                ['lorem-ipsum'],
+                [p.slot for p in published.placeholder_set.all()])
+            self.assertNotEqual(
+                [draft.pk],
+                [i.placeholder.parent_id
+                 for i in published.contentitem_set.all()])
+
+    def test_queryset_publish_query_count_is_constant(self):
+        ctype = ContentType.objects.get_for_model(ModelB)
+
+        def add_drafts(count):
+            for i in range(count):
+                draft = ModelB.objects.create(title='Item %d' % i)
+                placeholder = Placeholder.objects.create_for_object(
+                    draft, slot='lorem-ipsum', role='l')
+                for html in ('<b>ping</b>', '<b>pong</b>'):
+                    RawHtmlItem.objects.create(
+                        parent_type=ctype,
+                        parent_id=draft.id,
+                        placeholder=placeholder,
+                        html=html,
+                    )
+
+        def count_publish_queries():
+            with CaptureQueriesContext(connection) as ctx:
+                ModelB.objects.all().publish()
+            return len(ctx.captured_queries)
+
+        add_drafts(1)
+        ModelB.objects.all().publish()
+        num_queries = count_publish_queries()
+        add_drafts(5)
+        ModelB.objects.all().publish()
+        self.assertEqual(num_queries, count_publish_queries())
+        for draft in ModelB.objects.draft().exclude(
+                pk=self.fluent_contents.pk):
+            self.assertEqual(
+                ['<b>ping</b>', '<b>pong</b>'],
+                [i.html for i in draft.get_published().contentitem_set.all()])
+
 
 class TestDjangoDeleteCollectorPatchForProxyModels(TransactionTestCase):
     """
@@ -1,3 +1,7 @@
+import hashlib
+import hmac
+import time
+
 try:
     import urlparse
 except ImportError:
@@ -5,10 +9,12 @@ except ImportError:
 
 from django.apps import apps
 from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
 from django.http import QueryDict
 from django.contrib.contenttypes.models import ContentType
 from django.shortcuts import get_object_or_404, _get_queryset
-from django.utils.crypto import get_random_string, salted_hmac
+from django.utils.crypto import constant_time_compare, get_random_string
 from django.utils.encoding import force_bytes
 
 from model_settings.models import Text
@@ -41,27 +47,115 @@ def assert_draft(method):
     return decorated
 
 
+# Maximum number of precomputed draft mode HMAC states to keep in memory
+DRAFT_HMAC_STATES_MAX = 1000
+
+# Precomputed `(secret_key, {salt: hmac_state})` for draft mode HMACs
+_draft_hmac_states = (None, {})
+
+
 def get_draft_hmac(salt, url):
     """
     Return a draft mode HMAC for the given salt and URL.
+
+    This is equivalent to ``salted_hmac(salt, url, get_draft_secret_key())``,
+    but reuses a precomputed keyed HMAC state for each salt instead of
+    deriving the key from scratch every time.
     """
-    return salted_hmac(salt, url, get_draft_secret_key()).hexdigest()
+    global _draft_hmac_states
+    secret_key = get_draft_secret_key()
+    states_secret_key, states = _draft_hmac_states
+    if states_secret_key != secret_key:
+        states = {}
+        _draft_hmac_states = (secret_key, states)
+    state = states.get(salt)
+    if state is None:
+        # Derive the key as done by `salted_hmac`
+        key = hashlib.sha1(force_bytes(salt) + force_bytes(secret_key)) \
+            .digest()
+        state = hmac.new(key, digestmod=hashlib.sha1)
+        if len(states) >= DRAFT_HMAC_STATES_MAX:
+            states.clear()
+        states[salt] = state
+    state = state.copy()
+    state.update(force_bytes(url))
+    return state.hexdigest()
+
+
+def verify_draft_hmac(path, edit):
+    """
+    Return ``True`` if the given value of the 'edit' GET parameter is a valid
+    draft mode HMAC for the given URL path.
+    """
+    try:
+        salt, draft_hmac = edit.split(':')
+    except (AttributeError, ValueError):
+        return False
+    return constant_time_compare(draft_hmac, get_draft_hmac(salt, path))
+
+
+# Process-local copy of the `(key, expires)` draft secret key state
+_draft_secret_key_state = None
 
 
 def get_draft_secret_key():
     """
     Return the secret key used to generate draft mode HMACs. It will be
     randomly generated on first access. Existing draft URLs can be invalidated
-    by deleting or updating the ``DRAFT_SECRET_KEY`` setting.
+    with ``rotate_draft_secret_key``.
+
+    The key is stored in the database, which is the only source of truth, and
+    cached in process memory. Every
+    ``FLUENTCMS_PUBLISHING_DRAFT_SECRET_KEY_CHECK_INTERVAL`` seconds the
+    process reads the key from the database again, so rotated or edited keys
+    are picked up by every process without a restart, and without relying on
+    a cache shared between processes.
     """
+    global _draft_secret_key_state
     # TODO: Per URL secret keys, so we can invalidate draft URLs for individual
     #       pages. For example, on publish.
-    draft_secret_key, created = Text.objects.get_or_create(
+    state = _draft_secret_key_state
+    timestamp = time.time()
+    if state is not None and timestamp < state[1]:
+        return state[0]
+    key = Text.objects.filter(name='DRAFT_SECRET_KEY') \
+        .values_list('value', flat=True).first()
+    if key is None:
+        draft_secret_key, created = Text.objects.get_or_create(
+            name='DRAFT_SECRET_KEY',
+            defaults=dict(
+                value=get_random_string(50),
+            ))
+        key = draft_secret_key.value
+    _draft_secret_key_state = (
+        key, timestamp + _get_draft_secret_key_check_interval())
+    return key
+
+
+def rotate_draft_secret_key():
+    """
+    Replace the secret key used to generate draft mode HMACs with a new random
+    key, which invalidates all existing draft URLs. Other processes pick up
+    the new key from the database within
+    ``FLUENTCMS_PUBLISHING_DRAFT_SECRET_KEY_CHECK_INTERVAL`` seconds.
+
+    Return the new key.
+    """
+    global _draft_secret_key_state
+    key = get_random_string(50)
+    Text.objects.update_or_create(
         name='DRAFT_SECRET_KEY',
         defaults=dict(
-            value=get_random_string(50),
+            value=key,
         ))
-    return draft_secret_key.value
+    _draft_secret_key_state = (
+        key, time.time() + _get_draft_secret_key_check_interval())
+    return key
+
+
+def _get_draft_secret_key_check_interval():
+    return getattr(
+        settings, 'FLUENTCMS_PUBLISHING_DRAFT_SECRET_KEY_CHECK_INTERVAL', 60)
 
 
 def get_draft_url(url):
@@ -91,11 +185,144 @@ def verify_draft_url(url):
     url = urlparse.urlparse(url)
     # QueryDict requires a bytestring as its first argument
     query = QueryDict(force_bytes(url.query))
-    try:
-        salt, hmac = query['edit'].split(':')
-    except (KeyError, ValueError):
-        return False
-    return hmac == get_draft_hmac(salt, url.path)
+    return verify_draft_hmac(url.path, query.get('edit'))
+
+
+PUBLISHED_PAGE_CACHE_VERSION_KEY = \
+    'fluentcms_publishing.published_page_cache_version'
+
+
+def get_published_page_cache_version():
+    """
+    Return the version stamp of the published page cache, which is the time
+    content shared between pages, such as menus, was last published or
+    unpublished. It is part of every cache key of
+    ``PublishedPageCacheMiddleware`` so changing it purges the cache.
+    """
+    version = cache.get(PUBLISHED_PAGE_CACHE_VERSION_KEY)
+    if version is None:
+        version = repr(time.time())
+        # Keep the version of any process that got here first
+        if not cache.add(PUBLISHED_PAGE_CACHE_VERSION_KEY, version, None):
+            version = cache.get(PUBLISHED_PAGE_CACHE_VERSION_KEY, version)
+    return version
+
+
+def purge_published_page_cache():
+    """
+    Purge all published page responses cached by
+    ``PublishedPageCacheMiddleware``, by changing the cache version stamp.
+    """
+    cache.set(PUBLISHED_PAGE_CACHE_VERSION_KEY, repr(time.time()), None)
+
+
+PUBLISHED_PAGE_VERSION_CACHE_PREFIX = \
+    'fluentcms_publishing.published_page_version'
+
+
+def get_published_page_version(draft_pk):
+    """
+    Return the version stamp of the published page for the draft with the
+    given PK, which is part of the cache keys of its responses cached by
+    ``PublishedPageCacheMiddleware``, or None if it is unknown. Pages are
+    identified by their drafts, which keep their PKs when republished.
+    """
+    return cache.get(_get_published_page_version_key(draft_pk))
+
+
+def set_published_page_version(draft_pk, published, replace=True):
+    """
+    Set the version stamp of the published page for the draft with the given
+    PK to the publishing modification time of the published copy, which
+    purges its cached responses when it changes. Unless ``replace`` is set an
+    existing stamp is kept, and returned.
+    """
+    key = _get_published_page_version_key(draft_pk)
+    version = published.publishing_modified_at.isoformat()
+    timeout = get_published_page_cache_timeout()
+    if replace:
+        cache.set(key, version, timeout)
+    elif not cache.add(key, version, timeout):
+        version = cache.get(key, version)
+    return version
+
+
+def _get_published_page_version_key(draft_pk):
+    return '%s.%s' % (PUBLISHED_PAGE_VERSION_CACHE_PREFIX, draft_pk)
+
+
+def get_published_page_cache_timeout():
+    return getattr(
+        settings, 'FLUENTCMS_PUBLISHING_PAGE_CACHE_TIMEOUT', 300)
+
+
+ROUTING_INDEX_CACHE_PREFIX = 'fluentcms_publishing.routing_index'
+# Version of the routing index entry format, used as the cache key version
+ROUTING_INDEX_VERSION = 1
+
+
+def _get_routing_index_key(site_id, language_code, path, is_draft):
+    key = '\n'.join([
+        str(site_id),
+        language_code,
+        path,
+        'draft' if is_draft else 'published',
+    ])
+    return '%s.%s' % (
+        ROUTING_INDEX_CACHE_PREFIX, hashlib.md5(force_bytes(key)).hexdigest())
+
+
+def get_routing_index_entry(site_id, language_code, path, is_draft):
+    """
+    Return the PK of the Fluent page node routed for the given site,
+    language, path and draft request context, according to the routing
+    index, or None if there is no entry.
+
+    The index is a hint only: the node must be checked against the path and
+    publishing status when it is fetched, since entries may be stale.
+    """
+    return cache.get(
+        _get_routing_index_key(site_id, language_code, path, is_draft),
+        version=ROUTING_INDEX_VERSION)
+
+
+def set_routing_index_entry(site_id, language_code, path, is_draft, pk):
+    cache.set(
+        _get_routing_index_key(site_id, language_code, path, is_draft),
+        pk,
+        _get_routing_index_timeout(),
+        version=ROUTING_INDEX_VERSION)
+
+
+def update_routing_index(item, translations=None, remove=False):
+    """
+    Add routing index entries for the cached URLs of the given item's
+    translations, or remove them if ``remove`` is set. Entries are added for
+    the draft or published request context according to the item's status,
+    or for both if the item is not publishable.
+    """
+    if translations is None:
+        translations = item.translations.all()
+    is_draft = getattr(item, 'is_draft', None)
+    draft_flags = (True, False) if is_draft is None else (is_draft, )
+    keys = [
+        _get_routing_index_key(
+            item.parent_site_id, t.language_code, t._cached_url, draft_flag)
+        for t in translations if t._cached_url
+        for draft_flag in draft_flags
+    ]
+    if remove:
+        cache.delete_many(keys, version=ROUTING_INDEX_VERSION)
+    else:
+        cache.set_many(
+            dict((key, item.pk) for key in keys),
+            _get_routing_index_timeout(),
+            version=ROUTING_INDEX_VERSION)
+
+
+def _get_routing_index_timeout():
+    return getattr(
+        settings, 'FLUENTCMS_PUBLISHING_ROUTING_INDEX_TIMEOUT', 3600)
 
 
 def get_visible_object_or_404(klass, *args, **kwargs):
@@ -115,17 +342,66 @@ def get_visible_object_or_404(klass, *args, **kwargs):
 
 
 def is_automatic_publishing_enabled(klass):
-    auto_publish_setting = getattr(
-        settings, 'FLUENTCMS_PUBLISHING_ENABLE_AUTO_PUBLISH', False)
-    if auto_publish_setting is True:
+    return _is_model_setting_enabled(
+        'FLUENTCMS_PUBLISHING_ENABLE_AUTO_PUBLISH', klass)
+
+
+def is_incremental_publishing_enabled(klass):
+    """
+    Return ``True`` if republishing drafts of the given class should update
+    their existing published copies in place, instead of replacing them.
+    """
+    return _is_model_setting_enabled(
+        'FLUENTCMS_PUBLISHING_INCREMENTAL_PUBLISH', klass)
+
+
+def _is_model_setting_enabled(setting_name, klass):
+    # The setting is either True for all classes, or a list of class dotpaths
+    model_setting = getattr(settings, setting_name, False)
+    if model_setting is True:
         return True
-    if isinstance(auto_publish_setting, (list, tuple)):
+    if isinstance(model_setting, (list, tuple)):
         klass_dotpath = '.'.join([klass.__module__, klass.__name__])
-        if klass_dotpath in auto_publish_setting:
+        if klass_dotpath in model_setting:
             return True
     return False
 
 
+def is_publishing_job_queue_enabled():
+    """
+    Return ``True`` if admin publishing actions should be queued as jobs for
+    the ``publishing_worker`` management command, instead of being run
+    within the admin request.
+    """
+    return _is_jobs_app_setting_enabled('FLUENTCMS_PUBLISHING_USE_JOB_QUEUE')
+
+
+def is_publishing_scheduler_enabled():
+    """
+    Return ``True`` if publication start/end dates are enforced by scheduled
+    jobs run by the ``publishing_worker`` management command. Public queries
+    still check the dates, in case these jobs run late.
+    """
+    return _is_jobs_app_setting_enabled('FLUENTCMS_PUBLISHING_USE_SCHEDULER')
+
+
+# Whether the jobs app is installed, looked up once on first use
+_is_jobs_app_installed = None
+
+
+def _is_jobs_app_setting_enabled(setting_name):
+    global _is_jobs_app_installed
+    if not getattr(settings, setting_name, False):
+        return False
+    if _is_jobs_app_installed is None:
+        _is_jobs_app_installed = apps.is_installed('fluentcms_publishing.jobs')
+    if not _is_jobs_app_installed:
+        raise ImproperlyConfigured(
+            "%s requires 'fluentcms_publishing.jobs' in INSTALLED_APPS"
+            % setting_name)
+    return True
+
+
 def create_content_instance(content_plugin_class, page, placeholder_name='main', **kwargs):
     """
     Creates a content instance from a content plugin class.
@@ -11,6 +11,7 @@ PROJECT_APPS = [
     'fluentcms_publishing',
     'fluentcms_publishing.pagetypes.fluentpage',
     'fluentcms_publishing.pagetypes.redirectnode',
+    'fluentcms_publishing.jobs',
 ]
 
 INSTALLED_APPS = [